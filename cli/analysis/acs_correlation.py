@@ -10,6 +10,7 @@ import pandas as pd
 import scipy.stats as stats
 import seaborn as sns
 
+from collection.geoid import merge_on_geoid
 from const import OUTPUT_PATH_PLOTS_DETAIL, STAT_SIGNIFICANCE_CUTOFF
 
 # line below suppresses annoying SettingWithCopyWarning
@@ -240,10 +241,8 @@ def correlation_analysis(
     to_keep = ['geoid', target_var]
     processed_data_df = processed_data_df[to_keep]
     processed_data_df = processed_data_df[processed_data_df['geoid'].notna()]
-    processed_data_df.geoid = processed_data_df.geoid.astype(str)
-    census_df.GEOID = census_df.GEOID.astype(str)
 
-    mrg = processed_data_df.merge(census_df, left_on='geoid', right_on='GEOID')
+    mrg = merge_on_geoid(processed_data_df, census_df)
 
     hl_type = ''
     if target_var == 'total_filings':
@@ -2,11 +2,15 @@ import csv
 import datetime
 import os
 import typing as T
-
-from census import Census
 import sys
+from pathlib import Path
 
 import pandas as pd
+from census import Census
+
+from collection.disk_cache import load_or_fetch
+from collection.geoid import geoid_key_to_str, make_geoid_key, to_int_codes
+from collection.http_client import get_session
 
 # line below suppresses annoying SettingWithCopyWarning
 pd.options.mode.chained_assignment = None
@@ -63,7 +67,9 @@ def load_census_data(census_raw_data: pd.DataFrame, census_cols: dict) -> pd.Dat
         * 100
     )
 
-    census_df["median-year-structure-built"] = pd.to_numeric(census_df["median-year-structure-built"])
+    census_df["median-year-structure-built"] = pd.to_numeric(
+        census_df["median-year-structure-built"]
+    )
     census_df["median-house-age"] = (
         datetime.datetime.now().year - census_df["median-year-structure-built"]
     )
@@ -84,12 +90,26 @@ def load_census_data(census_raw_data: pd.DataFrame, census_cols: dict) -> pd.Dat
         axis=1,
     )
 
+
 def get_acs_data(
-    state_fips: str, county_fips: str, year: int = 2019 # The max here is determined by 'censusdata' package
+    state_fips: str,
+    county_fips: str,
+    year: int = 2019,  # The max here is determined by 'censusdata' package
+    cache_dir: T.Union[str, Path, None] = None,
 ) -> T.Union[T.Tuple[pd.DataFrame, T.Dict], T.Tuple[None, None]]:
-    """Main function to get ACS data from the census API."""
+    """Main function to get ACS data from the census API.
+
+    If a cache directory is given, the data for each county and year is only
+    downloaded once and shared between runs (and batch workers).
+    """
     if state_fips is None or county_fips is None:
         return (None, None)
+    if cache_dir is not None:
+        return load_or_fetch(
+            cache_dir,
+            f'acs_{year}_{state_fips}{county_fips}',
+            lambda: get_acs_data(state_fips, county_fips, year),
+        )
 
     vars = {
         "dataprofile": {
@@ -143,45 +163,126 @@ def get_acs_data(
             "DP02_0069PE": "pct-veterans",
             "DP02_0094PE": "pct-foreign-born",
             "DP02_0096PE": "pct-not-us-citizen",
-            "DP02_0072PE": "pct-disability"
+            "DP02_0072PE": "pct-disability",
         },
         "subject": {
             "S2506_C01_039E": "median-monthly-housing-cost",
             "S2506_C01_001E": "total-owner-occupied-households-mortgage",
         },
-        "detail":{
+        "detail": {
             "B19083_001E": "gini-index",
             "B25035_001E": "median-year-structure-built",
             "B25064_001E": "median-gross-rent",
-            "B25077_001E": "median-property-value"
-        }
+            "B25077_001E": "median-property-value",
+        },
     }
 
-    c = Census(CENSUS_API_KEY, year=year)
+    c = Census(CENSUS_API_KEY, year=year, session=get_session())
     dfs = []
 
     var_list = list(vars['dataprofile'].keys())
-    df = pd.DataFrame(c.acs5dp.state_county_tract((var_list), state_fips, county_fips, Census.ALL))
+    df = pd.DataFrame(
+        c.acs5dp.state_county_tract((var_list), state_fips, county_fips, Census.ALL)
+    )
     df.drop(['state', 'county', 'tract'], axis=1, inplace=True)
     dfs.append(df)
 
     var_list = list(vars['subject'].keys())
-    df = pd.DataFrame(c.acs5st.state_county_tract((var_list), state_fips, county_fips, Census.ALL))
+    df = pd.DataFrame(
+        c.acs5st.state_county_tract((var_list), state_fips, county_fips, Census.ALL)
+    )
     df.drop(['state', 'county', 'tract'], axis=1, inplace=True)
     dfs.append(df)
 
     var_list = list(vars['detail'].keys())
-    df = pd.DataFrame(c.acs5.state_county_tract((var_list), state_fips, county_fips, Census.ALL))
+    df = pd.DataFrame(
+        c.acs5.state_county_tract((var_list), state_fips, county_fips, Census.ALL)
+    )
     dfs.append(df)
 
-    data = pd.concat( dfs, axis=1).reset_index()
-    data_dict=pd.DataFrame()
+    data = pd.concat(dfs, axis=1).reset_index()
+    data_dict = pd.DataFrame()
 
     census_cols = vars['dataprofile']
     census_cols.update(vars['subject'])
     census_cols.update(vars['detail'])
 
     census_df = load_census_data(data, census_cols)
-    census_df["GEOID"] = census_df['state'].astype(str) + census_df['county'].astype(str) + census_df['tract'].astype(str)
+    census_df["GEOID"] = geoid_key_to_str(
+        make_geoid_key(census_df['state'], census_df['county'], census_df['tract'])
+    )
 
     return census_df, data_dict
+
+
+# Renter- and owner-occupied households (ACS table B25003, tenure), the denominators
+# of the housing loss rates; unlike the data profile it is published for block groups
+HOUSEHOLD_VARIABLES = {
+    "B25003_003E": "total-renter-occupied-households",
+    "B25003_002E": "total-owner-occupied-households",
+}
+
+
+def acs_geography(level: str, state_fips: str, county_fips: str) -> T.Dict[str, str]:
+    """Census API geography of all areas of a level in a county (ZCTAs: nationwide)."""
+    if level == "block_group":
+        return {
+            "for": "block group:*",
+            "in": f"state:{state_fips} county:{county_fips} tract:*",
+        }
+    if level == "tract":
+        return {"for": "tract:*", "in": f"state:{state_fips} county:{county_fips}"}
+    if level == "county":
+        return {"for": f"county:{county_fips}", "in": f"state:{state_fips}"}
+    if level == "zip":
+        # ZCTAs are not nested in states for recent years, so all of them are fetched
+        return {"for": "zip code tabulation area:*"}
+    raise ValueError(f"Unknown geographic level {level!r}")
+
+
+def acs_geography_key(data: pd.DataFrame, level: str) -> pd.Series:
+    """Integer GEOID keys of the areas returned by the Census API for a level."""
+    if level == "zip":
+        return to_int_codes(data["zip code tabulation area"])
+    if level == "county":
+        return to_int_codes(data["state"]) * 1000 + to_int_codes(data["county"])
+    keys = make_geoid_key(data["state"], data["county"], data["tract"])
+    if level == "block_group":
+        keys = keys * 10 + to_int_codes(data["block group"])
+    return keys
+
+
+def get_acs_households(
+    level: str,
+    state_fips: str,
+    county_fips: str,
+    year: int = 2019,
+    cache_dir: T.Union[str, Path, None] = None,
+) -> pd.DataFrame:
+    """Renter- and owner-occupied households of the areas of a level, by GEOID key.
+
+    Areas of the 'block_group', 'tract' and 'county' levels are those of the county;
+    ZIP code tabulation areas are fetched for the whole country (once per year).
+    """
+    if level == "zip":
+        cache_key = f"acs_households_{year}_zip"
+    else:
+        cache_key = f"acs_households_{year}_{level}_{state_fips}{county_fips}"
+    if cache_dir is not None:
+        return load_or_fetch(
+            cache_dir,
+            cache_key,
+            lambda: get_acs_households(level, state_fips, county_fips, year),
+        )
+
+    c = Census(CENSUS_API_KEY, year=year, session=get_session())
+    data = pd.DataFrame(
+        c.acs5.get(
+            list(HOUSEHOLD_VARIABLES),
+            acs_geography(level, state_fips, county_fips),
+        )
+    )
+    households = data[list(HOUSEHOLD_VARIABLES)].rename(columns=HOUSEHOLD_VARIABLES)
+    households = households.apply(pd.to_numeric, errors="coerce")
+    households.insert(0, "geoid_key", acs_geography_key(data, level).values)
+    return households.dropna(subset=["geoid_key"]).reset_index(drop=True)
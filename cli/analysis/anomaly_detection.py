@@ -0,0 +1,208 @@
+"""
+Monthly anomaly scores and short-term forecasts of housing loss for every tract
+
+Works on the (tract, month, category) counts of a SpaceTimeCube, for all tracts and
+categories at once. The expected count of a tract in a month is its trailing level (the
+mean of its seasonally adjusted counts over the preceding months) times the seasonal
+factor of that month of the year, estimated from the whole site. Months with many more
+filings than expected, e.g. after a moratorium expires, get high anomaly scores.
+"""
+
+import typing as T
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from analysis.space_time_cube import SpaceTimeCube
+from collection.geoid import geoid_key_to_str
+from const import (
+    ANOMALY_ALERT_MONTHS,
+    ANOMALY_BASELINE_MONTHS,
+    ANOMALY_MIN_COUNT,
+    ANOMALY_SCORE_THRESHOLD,
+    FORECAST_MONTHS,
+    STAT_SIGNIFICANCE_CUTOFF,
+)
+
+# Months of history needed before a month is scored
+MIN_HISTORY_MONTHS = 6
+
+
+def month_of_year(months: np.ndarray) -> np.ndarray:
+    """Month of the year (0 = January) of datetime64[M] months."""
+    return months.astype('datetime64[M]').astype(np.int64) % 12
+
+
+def seasonal_factors(counts: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """Multiplicative factor per month of the year (rows) and category (columns).
+
+    Estimated from the site-wide counts; months of the year seen fewer than twice
+    get a factor of 1.
+    """
+    site_counts = counts.sum(axis=0)
+    moy = month_of_year(months)
+    totals = np.zeros((12, site_counts.shape[1]))
+    np.add.at(totals, moy, site_counts)
+    occurrences = np.bincount(moy, minlength=12)[:, None]
+    overall_mean = (
+        site_counts.mean(axis=0) if len(months) else np.zeros(totals.shape[1])
+    )
+    factors = np.divide(
+        totals / np.maximum(occurrences, 1),
+        overall_mean,
+        out=np.ones_like(totals),
+        where=(occurrences >= 2) & (overall_mean > 0),
+    )
+    # A month of the year without any filings would make every expectation zero
+    return np.where(factors > 0, factors, 1)
+
+
+def trailing_levels(
+    counts: np.ndarray,
+    months: np.ndarray,
+    factors: np.ndarray,
+    window: int = ANOMALY_BASELINE_MONTHS,
+) -> np.ndarray:
+    """Mean seasonally adjusted count of the `window` months before each month.
+
+    Returns an array with one more month than counts: the last one is the current
+    level, used for forecasts. Months with too little history are NaN.
+    """
+    adjusted = counts / factors[month_of_year(months)][None]
+    cumulative = np.zeros((counts.shape[0], counts.shape[1] + 1, counts.shape[2]))
+    np.cumsum(adjusted, axis=1, out=cumulative[:, 1:])
+    ends = np.arange(counts.shape[1] + 1)
+    starts = np.maximum(ends - window, 0)
+    history = (ends - starts).astype(np.float64)
+    history[history < min(MIN_HISTORY_MONTHS, window)] = np.nan
+    return (cumulative[:, ends] - cumulative[:, starts]) / history[None, :, None]
+
+
+def anomaly_scores(
+    counts: np.ndarray, expected: np.ndarray
+) -> T.Tuple[np.ndarray, np.ndarray]:
+    """Standardized excess of counts over their expectation, and its Poisson p-value.
+
+    The p-value is the probability of at least that many filings.
+    """
+    scores = (counts - expected) / np.sqrt(np.maximum(expected, 1))
+    p_values = stats.poisson.sf(counts - 1, expected)
+    return scores, p_values
+
+
+def score_cube(
+    cube: SpaceTimeCube, window: int = ANOMALY_BASELINE_MONTHS
+) -> T.Dict[str, np.ndarray]:
+    """Expected counts, anomaly scores and p-values for every cell of the cube.
+
+    Also returns the seasonal factors, and the current (seasonally adjusted) level of
+    every tract and category.
+    """
+    counts = cube.counts.astype(np.float64)
+    factors = seasonal_factors(counts, cube.months)
+    levels = trailing_levels(counts, cube.months, factors, window)
+    expected = levels[:, :-1] * factors[month_of_year(cube.months)][None]
+    scores, p_values = anomaly_scores(counts, expected)
+    return {
+        'factors': factors,
+        'expected': expected,
+        'scores': scores,
+        'p_values': p_values,
+        'current_level': levels[:, -1],
+    }
+
+
+def forecast_counts(
+    cube: SpaceTimeCube,
+    horizon: int = FORECAST_MONTHS,
+    window: int = ANOMALY_BASELINE_MONTHS,
+    scored: T.Optional[T.Dict[str, np.ndarray]] = None,
+) -> T.Tuple[np.ndarray, np.ndarray]:
+    """Forecast months and counts (tract, month, category) after the end of the cube."""
+    if scored is None:
+        scored = score_cube(cube, window)
+    future_months = cube.months[-1] + np.arange(1, horizon + 1)
+    forecasts = (
+        scored['current_level'][:, None, :]
+        * scored['factors'][month_of_year(future_months)][None]
+    )
+    return future_months, forecasts
+
+
+def alert_table(
+    cube: SpaceTimeCube,
+    alert_months: int = ANOMALY_ALERT_MONTHS,
+    threshold: float = ANOMALY_SCORE_THRESHOLD,
+    min_count: int = ANOMALY_MIN_COUNT,
+    cutoff: float = STAT_SIGNIFICANCE_CUTOFF,
+    window: int = ANOMALY_BASELINE_MONTHS,
+) -> pd.DataFrame:
+    """Ranked table of tract months with unexpectedly many filings.
+
+    Only the last `alert_months` months are considered. A tract month is flagged when
+    its score reaches the threshold, it has at least `min_count` filings and their
+    Poisson p-value is at most the cutoff.
+    """
+    columns = [
+        'rank',
+        'category',
+        'geoid',
+        'month',
+        'count',
+        'expected',
+        'anomaly_score',
+        'p_value',
+        'forecast_next_month',
+    ]
+    if not len(cube.months) or not len(cube.geoids):
+        return pd.DataFrame(columns=columns)
+    scored = score_cube(cube, window)
+    _, forecasts = forecast_counts(cube, 1, window, scored)
+
+    recent = slice(max(len(cube.months) - alert_months, 0), len(cube.months))
+    counts = cube.counts[:, recent]
+    scores = scored['scores'][:, recent]
+    p_values = scored['p_values'][:, recent]
+    flagged = (
+        (scores >= threshold)
+        & (counts >= min_count)
+        & (p_values <= cutoff)
+        & ~np.isnan(scores)
+    )
+    tracts, months, categories = np.nonzero(flagged)
+    months_offset = months + recent.start
+    table = pd.DataFrame(
+        {
+            'category': np.array(cube.categories, dtype=object)[categories],
+            'geoid': geoid_key_to_str(cube.geoids[tracts]).values,
+            'month': cube.months[months_offset].astype(str),
+            'count': counts[tracts, months, categories],
+            'expected': scored['expected'][tracts, months_offset, categories].round(2),
+            'anomaly_score': scores[tracts, months, categories].round(2),
+            'p_value': p_values[tracts, months, categories],
+            'forecast_next_month': forecasts[tracts, 0, categories].round(2),
+        }
+    )
+    table = table.sort_values('anomaly_score', ascending=False, ignore_index=True)
+    table['rank'] = np.arange(1, len(table) + 1)
+    return table[columns]
+
+
+def forecast_table(
+    cube: SpaceTimeCube,
+    horizon: int = FORECAST_MONTHS,
+    window: int = ANOMALY_BASELINE_MONTHS,
+) -> pd.DataFrame:
+    """Forecast counts of every tract and category for the next `horizon` months."""
+    future_months, forecasts = forecast_counts(cube, horizon, window)
+    tracts, months, categories = np.indices(forecasts.shape).reshape(3, -1)
+    table = pd.DataFrame(
+        {
+            'category': np.array(cube.categories, dtype=object)[categories],
+            'geoid': geoid_key_to_str(cube.geoids[tracts]).values,
+            'month': future_months[months].astype(str),
+            'forecast': forecasts[tracts, months, categories].round(2),
+        }
+    )
+    return table.dropna(subset=['forecast']).reset_index(drop=True)
@@ -0,0 +1,222 @@
+"""
+Housing loss counts and rates by block group, tract, county and ZIP code
+
+The records are counted once at the finest level they can be located at: block groups
+for geocoded records (the geocoder returns their census block) and tracts for records
+that only have a tract GEOID. Coarser levels are derived from the finer counts by
+integer division of the GEOID keys (a block group key is its tract key * 10 + the
+block group digit, a tract key is its county key * 10^6 + the tract code), so the
+records are not scanned again for every level. ZIP codes are not nested in the census
+geography and are counted from the ZIP code of the records.
+
+The rates divide the counts by the ACS renter- or owner-occupied households of the
+area and by the number of years of data, like the tract housing loss summary.
+"""
+
+import typing as T
+
+import numpy as np
+import pandas as pd
+
+from collection.date_parsing import parse_date_column
+from collection.geoid import geoid_key_to_str, to_geoid_key, to_int_codes
+from const import AGGREGATION_LEVELS
+
+if T.TYPE_CHECKING:
+    from collection.tract_crosswalk import TractCrosswalk
+
+# Census levels from the finest to the coarsest, with the digits of their GEOIDs
+GEOID_DIGITS = {'block_group': 12, 'tract': 11, 'county': 5}
+ZIP_CODE_DIGITS = 5
+
+# Integer keys of the areas of a level and their counts (areas x categories)
+LevelCounts = T.Tuple[np.ndarray, np.ndarray]
+
+
+def record_keys(data: pd.DataFrame) -> T.Tuple[pd.Series, pd.Series]:
+    """Block group and tract keys of the records (block groups missing without block).
+
+    The block group is the first digit of the 4-digit census block.
+    """
+    tract_keys = to_geoid_key(data['geoid']) if 'geoid' in data.columns else None
+    if tract_keys is None:
+        tract_keys = pd.Series(pd.NA, index=range(len(data)), dtype='Int64')
+    if 'block' in data.columns:
+        block_groups = to_int_codes(data['block']) // 1000
+        block_group_keys = tract_keys * 10 + block_groups.values
+    else:
+        block_group_keys = pd.Series(pd.NA, index=range(len(data)), dtype='Int64')
+    return block_group_keys.reset_index(drop=True), tract_keys.reset_index(drop=True)
+
+
+def zip_code_keys(data: pd.DataFrame) -> pd.Series:
+    """Integer 5-digit ZIP codes of the records (cleaned ones if available)."""
+    column = 'zip_code_clean' if 'zip_code_clean' in data.columns else 'zip_code'
+    if column not in data.columns:
+        return pd.Series(pd.NA, index=range(len(data)), dtype='Int64')
+    zip_codes = data[column].astype(object).where(data[column].notna()).astype(str)
+    return to_int_codes(zip_codes.str.strip().str[:ZIP_CODE_DIGITS]).reset_index(
+        drop=True
+    )
+
+
+def count_by_key(
+    keys: np.ndarray, category_codes: np.ndarray, n_categories: int
+) -> LevelCounts:
+    """Counts of the records by (sorted unique) key and category."""
+    unique_keys, key_codes = np.unique(keys, return_inverse=True)
+    counts = np.zeros((len(unique_keys), n_categories))
+    np.add.at(counts, (key_codes, category_codes), 1)
+    return unique_keys, counts
+
+
+def combine_counts(*level_counts: LevelCounts) -> LevelCounts:
+    """Sum of counts by key, e.g. of two sets of areas of the same level."""
+    keys = np.concatenate([keys for keys, _ in level_counts])
+    counts = np.concatenate([counts for _, counts in level_counts])
+    unique_keys, key_codes = np.unique(keys, return_inverse=True)
+    combined = np.zeros((len(unique_keys), counts.shape[1]))
+    np.add.at(combined, key_codes, counts)
+    return unique_keys, combined
+
+
+def roll_up(level_counts: LevelCounts, from_level: str, to_level: str) -> LevelCounts:
+    """Counts of a coarser level, by prefix of the GEOID keys of a finer one."""
+    keys, counts = level_counts
+    divisor = 10 ** (GEOID_DIGITS[from_level] - GEOID_DIGITS[to_level])
+    return combine_counts((keys // divisor, counts))
+
+
+def reallocate_tract_counts(
+    level_counts: LevelCounts, crosswalks: T.Sequence[T.Optional['TractCrosswalk']]
+) -> LevelCounts:
+    """Tract counts with the categories that have a crosswalk moved to 2020 tracts."""
+    keys, counts = level_counts
+    parts = []
+    for c, crosswalk in enumerate(crosswalks):
+        category_counts = np.zeros_like(counts)
+        if crosswalk is None:
+            category_counts[:, c] = counts[:, c]
+            parts.append((keys, category_counts))
+            continue
+        matrix, new_keys = crosswalk.matrix(keys)
+        reallocated = np.zeros((len(new_keys), counts.shape[1]))
+        reallocated[:, c] = matrix @ counts[:, c]
+        parts.append((new_keys, reallocated))
+    return combine_counts(*parts)
+
+
+def aggregate_levels(
+    data_by_category: T.Mapping[str, T.Union[pd.DataFrame, None]],
+    levels: T.Sequence[str] = tuple(AGGREGATION_LEVELS),
+    crosswalks: T.Optional[T.Mapping[str, T.Optional['TractCrosswalk']]] = None,
+) -> T.Dict[str, LevelCounts]:
+    """Counts of the records of each category at each level, in one pass.
+
+    Records of the categories with a tract crosswalk (2010 tracts) are counted by tract
+    only and reallocated to 2020 tracts before rolling up to counties.
+    """
+    categories = list(data_by_category)
+    crosswalks = [(crosswalks or {}).get(category) for category in categories]
+    block_group_keys, tract_keys, zip_keys, codes = [], [], [], []
+    for c, category in enumerate(categories):
+        data = data_by_category[category]
+        if data is None:
+            continue
+        block_groups, tracts = record_keys(data)
+        if crosswalks[c] is not None:
+            block_groups[:] = pd.NA
+        block_group_keys.append(block_groups)
+        tract_keys.append(tracts)
+        zip_keys.append(zip_code_keys(data))
+        codes.append(np.full(len(data), c))
+    if not codes:
+        empty = (np.zeros(0, dtype=np.int64), np.zeros((0, len(categories))))
+        return {level: empty for level in levels}
+    block_group_keys = pd.concat(block_group_keys, ignore_index=True)
+    tract_keys = pd.concat(tract_keys, ignore_index=True)
+    zip_keys = pd.concat(zip_keys, ignore_index=True)
+    codes = np.concatenate(codes)
+
+    def located_counts(keys: pd.Series, selected: np.ndarray) -> LevelCounts:
+        return count_by_key(
+            keys[selected].to_numpy(dtype=np.int64), codes[selected], len(categories)
+        )
+
+    # Records are counted at their finest level, then rolled up to the coarser ones
+    in_block_group = block_group_keys.notna().to_numpy()
+    in_tract_only = tract_keys.notna().to_numpy() & ~in_block_group
+    counts = {'block_group': located_counts(block_group_keys, in_block_group)}
+    counts['tract'] = combine_counts(
+        roll_up(counts['block_group'], 'block_group', 'tract'),
+        reallocate_tract_counts(located_counts(tract_keys, in_tract_only), crosswalks),
+    )
+    counts['county'] = roll_up(counts['tract'], 'tract', 'county')
+    counts['zip'] = located_counts(zip_keys, zip_keys.notna().to_numpy())
+    return {level: counts[level] for level in levels}
+
+
+def years_of_data(
+    data_by_category: T.Mapping[str, T.Union[pd.DataFrame, None]],
+    date_columns: T.Mapping[str, str],
+) -> T.Dict[str, int]:
+    """Number of years from the first to the last record of each category."""
+    nyears = {}
+    for category, data in data_by_category.items():
+        dates = (
+            parse_date_column(data[date_columns[category]])
+            if data is not None
+            else pd.Series(dtype='datetime64[ns]')
+        )
+        nyears[category] = (
+            int(dates.max().year - dates.min().year + 1) if dates.notna().any() else 0
+        )
+    return nyears
+
+
+def level_summary(
+    level: str,
+    level_counts: LevelCounts,
+    categories: T.Sequence[str],
+    households: T.Optional[pd.DataFrame],
+    household_columns: T.Mapping[str, str],
+    nyears: T.Mapping[str, int],
+) -> pd.DataFrame:
+    """Table of the counts and rates of a level, with the ACS households of its areas.
+
+    households has a geoid_key column and the household columns of the categories; the
+    rates are missing for areas without ACS data.
+    """
+    keys, counts = level_counts
+    if np.array_equal(counts, np.round(counts)):
+        # Only counts reallocated from 2010 tracts can be fractional
+        counts = counts.astype(np.int64)
+    width = GEOID_DIGITS.get(level, ZIP_CODE_DIGITS)
+    summary = pd.DataFrame(
+        {'geoid_key': keys, 'geoid': geoid_key_to_str(keys, width).values}
+    )
+    for c, category in enumerate(categories):
+        summary[f'total_{category}'] = counts[:, c]
+    summary['total_housing_loss'] = counts.sum(axis=1)
+    household_list = list(dict.fromkeys(household_columns.values()))
+    if households is not None:
+        summary = summary.merge(
+            households[['geoid_key'] + household_list], on='geoid_key', how='left'
+        )
+    else:
+        for column in household_list:
+            summary[column] = np.nan
+    for category in categories:
+        rate = (
+            summary[f'total_{category}']
+            / summary[household_columns[category]]
+            / nyears[category]
+            if nyears[category]
+            else np.nan
+        )
+        # Areas without households have no rate
+        summary[f'rate_{category}'] = pd.Series(rate, index=summary.index).replace(
+            [np.inf, -np.inf], np.nan
+        )
+    summary.insert(0, 'level', level)
+    return summary.drop(columns='geoid_key')
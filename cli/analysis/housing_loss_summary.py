@@ -8,14 +8,38 @@ import numpy as np
 import pandas as pd
 from dateutil.relativedelta import *
 
+from analysis.space_time_cube import SpaceTimeCube
+from collection.date_parsing import parse_date_column
+from collection.geoid import geoid_key_to_str, merge_on_geoid
+
+if T.TYPE_CHECKING:
+    from collection.tract_crosswalk import TractCrosswalk
+
 # need below to suppress warnings associated with fake geoid code block - unnecessary for production code
 pd.options.mode.chained_assignment = None  # default='warn'
 
 
+# Date column of the records of each summary type
+DATE_COLUMNS = {
+    'evic': 'eviction_filing_date',
+    'mort': 'foreclosure_sale_date',
+    'tax': 'tax_lien_sale_date',
+}
+
+
 def summarize_housing_loss(
-    data_df: pd.DataFrame, pop_df: pd.DataFrame, type: str
+    data_df: pd.DataFrame,
+    pop_df: pd.DataFrame,
+    type: str,
+    cube: T.Optional[SpaceTimeCube] = None,
+    crosswalk: T.Optional['TractCrosswalk'] = None,
 ) -> T.Union[pd.DataFrame, None]:
-    """Summarize housing loss data from various geocoded dataframes."""
+    """Summarize housing loss data from various geocoded dataframes.
+
+    The yearly counts per geoid are taken from `cube`, a space-time cube holding (only)
+    the category of data_df; it is built from data_df if not given. If the records use
+    2010 tracts, a crosswalk reallocates their counts to the 2020 tracts of pop_df.
+    """
     # Check for empty inputs
     if data_df is None:
         return None
@@ -23,29 +47,31 @@ def summarize_housing_loss(
         print('\u2326  No ACS data available to calculate housing loss rates!')
         return None
 
-    # read in test data (this has same format as raw data incoming from partner and assumes the format of the delivered dates
-    # can be successfully inferred by datetime
+    # Dates are parsed once at load time; this only parses them if they were not, e.g.
+    # for geocoded data read back from disk
     if type == 'evic':
-        data_df['eviction_filing_date'] = pd.to_datetime(
-            data_df['eviction_filing_date'], infer_datetime_format=True
+        data_df['eviction_filing_date'] = parse_date_column(
+            data_df['eviction_filing_date']
         )
-        # need a better way to check for judgment dates
-        try:
-            data_df['eviction_judgment_Date'] = pd.to_datetime(
-                data_df['eviction_judgment_Date'], infer_datetime_format=True
+        # Judgment dates are optional
+        if 'eviction_judgment_date' in data_df.columns:
+            data_df['eviction_judgment_date'] = parse_date_column(
+                data_df['eviction_judgment_date']
             )
-        except:
-            print('no judgment data')
-
-    num_geoid = len(data_df.geoid.unique())
-
-    # dataframes for individual geoids to pull housing loss counts from
-    df_by_geoid = {}
 
     geoid_ser = data_df.geoid.unique()
 
+    # Housing loss counts by year and geoid come from the space-time cube of the run
+    if cube is None:
+        cube = SpaceTimeCube.from_frames({type: data_df}, {type: DATE_COLUMNS[type]})
+    if crosswalk is not None:
+        cube = crosswalk.reallocate(cube)
+        # The 2020 tracts that received counts of the records
+        located = cube.counts.sum(axis=(1, 2)) > 0
+        geoid_ser = geoid_key_to_str(cube.geoids[located]).values
+
     geoid_df = pd.DataFrame({'geoid': geoid_ser})
-    geoid_df = geoid_df.merge(pop_df, left_on='geoid', right_on='GEOID', how='left')
+    geoid_df = merge_on_geoid(geoid_df, pop_df, how='left')
 
     hhs_by_geoid = geoid_df.households_by_geoid
 
@@ -53,90 +79,23 @@ def summarize_housing_loss(
 
     # get year range present in the data
     if type == 'evic':
-        frst_yr_ev = min(data_df['eviction_filing_date']).year
-        last_yr_ev = max(data_df['eviction_filing_date']).year
-
-        yrs_ev = list(range(frst_yr_ev, last_yr_ev + 1))
+        # matrix that stores housing loss counts by year and geoid
+        yrs_ev, arr_ev = cube.year_counts(geoid_ser)
         nyrs_ev = len(yrs_ev)
 
-        # matrix that will store housing loss counts by year and geoid
-        arr_ev = [[0 for x in range(num_geoid)] for y in range(nyrs_ev)]
-
         # for total counts across all years
-        all_ev = {}
+        all_ev = arr_ev.sum(axis=0)
 
         if 'eviction_judgment_date' in data_df.columns:
-            frst_yr_jd = min(data_df['Eviction_Judgment_Date']).year
-            last_yr_jd = max(data_df['Eviction_Judgment_Date']).year
-
-            yrs_jd = list(range(frst_yr_jd, last_yr_jd + 1))
-            nyrs_jd = len(yrs_jd)
-
-            arr_jd = [[0 for x in range(num_geoid)] for y in range(nyrs_jd)]
-
-            all_jd = {}
-
-        for i in range(0, num_geoid):
-
-            geoid = geoid_ser[i]
-
-            df_by_geoid[i] = data_df.copy()
-            df_by_geoid[i] = df_by_geoid[i][df_by_geoid[i]['geoid'] == geoid]
-
-            len_ct_ev = len(
-                df_by_geoid[i]['eviction_filing_date']
-                .groupby(df_by_geoid[i]['eviction_filing_date'].dt.year)
-                .agg('count')
+            judgments = SpaceTimeCube.from_frames(
+                {'judgments': data_df}, {'judgments': 'eviction_judgment_date'}
             )
+            if crosswalk is not None:
+                judgments = crosswalk.reallocate(judgments)
+            yrs_jd, arr_jd = judgments.year_counts(geoid_ser)
+            nyrs_jd = len(yrs_jd)
 
-            all_ev[i] = 0
-
-            for j in range(0, len_ct_ev):
-                year = (
-                    df_by_geoid[i]['eviction_filing_date']
-                    .groupby(df_by_geoid[i]['eviction_filing_date'].dt.year)
-                    .agg('count')
-                    .index[j]
-                )
-                pos = year - frst_yr_ev
-
-                ev_ct = (
-                    df_by_geoid[i]['eviction_filing_date']
-                    .groupby(df_by_geoid[i]['eviction_filing_date'].dt.year)
-                    .agg('count')
-                    .array[j]
-                )
-
-                arr_ev[pos][i] = ev_ct
-                all_ev[i] += ev_ct
-
-            if 'eviction_judgment_date' in data_df.columns:
-
-                all_jd[i] = 0
-
-                len_ct_jd = len(
-                    df_by_geoid[i]['Eviction_Judgment_Date']
-                    .groupby(df_by_geoid[i]['Eviction_Judgment_Date'].dt.year)
-                    .agg('count')
-                )
-                for j in range(0, len_ct_jd):
-                    year = (
-                        df_by_geoid[i]['Eviction_Judgment_Date']
-                        .groupby(df_by_geoid[i]['Eviction_Judgment_Date'].dt.year)
-                        .agg('count')
-                        .index[j]
-                    )
-                    pos = year - frst_yr_jd
-
-                    jd_ct = (
-                        df_by_geoid[i]['Eviction_Judgment_Date']
-                        .groupby(df_by_geoid[i]['Eviction_Judgment_Date'].dt.year)
-                        .agg('count')
-                        .array[j]
-                    )
-
-                    arr_jd[pos][i] = jd_ct
-                    all_jd[i] += jd_ct
+            all_jd = arr_jd.sum(axis=0)
 
         # make output summary table column headings by year present in the data
         yrs_str_ev = [str(int) for int in yrs_ev]
@@ -182,57 +141,12 @@ def summarize_housing_loss(
             summ_dict.update(tmp_dict)
 
     else:
-        col_name = ''
-        if type == 'mort':
-            col_name = 'foreclosure_sale_date'
-        if type == 'tax':
-            col_name = 'tax_lien_sale_date'
-
-        frst_yr = min(data_df[col_name]).year
-        last_yr = max(data_df[col_name]).year
-
-        yrs = list(range(frst_yr, last_yr + 1))
+        # matrix that stores housing loss counts by year and geoid
+        yrs, arr = cube.year_counts(geoid_ser)
         nyrs = len(yrs)
 
-        # matrix that will store housing loss counts by year and geoid
-        arr = [[0 for x in range(num_geoid)] for y in range(nyrs)]
-
         # for total counts across all years
-        all_ct = {}
-
-        for i in range(0, num_geoid):
-
-            geoid = geoid_ser[i]
-
-            df_by_geoid[i] = data_df.copy()
-            df_by_geoid[i] = df_by_geoid[i][df_by_geoid[i]['geoid'] == geoid]
-
-            len_ct = len(
-                df_by_geoid[i][col_name]
-                .groupby(df_by_geoid[i][col_name].dt.year)
-                .agg('count')
-            )
-
-            all_ct[i] = 0
-
-            for j in range(0, len_ct):
-                year = (
-                    df_by_geoid[i][col_name]
-                    .groupby(df_by_geoid[i][col_name].dt.year)
-                    .agg('count')
-                    .index[j]
-                )
-                pos = year - frst_yr
-
-                my_ct = (
-                    df_by_geoid[i][col_name]
-                    .groupby(df_by_geoid[i][col_name].dt.year)
-                    .agg('count')
-                    .array[j]
-                )
-
-                arr[pos][i] = my_ct
-                all_ct[i] += my_ct
+        all_ct = arr.sum(axis=0)
 
         # make output summary table column headings by year present in the data
         yrs_str = [str(int) for int in yrs]
@@ -0,0 +1,312 @@
+"""
+Tract x month x category counts of housing loss events, built once per run
+
+The cube is a dense count array indexed by (tract, month, category), with a separate
+(month, category) array for the records that could not be located in a tract, so that
+site-level totals still include them. Summaries, time series and later analyses read
+their counts from the cube instead of re-scanning the geocoded records. Counts are
+integers, except after reallocation to other tracts, which can make them fractional.
+
+The cube is saved to disk as an NPZ file holding only its non-zero cells.
+"""
+
+import typing as T
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from analysis.timeseries import stack_event_dates
+from collection.geoid import geoid_key_to_str, to_geoid_key
+
+COUNT_DTYPE = np.int32
+
+
+class SpaceTimeCube:
+    """Event counts by tract GEOID key, month and category."""
+
+    def __init__(
+        self,
+        counts: np.ndarray,
+        geoids: np.ndarray,
+        months: np.ndarray,
+        categories: T.Sequence[str],
+        unlocated: T.Optional[np.ndarray] = None,
+    ) -> None:
+        self.counts = counts
+        # Sorted integer GEOID keys and consecutive datetime64[M] months
+        self.geoids = np.asarray(geoids, dtype=np.int64)
+        self.months = np.asarray(months, dtype='datetime64[M]')
+        self.categories = list(categories)
+        if unlocated is None:
+            unlocated = np.zeros(counts.shape[1:], dtype=COUNT_DTYPE)
+        self.unlocated = unlocated
+
+    def __repr__(self) -> str:
+        return (
+            f'SpaceTimeCube({len(self.geoids)} tracts x {len(self.months)} months'
+            f' x {len(self.categories)} categories, {self.total()} events)'
+        )
+
+    @property
+    def shape(self) -> T.Tuple[int, int, int]:
+        return self.counts.shape
+
+    @property
+    def sum_dtype(self) -> np.dtype:
+        """Type of sums of counts: int64, or float64 for fractional (reallocated) ones."""
+        return np.result_type(self.counts.dtype, np.int64)
+
+    # Construction
+
+    @classmethod
+    def from_events(
+        cls, events: pd.DataFrame, categories: T.Optional[T.Sequence[str]] = None
+    ) -> 'SpaceTimeCube':
+        """Build the cube from a frame of category, date and geoid (key) columns."""
+        if categories is None:
+            categories = list(pd.unique(events['category']))
+        category_codes = pd.Categorical(events['category'], categories=categories).codes
+        event_months = events['date'].values.astype('datetime64[M]')
+        if len(events):
+            months = np.arange(
+                event_months.min(), event_months.max() + 1, dtype='datetime64[M]'
+            )
+        else:
+            months = np.array([], dtype='datetime64[M]')
+        month_codes = (
+            (event_months - months[0]).astype(np.int64)
+            if len(months)
+            else np.zeros(0, dtype=np.int64)
+        )
+
+        geoid_keys = pd.array(events['geoid'], dtype='Int64')
+        located = ~np.asarray(pd.isna(geoid_keys)) & (category_codes >= 0)
+        geoids, geoid_codes = np.unique(
+            geoid_keys[located].to_numpy(dtype=np.int64), return_inverse=True
+        )
+        counts = np.zeros((len(geoids), len(months), len(categories)), COUNT_DTYPE)
+        np.add.at(
+            counts,
+            (geoid_codes, month_codes[located], category_codes[located]),
+            1,
+        )
+        unlocated = np.zeros((len(months), len(categories)), COUNT_DTYPE)
+        unmatched = ~located & (category_codes >= 0)
+        np.add.at(unlocated, (month_codes[unmatched], category_codes[unmatched]), 1)
+        return cls(counts, geoids, months, categories, unlocated)
+
+    @classmethod
+    def from_frames(
+        cls,
+        data_by_category: T.Mapping[str, T.Union[pd.DataFrame, None]],
+        date_columns: T.Mapping[str, str],
+    ) -> 'SpaceTimeCube':
+        """Build the cube from the (geocoded) records of each category."""
+        return cls.from_events(
+            stack_event_dates(data_by_category, date_columns), list(data_by_category)
+        )
+
+    # Slicing
+
+    def geoid_positions(self, geoids: T.Any) -> np.ndarray:
+        """Positions of the given GEOIDs (any format) in the cube, -1 if absent."""
+        keys = to_geoid_key(geoids)
+        missing = keys.isna().to_numpy()
+        keys = keys.fillna(-1).to_numpy(dtype=np.int64)
+        positions = np.searchsorted(self.geoids, keys)
+        positions = np.minimum(positions, max(len(self.geoids) - 1, 0))
+        found = ~missing & (len(self.geoids) > 0)
+        if len(self.geoids):
+            found &= self.geoids[positions] == keys
+        return np.where(found, positions, -1)
+
+    def select(
+        self,
+        geoids: T.Any = None,
+        start: T.Any = None,
+        end: T.Any = None,
+        categories: T.Optional[T.Sequence[str]] = None,
+    ) -> 'SpaceTimeCube':
+        """Sub-cube of the given tracts, months and categories.
+
+        The months run from start to end inclusive; unknown tracts are left out.
+        """
+        geoid_index = slice(None)
+        if geoids is not None:
+            positions = self.geoid_positions(geoids)
+            geoid_index = np.unique(positions[positions >= 0])
+        first = 0 if start is None else np.datetime64(start, 'M') - self.months[0]
+        last = (
+            len(self.months)
+            if end is None
+            else np.datetime64(end, 'M') - self.months[0] + 1
+        )
+        month_index = slice(max(int(first), 0), max(int(last), 0))
+        category_index = (
+            list(range(len(self.categories)))
+            if categories is None
+            else [self.categories.index(c) for c in categories]
+        )
+        unlocated = self.unlocated[month_index][:, category_index]
+        if geoids is not None:
+            # Records without a tract only count for the site as a whole
+            unlocated = np.zeros_like(unlocated)
+        return SpaceTimeCube(
+            self.counts[geoid_index][:, month_index][:, :, category_index],
+            self.geoids[geoid_index],
+            self.months[month_index],
+            [self.categories[i] for i in category_index],
+            unlocated,
+        )
+
+    def reallocate(self, matrix: T.Any, geoids: np.ndarray) -> 'SpaceTimeCube':
+        """Cube of the counts moved to other tracts by a (new tract x tract) matrix.
+
+        The counts of all months and categories are reallocated with one (sparse)
+        matrix product; with fractional weights the counts become fractional too.
+        """
+        tracts, months, categories = self.counts.shape
+        counts = matrix @ self.counts.reshape(tracts, months * categories)
+        return SpaceTimeCube(
+            np.asarray(counts).reshape(len(geoids), months, categories),
+            geoids,
+            self.months,
+            self.categories,
+            self.unlocated,
+        )
+
+    def category_months(self, category: str) -> np.ndarray:
+        """Months from the first to the last event of a category (empty if none)."""
+        c = self.categories.index(category)
+        monthly = self.counts[:, :, c].sum(axis=0) + self.unlocated[:, c]
+        nonzero = np.flatnonzero(monthly)
+        if not len(nonzero):
+            return self.months[:0]
+        return self.months[nonzero[0] : nonzero[-1] + 1]
+
+    # Rollups
+
+    def total(self) -> int:
+        return int(round(self.counts.sum() + self.unlocated.sum()))
+
+    def site_counts(self) -> np.ndarray:
+        """Counts by month and category for the whole site, with unlocated records."""
+        return self.counts.sum(axis=0) + self.unlocated
+
+    def tract_totals(self) -> pd.DataFrame:
+        """Counts over all months, by tract (11-character GEOID) and category."""
+        return pd.DataFrame(
+            self.counts.sum(axis=1),
+            index=pd.Index(geoid_key_to_str(self.geoids).values, name='geoid'),
+            columns=self.categories,
+        )
+
+    def rolling_sum(self, window: int) -> np.ndarray:
+        """Trailing `window`-month sums for every tract and category.
+
+        The first window - 1 months hold the sums of the months available so far.
+        """
+        cumulative = np.cumsum(self.counts, axis=1, dtype=self.sum_dtype)
+        rolled = cumulative.copy()
+        rolled[:, window:] -= cumulative[:, :-window]
+        return rolled
+
+    def year_counts(
+        self, geoids: T.Any, category: T.Optional[str] = None
+    ) -> T.Tuple[np.ndarray, np.ndarray]:
+        """Counts per year (rows) and tract (columns) for the given GEOIDs.
+
+        The years run from the first to the last event of the category, including the
+        records without a tract. Tracts without events (or GEOIDs) get zero counts.
+        """
+        category = category or self.categories[0]
+        months = self.category_months(category)
+        positions = self.geoid_positions(geoids)
+        if not len(months):
+            return np.array([], dtype=int), np.zeros((0, len(positions)), COUNT_DTYPE)
+        month_years = self.months.astype('datetime64[Y]').astype(int) + 1970
+        years = np.arange(
+            months[0].astype('datetime64[Y]').astype(int) + 1970,
+            months[-1].astype('datetime64[Y]').astype(int) + 1971,
+        )
+        # Sum the months of each year with a (month x year) indicator matrix
+        month_in_year = (month_years[:, None] == years[None, :]).astype(np.int64)
+        by_year = self.counts[:, :, self.categories.index(category)] @ month_in_year
+        by_year = np.vstack([by_year, np.zeros((1, len(years)), dtype=np.int64)])
+        # Position -1 selects the appended row of zeros
+        return years, by_year[positions].T
+
+    def count_table(self, by_tract: bool = False) -> pd.DataFrame:
+        """Zero-filled monthly counts in the format of `timeseries.count_events`.
+
+        Each category covers the months from its first to its last event; tracts are
+        listed if they have any event of that category.
+        """
+        tables = []
+        for c, category in enumerate(self.categories):
+            months = self.category_months(category)
+            if not len(months):
+                continue
+            month_index = slice(
+                int(months[0] - self.months[0]), int(months[-1] - self.months[0]) + 1
+            )
+            period_start = pd.DatetimeIndex(months.astype('datetime64[ns]'))
+            if by_tract:
+                counts = self.counts[:, month_index, c]
+                tracts = np.flatnonzero(counts.sum(axis=1))
+                geoids = geoid_key_to_str(self.geoids[tracts]).values
+                table = pd.DataFrame(
+                    {
+                        'category': category,
+                        'geoid': np.repeat(geoids, len(months)),
+                        'period_start': np.tile(period_start, len(tracts)),
+                        'count': counts[tracts].ravel().astype(self.sum_dtype),
+                    }
+                )
+            else:
+                table = pd.DataFrame(
+                    {
+                        'category': category,
+                        'period_start': period_start,
+                        'count': self.site_counts()[month_index, c].astype(
+                            self.sum_dtype
+                        ),
+                    }
+                )
+            tables.append(table)
+        columns = ['category'] + (['geoid'] if by_tract else [])
+        columns += ['period_start', 'count']
+        if not tables:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(tables, ignore_index=True)[columns]
+
+    # Persistence
+
+    def save(self, path: T.Union[str, Path]) -> None:
+        """Save the non-zero cells of the cube to an NPZ file."""
+        cells = np.nonzero(self.counts)
+        np.savez_compressed(
+            path,
+            shape=np.array(self.counts.shape),
+            cells=np.vstack(cells).astype(np.int32),
+            values=self.counts[cells],
+            geoids=self.geoids,
+            months=self.months.astype(str),
+            categories=np.array(self.categories),
+            unlocated=self.unlocated,
+        )
+
+    @classmethod
+    def load(cls, path: T.Union[str, Path]) -> 'SpaceTimeCube':
+        with np.load(path) as npz:
+            # Reallocated cubes hold fractional counts
+            counts = np.zeros(tuple(npz['shape']), dtype=npz['values'].dtype)
+            counts[tuple(npz['cells'])] = npz['values']
+            return cls(
+                counts,
+                npz['geoids'],
+                npz['months'].astype('datetime64[M]'),
+                [str(c) for c in npz['categories']],
+                npz['unlocated'],
+            )
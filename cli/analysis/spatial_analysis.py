@@ -0,0 +1,218 @@
+"""
+Spatial autocorrelation and hot spots of housing loss over census tract adjacency
+
+Tracts are neighbours when their boundaries share at least one point (queen
+contiguity); candidate pairs are found with an STRtree spatial index. Global Moran's I
+measures how clustered a measure is over the whole site, and the local Getis-Ord Gi*
+statistic locates its hot and cold spots. Both are tested with permutations that are
+computed for all tracts at once.
+"""
+
+import typing as T
+from pathlib import Path
+
+import geopandas
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from shapely import STRtree
+
+from collection.disk_cache import load_or_fetch
+from collection.geoid import normalize_geoid
+from const import (
+    RANDOM_SEED,
+    SPATIAL_ANALYSIS_VARIABLES,
+    SPATIAL_PERMUTATIONS,
+    STAT_SIGNIFICANCE_CUTOFF,
+)
+
+# Number of tracts whose permutations are evaluated together, to bound memory use
+PERMUTATION_CHUNK_SIZE = 256
+
+
+def queen_weights(geometries: geopandas.GeoSeries) -> sparse.csr_matrix:
+    """Binary, symmetric adjacency matrix of polygons that share a boundary point."""
+    geometries = np.asarray(geometries.values)
+    tree = STRtree(geometries)
+    left, right = tree.query(geometries, predicate='intersects')
+    pairs = left != right
+    n = len(geometries)
+    adjacency = sparse.csr_matrix(
+        (np.ones(pairs.sum()), (left[pairs], right[pairs])), shape=(n, n)
+    )
+    return ((adjacency + adjacency.T) > 0).astype(np.float64).tocsr()
+
+
+def tract_weights(
+    tracts_gdf: geopandas.GeoDataFrame,
+    cache_dir: T.Union[str, Path, None] = None,
+    cache_key: T.Optional[str] = None,
+) -> T.Tuple[np.ndarray, sparse.csr_matrix]:
+    """GEOIDs and queen contiguity weights of the tracts, cached under cache_key."""
+
+    def build_weights() -> T.Tuple[np.ndarray, sparse.csr_matrix]:
+        geoids = normalize_geoid(tracts_gdf['geoid']).values
+        return geoids, queen_weights(tracts_gdf.geometry)
+
+    if cache_key is None:
+        return build_weights()
+    return load_or_fetch(cache_dir, cache_key, build_weights)
+
+
+def folded_pseudo_p_values(observed: np.ndarray, simulated: np.ndarray) -> np.ndarray:
+    """Pseudo p-values of statistics against their permutations (the last axis).
+
+    Counts the simulations at least as extreme, in the direction of the observed value.
+    """
+    permutations = simulated.shape[-1]
+    larger = (simulated >= observed[..., None]).sum(axis=-1)
+    extreme = np.minimum(larger, permutations - larger)
+    return (extreme + 1) / (permutations + 1)
+
+
+def morans_i(
+    values: np.ndarray,
+    weights: sparse.csr_matrix,
+    permutations: int = SPATIAL_PERMUTATIONS,
+    seed: int = RANDOM_SEED,
+) -> T.Tuple[float, float]:
+    """Global Moran's I with row-standardized weights, and its pseudo p-value."""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    deviations = values - values.mean()
+    variance = deviations @ deviations
+    row_sums = np.asarray(weights.sum(axis=1)).ravel()
+    row_standardized = (
+        sparse.diags(np.divide(1, row_sums, out=np.zeros(n), where=row_sums > 0))
+        @ weights
+    )
+    total_weight = row_standardized.sum()
+    if variance == 0 or total_weight == 0:
+        return np.nan, np.nan
+    observed = n / total_weight * (deviations @ (row_standardized @ deviations))
+    observed /= variance
+
+    # All permutations at once, as the columns of an (n x permutations) matrix
+    rng = np.random.default_rng(seed)
+    permuted = deviations[rng.random((permutations, n)).argsort(axis=1)].T
+    simulated = (
+        n
+        / total_weight
+        * (permuted * (row_standardized @ permuted)).sum(axis=0)
+        / variance
+    )
+    return float(observed), float(folded_pseudo_p_values(np.array(observed), simulated))
+
+
+def getis_ord_g_star(
+    values: np.ndarray,
+    weights: sparse.csr_matrix,
+    permutations: int = SPATIAL_PERMUTATIONS,
+    seed: int = RANDOM_SEED,
+) -> T.Tuple[np.ndarray, np.ndarray]:
+    """Local Getis-Ord Gi* z-scores and their conditional permutation p-values.
+
+    Uses binary weights that include each tract itself.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    cardinalities = np.asarray(weights.sum(axis=1)).ravel().astype(int)
+    neighbour_sums = weights @ values
+
+    # Analytical z-scores; each tract is its own neighbour
+    star_weights = cardinalities + 1
+    mean = values.mean()
+    std = values.std()
+    spread = np.sqrt((n * star_weights - star_weights**2) / max(n - 1, 1))
+    denominator = std * spread
+    z_scores = np.divide(
+        values + neighbour_sums - mean * star_weights,
+        denominator,
+        out=np.zeros(n),
+        where=denominator > 0,
+    )
+
+    # Each tract keeps its value and gets random neighbours from the other tracts. The
+    # same random draws are shared by all tracts: draw indices among n - 1 tracts and
+    # skip over the tract itself.
+    max_neighbours = int(cardinalities.max()) if n else 0
+    if n < 2 or max_neighbours == 0:
+        return z_scores, np.ones(n)
+    rng = np.random.default_rng(seed)
+    draws = rng.random((permutations, n - 1)).argsort(axis=1)[:, :max_neighbours]
+    p_values = np.empty(n)
+    for start in range(0, n, PERMUTATION_CHUNK_SIZE):
+        tracts = np.arange(start, min(start + PERMUTATION_CHUNK_SIZE, n))
+        others = draws[None] + (draws[None] >= tracts[:, None, None])
+        in_neighbourhood = np.arange(max_neighbours) < cardinalities[tracts, None, None]
+        simulated = (values[others] * in_neighbourhood).sum(axis=2)
+        p_values[tracts] = folded_pseudo_p_values(neighbour_sums[tracts], simulated)
+    return z_scores, p_values
+
+
+def classify_hot_spots(
+    z_scores: np.ndarray,
+    p_values: np.ndarray,
+    cutoff: float = STAT_SIGNIFICANCE_CUTOFF,
+) -> np.ndarray:
+    significant = p_values <= cutoff
+    return np.select(
+        [significant & (z_scores > 0), significant & (z_scores < 0)],
+        ['hot spot', 'cold spot'],
+        'not significant',
+    )
+
+
+def add_spatial_statistics(
+    tracts_gdf: geopandas.GeoDataFrame,
+    weight_geoids: np.ndarray,
+    weights: sparse.csr_matrix,
+    variables: T.Sequence[str] = SPATIAL_ANALYSIS_VARIABLES,
+    permutations: int = SPATIAL_PERMUTATIONS,
+    seed: int = RANDOM_SEED,
+) -> geopandas.GeoDataFrame:
+    """Add local and global spatial statistics of each variable as columns.
+
+    Per tract these are the Gi* z-score, p-value and hot spot class, and for the site
+    Moran's I and its p-value. Tracts without a value of a variable are left out of
+    its analysis.
+    """
+    tracts_gdf = tracts_gdf.copy()
+    positions = pd.Index(weight_geoids).get_indexer(
+        normalize_geoid(tracts_gdf['geoid'])
+    )
+    for variable in variables:
+        if variable not in tracts_gdf.columns:
+            continue
+        values = pd.to_numeric(tracts_gdf[variable], errors='coerce').to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+        included = ~np.isnan(values) & (positions >= 0)
+        z_scores = np.full(len(tracts_gdf), np.nan)
+        p_values = np.full(len(tracts_gdf), np.nan)
+        global_i, global_p = np.nan, np.nan
+        if included.sum() >= 3:
+            subset = weights[positions[included]][:, positions[included]]
+            global_i, global_p = morans_i(values[included], subset, permutations, seed)
+            z_scores[included], p_values[included] = getis_ord_g_star(
+                values[included], subset, permutations, seed
+            )
+        if np.isnan(global_i):
+            print(
+                '\u2326 ',
+                f'Too few neighbouring tracts with {variable} values to measure',
+                'their spatial clustering',
+            )
+        else:
+            print(
+                f"\u2713  Moran's I of {variable}: {global_i:.3f}",
+                f'(pseudo p-value {global_p:.3f})',
+            )
+        tracts_gdf[f'{variable}_gi_z'] = z_scores
+        tracts_gdf[f'{variable}_gi_p'] = p_values
+        tracts_gdf[f'{variable}_hot_spot'] = np.where(
+            included, classify_hot_spots(z_scores, p_values), None
+        )
+        tracts_gdf[f'{variable}_morans_i'] = global_i
+        tracts_gdf[f'{variable}_morans_p'] = global_p
+    return tracts_gdf
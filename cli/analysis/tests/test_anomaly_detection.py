@@ -0,0 +1,75 @@
+from unittest import TestCase
+
+import numpy as np
+
+from analysis.anomaly_detection import (
+    alert_table,
+    forecast_table,
+    score_cube,
+    seasonal_factors,
+)
+from analysis.space_time_cube import SpaceTimeCube
+
+CATEGORIES = ['evictions', 'mortgage_foreclosures']
+
+
+def seasonal_cube(tracts: int = 50, months: int = 48, seed: int = 0) -> SpaceTimeCube:
+    """Poisson counts with twice as many filings every January."""
+    rng = np.random.default_rng(seed)
+    month_range = np.arange(np.datetime64('2016-01'), np.datetime64('2016-01') + months)
+    season = np.where(month_range.astype(int) % 12 == 0, 2.0, 1.0)
+    counts = rng.poisson(4 * season[None, :, None], (tracts, months, len(CATEGORIES)))
+    return SpaceTimeCube(
+        counts.astype(np.int32),
+        24021750000 + np.arange(tracts) * 100,
+        month_range,
+        CATEGORIES,
+    )
+
+
+class AnomalyDetectionTests(TestCase):
+    def setUp(self):
+        self.cube = seasonal_cube()
+
+    def test_seasonal_factors(self):
+        factors = seasonal_factors(self.cube.counts, self.cube.months)
+        self.assertEqual(factors.shape, (12, 2))
+        self.assertGreater(factors[0, 0], 1.7)
+        self.assertLess(abs(factors[6, 0] - 0.92), 0.1)
+
+    def test_january_is_not_an_anomaly(self):
+        scored = score_cube(self.cube)
+        # No scores without enough history
+        self.assertTrue(np.isnan(scored['scores'][:, :6]).all())
+        january_scores = scored['scores'][:, 36, 0]
+        self.assertLess(abs(np.nanmean(january_scores)), 0.5)
+
+    def test_spike_is_ranked_first(self):
+        self.cube.counts[7, -1, 0] += 30
+        self.cube.counts[3, -2, 1] += 15
+        alerts = alert_table(self.cube)
+        self.assertEqual(list(alerts['rank'][:2]), [1, 2])
+        first = alerts.iloc[0]
+        self.assertEqual(
+            (first['geoid'], first['month'], first['category']),
+            ('24021750700', '2019-12', 'evictions'),
+        )
+        self.assertEqual(alerts.iloc[1]['geoid'], '24021750300')
+        self.assertTrue((alerts['anomaly_score'].diff().dropna() <= 0).all())
+
+    def test_forecasts(self):
+        forecasts = forecast_table(self.cube, horizon=2)
+        self.assertEqual(len(forecasts), 50 * 2 * 2)
+        self.assertEqual(sorted(forecasts['month'].unique()), ['2020-01', '2020-02'])
+        january = forecasts[forecasts['month'] == '2020-01']['forecast'].mean()
+        february = forecasts[forecasts['month'] == '2020-02']['forecast'].mean()
+        self.assertGreater(january, 1.5 * february)
+
+    def test_empty_cube(self):
+        empty = SpaceTimeCube(
+            np.zeros((0, 0, 2), dtype=np.int32),
+            [],
+            np.array([], 'datetime64[M]'),
+            CATEGORIES,
+        )
+        self.assertTrue(alert_table(empty).empty)
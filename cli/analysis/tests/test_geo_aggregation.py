@@ -0,0 +1,124 @@
+import io
+from unittest import TestCase
+
+import pandas as pd
+
+from analysis.acs_data import acs_geography, acs_geography_key
+from analysis.geo_aggregation import aggregate_levels, level_summary, years_of_data
+from collection.tract_crosswalk import TractCrosswalk, read_tract_relationship
+
+DATE_COLUMNS = {'evictions': 'filing_date', 'mortgage_foreclosures': 'sale_date'}
+HOUSEHOLD_COLUMNS = {
+    'evictions': 'total-renter-occupied-households',
+    'mortgage_foreclosures': 'total-owner-occupied-households',
+}
+
+
+class GeoAggregationTests(TestCase):
+    def setUp(self):
+        self.data = {
+            'evictions': pd.DataFrame(
+                {
+                    'filing_date': pd.to_datetime(
+                        ['2019-12-05', '2020-01-20', '2020-03-02', '2020-03-09']
+                    ),
+                    'geoid': ['24021750100', '24021750100', '24021750200', None],
+                    'block': ['1001', '2004', '1010', None],
+                    'zip_code_clean': ['21701', '21701', '21702-1234', None],
+                }
+            ),
+            # Records with a tract GEOID but no block are counted from tracts up
+            'mortgage_foreclosures': pd.DataFrame(
+                {
+                    'sale_date': pd.to_datetime(['2020-02-03', '2020-05-03']),
+                    'geoid': [24021750200, 24005400100],
+                    'zip_code': ['21702', '21204'],
+                }
+            ),
+        }
+
+    def test_levels_roll_up_from_block_groups(self):
+        counts = aggregate_levels(self.data)
+        keys, block_group_counts = counts['block_group']
+        self.assertEqual(list(keys), [240217501001, 240217501002, 240217502001])
+        self.assertEqual(block_group_counts[:, 0].tolist(), [1, 1, 1])
+        self.assertEqual(block_group_counts[:, 1].tolist(), [0, 0, 0])
+
+        keys, tract_counts = counts['tract']
+        self.assertEqual(list(keys), [24005400100, 24021750100, 24021750200])
+        self.assertEqual(tract_counts.tolist(), [[0, 1], [2, 0], [1, 1]])
+
+        keys, county_counts = counts['county']
+        self.assertEqual(list(keys), [24005, 24021])
+        self.assertEqual(county_counts.tolist(), [[0, 1], [3, 1]])
+
+        keys, zip_counts = counts['zip']
+        self.assertEqual(list(keys), [21204, 21701, 21702])
+        self.assertEqual(zip_counts.tolist(), [[0, 1], [2, 0], [1, 1]])
+
+    def test_crosswalk_reallocates_tract_counts(self):
+        relationship = read_tract_relationship(
+            io.StringIO(
+                'tr2010ge,tr2020ge,wt_hu\n'
+                '24021750200,24021750201,0.5\n'
+                '24021750200,24021750202,0.5\n'
+            ),
+            sep=',',
+        )
+        crosswalks = {
+            'mortgage_foreclosures': TractCrosswalk(relationship, 'housing_units')
+        }
+        keys, tract_counts = aggregate_levels(self.data, ['tract'], crosswalks)['tract']
+        self.assertEqual(
+            list(keys),
+            [24005400100, 24021750100, 24021750200, 24021750201, 24021750202],
+        )
+        self.assertEqual(tract_counts[:, 1].tolist(), [1, 0, 0, 0.5, 0.5])
+        self.assertEqual(tract_counts[:, 0].tolist(), [0, 2, 1, 0, 0])
+
+    def test_level_summary(self):
+        counts = aggregate_levels(self.data, ['county'])
+        households = pd.DataFrame(
+            {
+                'geoid_key': [24021],
+                'total-renter-occupied-households': [100],
+                'total-owner-occupied-households': [0],
+            }
+        )
+        nyears = years_of_data(self.data, DATE_COLUMNS)
+        self.assertEqual(nyears, {'evictions': 2, 'mortgage_foreclosures': 1})
+        summary = level_summary(
+            'county',
+            counts['county'],
+            list(self.data),
+            households,
+            HOUSEHOLD_COLUMNS,
+            nyears,
+        )
+        self.assertEqual(summary['geoid'].tolist(), ['24005', '24021'])
+        self.assertEqual(summary['total_housing_loss'].tolist(), [1, 4])
+        self.assertEqual(summary['rate_evictions'].tolist()[1], 0.015)
+        # No ACS data for the first county and no owners in the second one
+        self.assertTrue(summary['rate_evictions'].isna().tolist()[0])
+        self.assertTrue(summary['rate_mortgage_foreclosures'].isna().all())
+
+    def test_acs_geography_keys(self):
+        self.assertEqual(
+            acs_geography('block_group', '24', '021')['in'],
+            'state:24 county:021 tract:*',
+        )
+        data = pd.DataFrame(
+            {
+                'state': ['24'],
+                'county': ['021'],
+                'tract': ['750100'],
+                'block group': ['2'],
+                'zip code tabulation area': ['21701'],
+            }
+        )
+        self.assertEqual(acs_geography_key(data, 'block_group')[0], 240217501002)
+        self.assertEqual(acs_geography_key(data, 'tract')[0], 24021750100)
+        self.assertEqual(acs_geography_key(data, 'county')[0], 24021)
+        self.assertEqual(acs_geography_key(data, 'zip')[0], 21701)
+        with self.assertRaises(ValueError):
+            acs_geography('place', '24', '021')
@@ -0,0 +1,93 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from analysis.space_time_cube import SpaceTimeCube
+from analysis.timeseries import count_events, stack_event_dates
+
+DATE_COLUMNS = {'evictions': 'filing_date', 'mortgage_foreclosures': 'sale_date'}
+
+
+class SpaceTimeCubeTests(TestCase):
+    def setUp(self):
+        self.data = {
+            'evictions': pd.DataFrame(
+                {
+                    'filing_date': pd.to_datetime(
+                        ['2019-12-05', '2020-01-20', '2020-03-02', '2020-03-09']
+                    ),
+                    'geoid': ['24021750100', '24021750200', '24021750100', None],
+                }
+            ),
+            'mortgage_foreclosures': pd.DataFrame(
+                {
+                    'sale_date': pd.to_datetime(['2020-02-03']),
+                    'geoid': [24021750200],
+                }
+            ),
+        }
+        self.cube = SpaceTimeCube.from_frames(self.data, DATE_COLUMNS)
+
+    def test_build(self):
+        self.assertEqual(self.cube.shape, (2, 4, 2))
+        self.assertEqual(list(self.cube.geoids), [24021750100, 24021750200])
+        self.assertEqual(self.cube.total(), 5)
+        # The record without a tract only counts for the site
+        self.assertEqual(self.cube.counts.sum(), 4)
+        self.assertEqual(list(self.cube.site_counts()[:, 0]), [1, 1, 0, 2])
+
+    def test_select(self):
+        sub_cube = self.cube.select(
+            geoids=['24021750100', '24021999999'],
+            start='2020-01',
+            end='2020-03',
+            categories=['evictions'],
+        )
+        self.assertEqual(sub_cube.shape, (1, 3, 1))
+        self.assertEqual(list(sub_cube.counts[0, :, 0]), [0, 0, 1])
+        self.assertEqual(sub_cube.unlocated.sum(), 0)
+
+    def test_rollups(self):
+        totals = self.cube.tract_totals()
+        self.assertEqual(totals.loc['24021750200', 'mortgage_foreclosures'], 1)
+        rolled = self.cube.rolling_sum(2)
+        self.assertEqual(list(rolled[0, :, 0]), [1, 1, 0, 1])
+
+        years, counts = self.cube.year_counts(
+            ['24021750100', None, '24021750200'], 'evictions'
+        )
+        self.assertEqual(list(years), [2019, 2020])
+        np.testing.assert_array_equal(counts, [[1, 0, 0], [1, 0, 1]])
+
+    def test_fractional_counts(self):
+        # Split the counts of the first tract between two tracts, as a crosswalk does
+        matrix = np.array([[0.25, 0.0], [0.75, 1.0]])
+        cube = self.cube.reallocate(matrix, np.array([24021750300, 24021750400]))
+        rolled = cube.rolling_sum(2)
+        np.testing.assert_allclose(
+            rolled[:, :, 0], [[0.25, 0.25, 0, 0.25], [0.75, 1.75, 1, 0.75]]
+        )
+        table = cube.count_table(by_tract=True)
+        self.assertAlmostEqual(table['count'].sum(), 4.0)
+        self.assertIn(0.25, list(table['count']))
+
+    def test_count_table_matches_timeseries(self):
+        events = stack_event_dates(self.data, DATE_COLUMNS)
+        for by_tract in (False, True):
+            pd.testing.assert_frame_equal(
+                self.cube.count_table(by_tract),
+                count_events(events, by_tract=by_tract),
+            )
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / 'cube.npz'
+            self.cube.save(path)
+            loaded = SpaceTimeCube.load(path)
+        np.testing.assert_array_equal(loaded.counts, self.cube.counts)
+        np.testing.assert_array_equal(loaded.unlocated, self.cube.unlocated)
+        np.testing.assert_array_equal(loaded.months, self.cube.months)
+        self.assertEqual(loaded.categories, self.cube.categories)
@@ -0,0 +1,78 @@
+import tempfile
+from unittest import TestCase
+
+import geopandas
+import numpy as np
+from shapely.geometry import box
+
+from analysis.spatial_analysis import (
+    add_spatial_statistics,
+    getis_ord_g_star,
+    morans_i,
+    queen_weights,
+    tract_weights,
+)
+
+GRID_SIZE = 10
+
+
+def grid_tracts() -> geopandas.GeoDataFrame:
+    """A 10 x 10 grid of square tracts."""
+    return geopandas.GeoDataFrame(
+        {'geoid': [f'24021{750000 + i * 100}' for i in range(GRID_SIZE**2)]},
+        geometry=[
+            box(col, row, col + 1, row + 1)
+            for row in range(GRID_SIZE)
+            for col in range(GRID_SIZE)
+        ],
+    )
+
+
+class SpatialAnalysisTests(TestCase):
+    def setUp(self):
+        self.tracts = grid_tracts()
+        self.weights = queen_weights(self.tracts.geometry)
+        # A cluster of high values in one corner of the grid
+        self.values = np.random.default_rng(0).random(GRID_SIZE**2)
+        self.values.reshape(GRID_SIZE, GRID_SIZE)[:3, :3] += 10
+
+    def test_queen_weights(self):
+        cardinalities = np.asarray(self.weights.sum(axis=1)).ravel()
+        # Corner, edge and interior tracts (shared corners count as neighbours)
+        self.assertEqual(cardinalities[0], 3)
+        self.assertEqual(cardinalities[1], 5)
+        self.assertEqual(cardinalities[GRID_SIZE + 1], 8)
+        self.assertEqual((self.weights != self.weights.T).nnz, 0)
+
+    def test_morans_i(self):
+        clustered_i, clustered_p = morans_i(self.values, self.weights, 199)
+        self.assertGreater(clustered_i, 0.3)
+        self.assertLessEqual(clustered_p, 0.01)
+
+        random_values = np.random.default_rng(1).random(GRID_SIZE**2)
+        random_i, random_p = morans_i(random_values, self.weights, 199)
+        self.assertLess(abs(random_i), 0.2)
+        self.assertGreater(random_p, 0.01)
+
+    def test_getis_ord_g_star(self):
+        z_scores, p_values = getis_ord_g_star(self.values, self.weights, 199)
+        self.assertGreater(z_scores[GRID_SIZE + 1], 3)
+        self.assertLessEqual(p_values[GRID_SIZE + 1], 0.01)
+        self.assertLess(z_scores[-1], 0)
+
+    def test_add_spatial_statistics(self):
+        tracts = self.tracts.iloc[::-1].copy()
+        tracts['total_filings'] = self.values[::-1]
+        tracts.loc[tracts.index[0], 'total_filings'] = np.nan
+        with tempfile.TemporaryDirectory() as cache_dir:
+            weight_geoids, weights = tract_weights(self.tracts, cache_dir, 'grid')
+            # The second call reads the cached weights
+            weight_geoids, weights = tract_weights(None, cache_dir, 'grid')
+        result = add_spatial_statistics(
+            tracts, weight_geoids, weights, ['total_filings', 'missing'], 99
+        )
+        corner = result.set_index('geoid').loc['24021750000']
+        self.assertEqual(corner['total_filings_hot_spot'], 'hot spot')
+        self.assertTrue(np.isnan(result['total_filings_gi_z'].iloc[0]))
+        self.assertEqual(result['total_filings_morans_i'].nunique(), 1)
+        self.assertNotIn('missing_gi_z', result.columns)
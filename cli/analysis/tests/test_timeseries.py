@@ -0,0 +1,79 @@
+from unittest import TestCase
+
+import pandas as pd
+
+from analysis.timeseries import (
+    count_events,
+    create_timeseries_tables,
+    stack_event_dates,
+)
+
+DATE_COLUMNS = {'evictions': 'filing_date', 'mortgage_foreclosures': 'sale_date'}
+
+
+class TimeseriesTests(TestCase):
+    def setUp(self):
+        self.evictions = pd.DataFrame(
+            {
+                'filing_date': ['1/5/2020', '1/20/2020', '3/2/2020', 'not a date'],
+                'geoid': ['24021750100', '24021750200', '24021750100', None],
+            }
+        )
+        self.foreclosures = pd.DataFrame(
+            {'sale_date': pd.to_datetime(['2020-02-03', '2020-02-11'])}
+        )
+        self.data = {
+            'evictions': self.evictions,
+            'mortgage_foreclosures': self.foreclosures,
+        }
+
+    def test_stack_event_dates(self):
+        events = stack_event_dates(self.data, DATE_COLUMNS)
+        self.assertEqual(len(events), 5)
+        self.assertEqual(events['geoid'].notna().sum(), 3)
+        # The input frames are left as they are
+        self.assertEqual(self.evictions['filing_date'].iloc[0], '1/5/2020')
+
+    def test_county_counts_are_zero_filled(self):
+        counts = count_events(stack_event_dates(self.data, DATE_COLUMNS))
+        evictions = counts[counts['category'] == 'evictions']
+        self.assertEqual(
+            list(evictions['period_start'].dt.strftime('%Y-%m')),
+            ['2020-01', '2020-02', '2020-03'],
+        )
+        self.assertEqual(list(evictions['count']), [2, 0, 1])
+        foreclosures = counts[counts['category'] == 'mortgage_foreclosures']
+        self.assertEqual(list(foreclosures['count']), [2])
+
+    def test_tract_counts(self):
+        counts = count_events(stack_event_dates(self.data, DATE_COLUMNS), by_tract=True)
+        # Every tract gets every month of its category; foreclosures have no tracts
+        self.assertEqual(len(counts), 6)
+        self.assertEqual(set(counts['category']), {'evictions'})
+        first_tract = counts[counts['geoid'] == '24021750100']
+        self.assertEqual(list(first_tract['count']), [1, 0, 1])
+
+    def test_weekly_tables(self):
+        tables = create_timeseries_tables(
+            self.data, DATE_COLUMNS, ['monthly', 'weekly']
+        )
+        self.assertEqual(
+            set(tables),
+            {'county_monthly', 'tract_monthly', 'county_weekly', 'tract_weekly'},
+        )
+        foreclosures = tables['county_weekly'].query(
+            "category == 'mortgage_foreclosures'"
+        )
+        # Weeks start on Mondays
+        self.assertEqual(
+            list(foreclosures['period_start'].dt.strftime('%Y-%m-%d')),
+            ['2020-02-03', '2020-02-10'],
+        )
+        self.assertEqual(list(foreclosures['count']), [1, 1])
+
+    def test_no_data(self):
+        tables = create_timeseries_tables(
+            {'evictions': None, 'mortgage_foreclosures': None}, DATE_COLUMNS
+        )
+        self.assertTrue(tables['county_monthly'].empty)
+        self.assertTrue(tables['tract_monthly'].empty)
@@ -1,71 +1,145 @@
-import datetime
+"""
+Monthly (and weekly) housing loss counts for the whole site and for each census tract
+
+The records of all data categories are stacked into one frame of dates and tracts and
+counted in a single group-by per frequency. The counts of each category are zero-filled
+from its first to its last period. The count tables are data products of their own;
+plotting them is left to `plot_timeseries`.
+"""
+
 import typing as T
 
 import pandas as pd
-from matplotlib import collections
-from matplotlib import pyplot as plt
 
+from collection.date_parsing import parse_date_column
+from collection.geoid import geoid_key_to_str, to_geoid_key
 
-def create_timeseries(
-    input_df: pd.DataFrame, date_column: str, series_label: str
-) -> T.Union[T.Tuple[collections.PathCollection, str], T.Tuple[None, None]]:
-    """Plot time series counts of the different data types (eviction, foreclosure, etc.)."""
+if T.TYPE_CHECKING:
+    from matplotlib.figure import Figure
 
-    # Check for empty input
-    if input_df is None:
-        return None
+# Frequency name -> pandas offset; weekly periods start on Mondays
+FREQUENCY_OFFSETS = {'monthly': 'MS', 'weekly': 'W-MON'}
 
-    input_df[date_column] = pd.to_datetime(
-        input_df[date_column], infer_datetime_format=True
-    )
 
-    # Get counts of housing loss by day and turn into a sorted df
-    agg_by_date_series = input_df[date_column].value_counts()
-    agg_by_date_df = agg_by_date_series.to_frame(name='counts')
-    agg_by_date_df.index = agg_by_date_df.index.set_names(['dates'])
-    agg_by_date_df = agg_by_date_df.sort_index()
-    agg_by_date_df = agg_by_date_df.reset_index()
+def stack_event_dates(
+    data_by_category: T.Mapping[str, T.Union[pd.DataFrame, None]],
+    date_columns: T.Mapping[str, str],
+) -> pd.DataFrame:
+    """One row per dated record of all categories, with its category, date and tract.
 
-    # Extract into a new column the month and year of each date
-    agg_by_date_df['YearMonth'] = pd.to_datetime(agg_by_date_df['dates']).dt.to_period(
-        'M'
-    )
+    The input frames are not modified. The tract is an integer GEOID key, missing when
+    a category has no `geoid` column or the record was not geocoded.
+    """
+    frames = []
+    for category, data in data_by_category.items():
+        if data is None or date_columns[category] not in data.columns:
+            continue
+        if 'geoid' in data.columns:
+            geoids = to_geoid_key(data['geoid']).values
+        else:
+            geoids = pd.array([pd.NA] * len(data), dtype='Int64')
+        frames.append(
+            pd.DataFrame(
+                {
+                    'category': category,
+                    'date': parse_date_column(data[date_columns[category]]).values,
+                    'geoid': geoids,
+                }
+            )
+        )
+    if not frames:
+        return pd.DataFrame(
+            {
+                'category': pd.Series(dtype=object),
+                'date': pd.Series(dtype='datetime64[ns]'),
+                'geoid': pd.Series(dtype='Int64'),
+            }
+        )
+    events = pd.concat(frames, ignore_index=True)
+    return events[events['date'].notna()].reset_index(drop=True)
 
-    # Aggregate (groupby) this new month variable and form a df for visualization
-    by_month_df = agg_by_date_df.groupby('YearMonth')
-    results_ser = by_month_df['counts'].sum()
-    results_df = results_ser.to_frame(name='mysum')
-    results_df.index = results_df.index.astype('datetime64[ns]')
 
-    # Fill in zero counts when data not present in given month
-    first_month = results_df.index[0]
-    last_month = results_df.index[-1]
+def count_events(
+    events: pd.DataFrame, frequency: str = 'monthly', by_tract: bool = False
+) -> pd.DataFrame:
+    """Zero-filled counts of events per category (and tract) and period.
 
-    my_months = (
-        pd.date_range(first_month, last_month, freq='MS').strftime("%Y-%m-%d").tolist()
-    )
+    Returns a long table with columns category, [geoid,] period_start and count. Tracts
+    are listed for every period of their category; ungeocoded events are left out of
+    the tract counts.
+    """
+    freq = FREQUENCY_OFFSETS[frequency]
+    keys = ['category', 'geoid'] if by_tract else ['category']
+    columns = keys + ['period_start', 'count']
+    if by_tract:
+        events = events[events['geoid'].notna()]
+    if events.empty:
+        return pd.DataFrame(columns=columns)
 
-    fill_df = pd.DataFrame({'YearMonth': my_months})
-    fill_df.set_index('YearMonth', inplace=True)
-    fill_df.index = fill_df.index.astype('datetime64[ns]')
-    results_df = results_df.merge(
-        fill_df, left_index=True, right_index=True, how='right'
+    counts = events.groupby(
+        keys + [pd.Grouper(key='date', freq=freq, label='left', closed='left')],
+        sort=True,
+    ).size()
+    tables = []
+    for category, category_counts in counts.groupby(level='category', sort=False):
+        category_counts = category_counts.droplevel('category')
+        dates = category_counts.index.get_level_values('date')
+        periods = pd.date_range(dates.min(), dates.max(), freq=freq, name='date')
+        if by_tract:
+            category_counts = (
+                category_counts.unstack('date', fill_value=0)
+                .reindex(columns=periods, fill_value=0)
+                .stack()
+            )
+        else:
+            category_counts = category_counts.reindex(periods, fill_value=0)
+        tables.append(
+            category_counts.rename('count').reset_index().assign(category=category)
+        )
+    table = pd.concat(tables, ignore_index=True).rename(
+        columns={'date': 'period_start'}
     )
-    results_df.fillna(0, inplace=True)
+    if by_tract:
+        table['geoid'] = geoid_key_to_str(table['geoid']).values
+    table['count'] = table['count'].astype('int64')
+    return table[columns]
+
+
+def create_timeseries_tables(
+    data_by_category: T.Mapping[str, T.Union[pd.DataFrame, None]],
+    date_columns: T.Mapping[str, str],
+    frequencies: T.Sequence[str] = ('monthly',),
+) -> T.Dict[str, pd.DataFrame]:
+    """Site-level ('county') and per-tract count tables for each frequency.
+
+    The tables are keyed as '<level>_<frequency>', e.g. 'county_monthly'.
+    """
+    events = stack_event_dates(data_by_category, date_columns)
+    tables = {}
+    for frequency in frequencies:
+        tables[f'county_{frequency}'] = count_events(events, frequency)
+        tables[f'tract_{frequency}'] = count_events(events, frequency, by_tract=True)
+    return tables
 
-    # fig = plt.figure()
-    # fig.set_size_inches(9, 6.5)
-    s = plt.scatter(results_df.index, results_df.mysum, s=100, label=series_label)
-    plt.plot(results_df.index, results_df.mysum)
 
-    # plot_title = series_label + ' timeseries'
-    # fig_name = series_label + '_timeseries.png'
+def plot_timeseries(
+    county_counts: pd.DataFrame, labels: T.Optional[T.Mapping[str, str]] = None
+) -> 'Figure':
+    """Plot the site-level counts of each category (a `count_events` table)."""
+    from matplotlib import pyplot as plt
 
-    plt.title('housing loss timeseries by type', size=30)
-    plt.xlabel('date', size=30)
-    plt.ylabel('monthly counts', size=30)
-    plt.xticks(size=20)
-    plt.yticks(size=30)
-    plt.grid(True)
+    labels = labels or {}
+    fig, ax = plt.subplots(figsize=(25, 10))
+    for category, counts in county_counts.groupby('category', sort=False):
+        label = labels.get(category, category)
+        ax.scatter(counts['period_start'], counts['count'], s=100, label=label)
+        ax.plot(counts['period_start'], counts['count'])
 
-    return s
+    ax.set_title('housing loss timeseries by type', size=30)
+    ax.set_xlabel('date', size=30)
+    ax.set_ylabel('monthly counts', size=30)
+    ax.tick_params(axis='x', labelsize=20)
+    ax.tick_params(axis='y', labelsize=30)
+    ax.grid(True)
+    ax.legend(prop={'size': 20})
+    return fig
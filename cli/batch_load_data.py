@@ -0,0 +1,174 @@
+"""
+Run the housing loss analysis for many partner sites in one go
+
+Each site directory (with the evictions, mortgage_foreclosures and
+tax_lien_foreclosures sub-folders) is processed by `load_data.main` in a pool of worker
+processes. Workers share an on-disk cache of ACS and tract geometry data, a failure in
+one site does not stop the others, and a summary of all sites is written at the end.
+
+Usage:  python batch_load_data.py /path/to/sites/* --workers 4 --output-dir batch_output
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+import typing as T
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from collection.http_client import get_request_stats, reset_request_stats
+from const import (
+    BATCH_MAX_WORKERS,
+    BATCH_RUN_LOG_FILENAME,
+    BATCH_SUMMARY_FILENAME,
+    OUTPUT_PATH_SHARED_CACHE,
+)
+from load_data import main
+
+
+def find_site_directories(patterns: T.Iterable[str]) -> T.List[Path]:
+    """Expand the given paths/glob patterns to a sorted list of unique directories."""
+    site_dirs = set()
+    for pattern in patterns:
+        matches = glob.glob(os.path.expanduser(pattern)) or [pattern]
+        site_dirs.update(Path(match).resolve() for match in matches)
+    return sorted(site_dir for site_dir in site_dirs if site_dir.is_dir())
+
+
+def site_output_paths(site_dirs: T.List[Path], output_dir: Path) -> T.List[Path]:
+    """One output folder per site, named after the site (made unique if needed)."""
+    output_paths = []
+    used_names = set()
+    for site_dir in site_dirs:
+        name = site_dir.name
+        if name in used_names:
+            name = f'{site_dir.parent.name}_{site_dir.name}'
+        suffix = 2
+        while name in used_names:
+            name = f'{site_dir.name}_{suffix}'
+            suffix += 1
+        used_names.add(name)
+        output_paths.append(output_dir / name)
+    return output_paths
+
+
+def close_figures() -> None:
+    """Close all matplotlib figures, if pyplot has been imported by a stage."""
+    pyplot = sys.modules.get('matplotlib.pyplot')
+    if pyplot is not None:
+        pyplot.close('all')
+
+
+def run_site(
+    site_dir: Path, output_path: Path, cache_dir: Path, resume: bool = True
+) -> T.Dict:
+    """Run the analysis for one site, capturing its output and any failure."""
+    output_path.mkdir(parents=True, exist_ok=True)
+    log_filename = output_path / BATCH_RUN_LOG_FILENAME
+    result = {
+        'site': str(site_dir),
+        'output_path': str(output_path),
+        'status': 'failed',
+        'error': '',
+        'seconds': 0.0,
+        'http_requests': 0,
+        'http_errors': 0,
+        'log_file': str(log_filename),
+    }
+    # Workers are reused between sites, so start from a clean slate
+    reset_request_stats()
+    close_figures()
+    start_time = time.perf_counter()
+    with open(log_filename, 'w') as log_file, contextlib.redirect_stdout(log_file):
+        try:
+            # main expects the input path to end with a path separator
+            message = main(
+                os.path.join(str(site_dir), ''),
+                output_path=output_path,
+                cache_dir=cache_dir,
+                resume=resume,
+            )
+            # main returns a message if it stops before the mapping stage
+            if message is not None:
+                result['status'] = 'invalid input'
+                result['error'] = ' '.join(message)
+            else:
+                result['status'] = 'completed'
+        except Exception as e:
+            traceback.print_exc(file=log_file)
+            result['error'] = f'{type(e).__name__}: {e}'
+        finally:
+            close_figures()
+    result['seconds'] = round(time.perf_counter() - start_time, 1)
+    request_stats = get_request_stats()
+    if len(request_stats) > 0:
+        result['http_requests'] = int(request_stats['requests'].sum())
+        result['http_errors'] = int(request_stats['errors'].sum())
+    return result
+
+
+def run_batch(
+    site_dirs: T.List[Path],
+    output_dir: Path,
+    workers: int = BATCH_MAX_WORKERS,
+    cache_dir: T.Union[Path, None] = None,
+) -> pd.DataFrame:
+    """Run all sites in a process pool and write the consolidated run summary."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir = cache_dir or output_dir / OUTPUT_PATH_SHARED_CACHE
+    output_paths = site_output_paths(site_dirs, output_dir)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_site, site_dir, output_path, cache_dir): site_dir
+            for site_dir, output_path in zip(site_dirs, output_paths)
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # E.g. a worker process that died
+                result = {'site': str(futures[future]), 'status': 'failed'}
+                result['error'] = f'{type(e).__name__}: {e}'
+            results.append(result)
+            mark = '\u2713' if result['status'] == 'completed' else '\u2326'
+            print(
+                mark, f"{result['site']}: {result['status']}", result.get('error', '')
+            )
+
+    summary = pd.DataFrame(results).sort_values('site').reset_index(drop=True)
+    summary.to_csv(output_dir / f'{BATCH_SUMMARY_FILENAME}.csv', index=False)
+    with open(output_dir / f'{BATCH_SUMMARY_FILENAME}.json', 'w') as outfile:
+        json.dump(summary.to_dict(orient='records'), outfile, indent=2)
+    print('*** Created ' + str(output_dir / f'{BATCH_SUMMARY_FILENAME}.csv'))
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('sites', nargs='+', help='Site directories or glob patterns')
+    parser.add_argument('--workers', type=int, default=BATCH_MAX_WORKERS)
+    parser.add_argument('--output-dir', default='batch_output')
+    parser.add_argument(
+        '--cache-dir', default=None, help='Defaults to shared_cache in the output dir'
+    )
+    args = parser.parse_args()
+    site_dirs = find_site_directories(args.sites)
+    if len(site_dirs) == 0:
+        print('\u2326', 'No site directories found for', args.sites)
+    else:
+        print(f'Processing {len(site_dirs)} sites with {args.workers} workers...')
+        summary = run_batch(
+            site_dirs,
+            Path(args.output_dir),
+            args.workers,
+            Path(args.cache_dir) if args.cache_dir else None,
+        )
+        print(summary['status'].value_counts().to_string())
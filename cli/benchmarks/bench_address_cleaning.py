@@ -0,0 +1,106 @@
+"""
+Micro-benchmarks for the column-level address cleaning kernels
+
+Compares the Series kernels against the previous row-by-row implementations.
+Run from the cli directory:  python -m benchmarks.bench_address_cleaning --rows 1000000
+"""
+
+import argparse
+import time
+import typing as T
+
+import numpy as np
+import pandas as pd
+
+from collection.address_cleaning import (
+    SPECIAL_CHARS,
+    get_zipcode5_series,
+    remove_special_chars_series,
+)
+
+
+def remove_special_chars_loop(text: str) -> str:
+    """Previous implementation: one str.replace call per special character."""
+    if not isinstance(text, str):
+        return str(text)
+    for special_chars in SPECIAL_CHARS:
+        if special_chars in text:
+            text = text.replace(special_chars, "")
+    return text
+
+
+def get_zipcode5_row(raw_zipcode: T.Union[int, float, str, None]) -> T.Union[str, None]:
+    """Previous implementation, applied row by row."""
+    if pd.isna(raw_zipcode):
+        return np.nan
+    if isinstance(raw_zipcode, (int, float)):
+        if raw_zipcode <= 99999:
+            return str(int(raw_zipcode)).zfill(5)
+        return str(int(raw_zipcode))[:5].zfill(5)
+    return raw_zipcode[:5].zfill(5)
+
+
+def make_columns(rows: int, seed: int = 0) -> T.Dict[str, pd.Series]:
+    """Synthetic address and zip code columns resembling court exports."""
+    rng = np.random.default_rng(seed)
+    streets = np.array(["O'Neil St.", 'Main St #4', 'E. Patrick St', 'Apt (B) Elm Ave'])
+    addresses = (
+        pd.Series(rng.integers(1, 9999, rows)).astype(str)
+        + ' '
+        + pd.Series(streets[rng.integers(0, len(streets), rows)])
+    )
+    # Records from one jurisdiction only span a few hundred zip codes
+    zip_ints = pd.Series(rng.choice(rng.integers(1000, 99999, 300), rows))
+    zip_mixed = zip_ints.astype(object)
+    zip_mixed[::3] = zip_ints[::3].astype(str) + '-1234'
+    zip_mixed[1::3] = zip_ints[1::3].astype(float)
+    return {'addresses': addresses, 'zip_ints': zip_ints, 'zip_mixed': zip_mixed}
+
+
+def best_of(func: T.Callable, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def run_benchmarks(rows: int, repeat: int = 3) -> pd.DataFrame:
+    columns = make_columns(rows)
+    cases = {
+        'remove_special_chars': (
+            lambda: columns['addresses'].apply(remove_special_chars_loop),
+            lambda: remove_special_chars_series(columns['addresses']),
+        ),
+        'zipcode5 (ints)': (
+            lambda: columns['zip_ints'].apply(get_zipcode5_row),
+            lambda: get_zipcode5_series(columns['zip_ints']),
+        ),
+        'zipcode5 (mixed)': (
+            lambda: columns['zip_mixed'].apply(get_zipcode5_row),
+            lambda: get_zipcode5_series(columns['zip_mixed']),
+        ),
+    }
+    results = []
+    for name, (row_func, series_func) in cases.items():
+        row_seconds = best_of(row_func, repeat)
+        series_seconds = best_of(series_func, repeat)
+        results.append(
+            {
+                'kernel': name,
+                'rows': rows,
+                'row_by_row_s': round(row_seconds, 4),
+                'series_s': round(series_seconds, 4),
+                'speedup': round(row_seconds / series_seconds, 1),
+            }
+        )
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    print(run_benchmarks(args.rows, args.repeat).to_string(index=False))
@@ -0,0 +1,49 @@
+"""
+Timing of the batched anomaly scores and forecasts on synthetic tract x month counts
+
+Run from the cli directory:
+    python -m benchmarks.bench_anomaly_detection --tracts 5000 --months 120
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from analysis.anomaly_detection import alert_table, forecast_table
+from analysis.space_time_cube import SpaceTimeCube
+
+CATEGORIES = ['evictions', 'mortgage_foreclosures', 'tax_lien_foreclosures']
+
+
+def make_cube(tracts: int, months: int, seed: int = 0) -> SpaceTimeCube:
+    """Seasonal Poisson counts with a different filing rate per tract."""
+    rng = np.random.default_rng(seed)
+    month_range = np.arange(np.datetime64('2012-01'), np.datetime64('2012-01') + months)
+    season = 1 + 0.3 * np.sin(2 * np.pi * np.arange(months) / 12)
+    rates = rng.gamma(2, 1.5, (tracts, 1, len(CATEGORIES))) * season[None, :, None]
+    return SpaceTimeCube(
+        rng.poisson(rates).astype(np.int32),
+        24021000000 + np.arange(tracts),
+        month_range,
+        CATEGORIES,
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tracts', type=int, default=5000)
+    parser.add_argument('--months', type=int, default=120)
+    args = parser.parse_args()
+    cube = make_cube(args.tracts, args.months)
+    start_time = time.perf_counter()
+    alerts = alert_table(cube)
+    print(
+        f'alert_table     {time.perf_counter() - start_time:.3f}s, {len(alerts)} alerts'
+    )
+    start_time = time.perf_counter()
+    forecasts = forecast_table(cube)
+    print(
+        f'forecast_table  {time.perf_counter() - start_time:.3f}s,',
+        f'{len(forecasts)} rows',
+    )
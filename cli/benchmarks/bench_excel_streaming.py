@@ -0,0 +1,68 @@
+"""
+Timing of the streaming .xlsx reader against pd.read_excel
+
+Run from the cli directory:
+    python -m benchmarks.bench_excel_streaming --rows 100000 --sheets 2 --memory
+"""
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+import typing as T
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook
+
+from benchmarks.synthetic_data import generate_records
+from collection.excel_streaming import read_excel_streaming
+
+
+def write_workbook(path: Path, rows: int, sheets: int) -> None:
+    """Write synthetic eviction records split over several sheets of a workbook."""
+    records = generate_records('evictions', rows)
+    workbook = Workbook(write_only=True)
+    for part in range(sheets):
+        sheet = workbook.create_sheet(f'Sheet{part + 1}')
+        sheet.append(list(records.columns))
+        for row in records.iloc[part::sheets].itertuples(index=False):
+            sheet.append([None if pd.isna(value) else value for value in row])
+    workbook.save(path)
+
+
+def timed(read: T.Callable[[], pd.DataFrame], memory: bool) -> T.Tuple[float, float]:
+    """Seconds taken by read and its peak traced memory in MB (0 if not traced)."""
+    if memory:
+        tracemalloc.start()
+    start_time = time.perf_counter()
+    read()
+    seconds = time.perf_counter() - start_time
+    peak = 0.0
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return seconds, peak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--sheets', type=int, default=1)
+    parser.add_argument(
+        '--memory', action='store_true', help='also trace the peak memory (slower)'
+    )
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / 'evictions.xlsx'
+        write_workbook(path, args.rows, args.sheets)
+        readers = {
+            'pd.read_excel': lambda: pd.concat(
+                pd.read_excel(path, sheet_name=None).values(), ignore_index=True
+            ),
+            'read_excel_streaming': lambda: read_excel_streaming(path),
+        }
+        for name, read in readers.items():
+            seconds, peak = timed(read, args.memory)
+            memory = f'  peak {peak:.0f} MB' if args.memory else ''
+            print(f'{name:<22}{seconds:.3f}s{memory}')
@@ -0,0 +1,51 @@
+"""
+Timing of the GeoPackage writer against Fiona's feature by feature writes
+
+Run from the cli directory:
+    python -m benchmarks.bench_gpkg_writer --tracts 2000 --columns 100
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import geopandas
+import numpy as np
+from shapely.geometry import box
+
+from mapping.gpkg_writer import write_geopackage
+
+
+def make_tracts(tracts: int, columns: int, seed: int = 0) -> geopandas.GeoDataFrame:
+    """Square tracts on a grid with random numeric columns."""
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(tracts)))
+    data = {
+        'geoid': [str(24021000000 + i) for i in range(tracts)],
+        **{f'column_{c}': rng.random(tracts) for c in range(columns)},
+    }
+    geometry = [
+        box(i % side, i // side, i % side + 1, i // side + 1) for i in range(tracts)
+    ]
+    return geopandas.GeoDataFrame(data, geometry=geometry, crs='EPSG:4326')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tracts', type=int, default=2000)
+    parser.add_argument('--columns', type=int, default=100)
+    args = parser.parse_args()
+    tracts_gdf = make_tracts(args.tracts, args.columns)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start_time = time.perf_counter()
+        try:
+            tracts_gdf.to_file(
+                Path(tmp_dir) / 'fiona.gpkg', driver='GPKG', engine='fiona'
+            )
+            print(f'fiona             {time.perf_counter() - start_time:.3f}s')
+        except ImportError:
+            print('fiona             not installed')
+        start_time = time.perf_counter()
+        write_geopackage(tracts_gdf, Path(tmp_dir) / 'gis_data_import.gpkg')
+        print(f'write_geopackage  {time.perf_counter() - start_time:.3f}s')
@@ -0,0 +1,54 @@
+"""
+Memory report for the compact record schema on a synthetic eviction file
+
+Run from the cli directory:  python -m benchmarks.bench_record_schema --rows 1000000
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from collection.record_schema import apply_record_schema, memory_report
+
+
+def make_eviction_records(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic eviction records, with object columns as read from a court export."""
+    rng = np.random.default_rng(seed)
+    streets = np.array(['Main St', 'E Patrick St', 'Elm Ave', 'Market St', 'Oak Dr'])
+    cities = np.array(['Frederick', 'Brunswick', 'Thurmont', 'Walkersville'])
+    zip_codes = rng.integers(21701, 21799, 60).astype(str)
+    dates = pd.Timestamp('2016-01-01') + pd.to_timedelta(
+        rng.integers(0, 6 * 365, rows), unit='D'
+    )
+    return pd.DataFrame(
+        {
+            'street_address_1': (
+                pd.Series(rng.integers(1, 9999, rows)).astype(str)
+                + ' '
+                + pd.Series(streets[rng.integers(0, len(streets), rows)])
+            ),
+            'city': cities[rng.integers(0, len(cities), rows)].astype(object),
+            'state': np.full(rows, 'MD', dtype=object),
+            'zip_code': zip_codes[rng.integers(0, len(zip_codes), rows)].astype(object),
+            'eviction_filing_date': dates,
+            'year': dates.year.astype('int64'),
+            'geoid': (
+                '24021' + pd.Series(rng.integers(750000, 752000, rows)).astype(str)
+            ),
+            'lat': rng.uniform(39.2, 39.7, rows),
+            'long': rng.uniform(-77.7, -77.1, rows),
+            'state_fips': np.full(rows, 24.0),
+            'county_fips': np.full(rows, 21.0),
+            'tract': rng.integers(750000, 752000, rows).astype(float),
+        }
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+    records = make_eviction_records(args.rows)
+    compact_records = apply_record_schema(records.copy())
+    print(memory_report(records, compact_records).to_string())
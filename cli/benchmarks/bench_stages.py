@@ -0,0 +1,199 @@
+"""
+Stage-level benchmarks of the full pipeline on synthetic partner site data
+
+Times each stage of `load_data.main` (load, standardize, geocode, summary, correlation
+and map writing) at several dataset sizes, with the Census services replaced by the
+stubs in benchmarks.synthetic_data. Results are saved as JSON so that runs of
+different versions can be compared.
+
+Run from the cli directory:
+    python -m benchmarks.bench_stages --sizes 10000 100000 --output results.json
+    python -m benchmarks.bench_stages --sizes 10000 --compare results.json
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import typing as T
+from pathlib import Path
+from unittest.mock import patch
+
+import pandas as pd
+from matplotlib import pyplot as plt
+
+import load_data
+from benchmarks.synthetic_data import (
+    StubGeocoder,
+    stub_acs_data,
+    stub_input_data_geometry,
+    write_synthetic_site,
+)
+from collection.address_validation import verify_input_directory
+from const import (
+    OUTPUT_PATH_GEOCODED_DATA,
+    OUTPUT_PATH_GEOCODER_CACHE,
+    OUTPUT_PATH_MAPS,
+    OUTPUT_PATH_SUMMARIES,
+)
+
+STAGES = [
+    'load',
+    'validate',
+    'standardize',
+    'geocode',
+    'summary',
+    'correlation',
+    'map_write',
+]
+
+
+def code_version() -> str:
+    """Git commit of the code being benchmarked, if available."""
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_stages(
+    site_path: Path, output_path: Path, stages: T.Sequence[str] = STAGES
+) -> T.Dict[str, float]:
+    """Run the pipeline stages on a site folder and return the seconds per stage.
+
+    Stages that are not selected still run (untimed) when a later stage needs them.
+    """
+    last_stage = max(STAGES.index(stage) for stage in stages)
+    timings = {}
+
+    def timed(stage: str, func: T.Callable[[], T.Any]) -> T.Any:
+        start_time = time.perf_counter()
+        value = func()
+        if stage in stages:
+            timings[stage] = round(time.perf_counter() - start_time, 3)
+        return value
+
+    sub_directories = verify_input_directory(str(site_path) + '/')
+    loaded = timed('load', lambda: load_data.load_all_data(sub_directories))
+    if last_stage < STAGES.index('validate'):
+        return timings
+    validated = timed('validate', lambda: load_data.validate_all_data(loaded))
+    if last_stage < STAGES.index('standardize'):
+        return timings
+    standardized = timed(
+        'standardize', lambda: load_data.standardize_all_data(validated)
+    )
+    if last_stage < STAGES.index('geocode'):
+        return timings
+    geocoded = timed(
+        'geocode',
+        lambda: load_data.geocode_all_data(
+            standardized,
+            output_path / OUTPUT_PATH_GEOCODER_CACHE,
+            output_path / OUTPUT_PATH_GEOCODED_DATA,
+        ),
+    )
+    if last_stage < STAGES.index('summary'):
+        return timings
+    state_fips, county_fips, acs_df, acs_data_dict = load_data.get_site_acs_data(
+        geocoded
+    )
+    df_summ_mrg = timed(
+        'summary',
+        lambda: load_data.summarize_all_data(
+            loaded,
+            standardized,
+            geocoded,
+            acs_df,
+            acs_data_dict,
+            output_path / OUTPUT_PATH_SUMMARIES,
+            validated=validated,
+        ),
+    )
+    if 'correlation' in stages:
+        timed(
+            'correlation',
+            lambda: load_data.run_correlation_analysis(
+                acs_df, df_summ_mrg, output_path
+            ),
+        )
+        plt.close('all')
+    if 'map_write' in stages:
+        timed(
+            'map_write',
+            lambda: load_data.create_mapping_data(
+                state_fips, county_fips, df_summ_mrg, output_path / OUTPUT_PATH_MAPS
+            ),
+        )
+    return timings
+
+
+def run_benchmarks(
+    sizes: T.Sequence[int], stages: T.Sequence[str] = STAGES, seed: int = 0
+) -> T.Dict:
+    """Benchmark the stages at each size (number of eviction records)."""
+    results = []
+    geocoder = StubGeocoder()
+    with patch('collection.address_geocoding.census_geocode_records', geocoder), patch(
+        'analysis.acs_data.get_acs_data', stub_acs_data
+    ), patch(
+        'collection.tigerweb_api.get_input_data_geometry', stub_input_data_geometry
+    ):
+        for rows in sizes:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                site_path = write_synthetic_site(
+                    Path(tmp_dir) / 'site', rows, seed=seed
+                )
+                timings = run_stages(site_path, Path(tmp_dir), stages)
+            for stage, seconds in timings.items():
+                results.append({'rows': rows, 'stage': stage, 'seconds': seconds})
+                print(f'{rows:>9} rows  {stage:<12} {seconds:>9.3f}s')
+    return {
+        'version': code_version(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'results': results,
+    }
+
+
+def compare_results(current: T.Dict, baseline: T.Dict) -> pd.DataFrame:
+    """Seconds per stage and size of two benchmark runs, with the speedup."""
+    current_df = pd.DataFrame(current['results'])
+    baseline_df = pd.DataFrame(baseline['results'])
+    comparison = baseline_df.merge(
+        current_df, on=['rows', 'stage'], suffixes=('_baseline', '_current')
+    )
+    comparison['speedup'] = (
+        comparison['seconds_baseline'] / comparison['seconds_current']
+    ).round(2)
+    return comparison
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_stages_results.json')
+    parser.add_argument('--compare', help='Results JSON of an earlier run')
+    args = parser.parse_args()
+    benchmark = run_benchmarks(args.sizes, args.stages, args.seed)
+    with open(args.output, 'w') as outfile:
+        json.dump(benchmark, outfile, indent=2)
+    print('*** Created ' + args.output)
+    if args.compare:
+        with open(args.compare) as infile:
+            baseline = json.load(infile)
+        print(f"\nCompared to {baseline['version']} ({baseline['created']}):")
+        print(compare_results(benchmark, baseline).to_string(index=False))
@@ -0,0 +1,327 @@
+"""
+Synthetic partner site data for benchmarks, plus stand-ins for the Census services
+
+Generates eviction, mortgage foreclosure and tax lien files that follow the FLH Partner
+Site Data Collection Template, at any size, with repeated addresses, exact duplicate
+rows, unparseable addresses and several counties. The stub geocoder, ACS data and tract
+geometry are consistent with the generated addresses, so the whole pipeline can be run
+offline.
+
+Run from the cli directory:
+    python -m benchmarks.synthetic_data /tmp/synthetic_site --rows 100000
+"""
+
+import argparse
+import time
+import typing as T
+from pathlib import Path
+
+import geopandas
+import numpy as np
+import pandas as pd
+from shapely.geometry import box
+
+from analysis.acs_correlation import get_acs_vars_for_analysis
+from const import GEOCODE_RESPONSE_HEADER
+
+STATE_FIPS = '24'
+STATE = 'MD'
+# County name, FIPS code, cities and zip codes of the synthetic site
+COUNTIES = [
+    (
+        'Frederick',
+        '021',
+        ['Frederick', 'Brunswick', 'Thurmont'],
+        [21701, 21702, 21703, 21716, 21788],
+    ),
+    (
+        'Montgomery',
+        '031',
+        ['Rockville', 'Gaithersburg', 'Silver Spring'],
+        [20850, 20877, 20901, 20902],
+    ),
+    ('Washington', '043', ['Hagerstown', 'Boonsboro'], [21740, 21742, 21713]),
+]
+TRACTS_PER_COUNTY = 60
+STREET_NAMES = [
+    'Patrick',
+    'Market',
+    'Jefferson',
+    'Church',
+    'Second',
+    'Elm',
+    'Oak',
+    'Maple',
+    'Washington',
+    'Lincoln',
+    'Park',
+    'Hill',
+    'Lake',
+    'College',
+    'Mill',
+    'Spring',
+]
+STREET_SUFFIXES = ['St', 'Ave', 'Rd', 'Dr', 'Ln', 'Ct', 'Blvd', 'Way']
+DIRECTIONS = ['', '', '', 'E ', 'W ', 'N ', 'S ']
+# Addresses that the address parser cannot standardize
+BAD_ADDRESSES = ['See attached', 'Unknown', 'PO Box 12', 'Apt 4B', '###', 'Main']
+
+# Date column, date format and extra columns of each category of data
+CATEGORY_SETTINGS = {
+    'evictions': {
+        'date_column': 'Eviction_Filing_Date',
+        'date_format': '%Y-%m-%d',
+    },
+    'mortgage_foreclosures': {
+        'date_column': 'Foreclosure_Sale_Date',
+        'date_format': '%m/%d/%y',
+    },
+    'tax_lien_foreclosures': {
+        'date_column': 'Tax_Lien_Sale_Date',
+        'date_format': '%m/%d/%y',
+    },
+}
+
+
+def county_tracts(county_fips: str) -> np.ndarray:
+    """Tract codes of a synthetic county."""
+    return 750000 + np.arange(TRACTS_PER_COUNTY) * 100
+
+
+def generate_records(
+    category: str,
+    rows: int,
+    repeat_address_rate: float = 0.3,
+    duplicate_row_rate: float = 0.02,
+    bad_address_rate: float = 0.01,
+    start_date: str = '2016-01-01',
+    end_date: str = '2021-12-31',
+    seed: int = 0,
+) -> pd.DataFrame:
+    """Generate template-conformant records of one category of data.
+
+    repeat_address_rate: share of records at an address that already has a record
+    duplicate_row_rate: share of extra rows that are exact copies of other rows
+    bad_address_rate: share of records with an address that cannot be parsed
+    """
+    rng = np.random.default_rng(seed)
+    n_addresses = max(1, int(rows * (1 - repeat_address_rate)))
+    # The pool of distinct addresses, each located in a county
+    county_index = rng.integers(0, len(COUNTIES), n_addresses)
+    streets = (
+        pd.Series(rng.integers(1, 9999, n_addresses)).astype(str)
+        + ' '
+        + pd.Series(np.array(DIRECTIONS)[rng.integers(0, len(DIRECTIONS), n_addresses)])
+        + pd.Series(
+            np.array(STREET_NAMES)[rng.integers(0, len(STREET_NAMES), n_addresses)]
+        )
+        + ' '
+        + pd.Series(
+            np.array(STREET_SUFFIXES)[
+                rng.integers(0, len(STREET_SUFFIXES), n_addresses)
+            ]
+        )
+    ).to_numpy()
+    cities = np.empty(n_addresses, dtype=object)
+    zip_codes = np.empty(n_addresses, dtype='int64')
+    for i, (_, _, county_cities, county_zips) in enumerate(COUNTIES):
+        in_county = county_index == i
+        cities[in_county] = rng.choice(county_cities, in_county.sum())
+        zip_codes[in_county] = rng.choice(county_zips, in_county.sum())
+
+    # Every address gets a record, the remaining records repeat addresses
+    address_index = np.concatenate(
+        [np.arange(n_addresses), rng.integers(0, n_addresses, rows - n_addresses)]
+    )
+    rng.shuffle(address_index)
+    street_address = streets[address_index].astype(object)
+    is_bad = rng.random(rows) < bad_address_rate
+    street_address[is_bad] = rng.choice(BAD_ADDRESSES, is_bad.sum())
+
+    settings = CATEGORY_SETTINGS[category]
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    dates = start + pd.to_timedelta(
+        rng.integers(0, (end - start).days + 1, rows), unit='D'
+    )
+    amounts = pd.Series(rng.integers(500, 500000, rows)).map('${:,}'.format)
+    records = pd.DataFrame(
+        {
+            'Case_Number': 'Case ' + pd.Series(np.arange(1, rows + 1)).astype(str),
+            'Street_Address_1': street_address,
+            'Street_Address_2': '',
+            'City': cities[address_index],
+            'State': STATE,
+            'Zip_Code': zip_codes[address_index],
+            'County': np.array([c[0] for c in COUNTIES])[county_index[address_index]],
+            'Business_Address_Indicator': '',
+            'Parcel_ID': '',
+            'GEOID': '',
+            'Latitude': '',
+            'Longitude': '',
+            settings['date_column']: dates.strftime(settings['date_format']),
+        }
+    )
+    if category == 'evictions':
+        judgement_dates = dates + pd.to_timedelta(rng.integers(10, 90, rows), unit='D')
+        records['Eviction_Judgement_Date'] = judgement_dates.strftime('%Y-%m-%d')
+        records['Judgement_For'] = rng.choice(['Plaintiff', 'Defendant'], rows)
+        records['Claim_Amount'] = amounts
+    elif category == 'mortgage_foreclosures':
+        records['Lender'] = rng.choice(['Bank A', 'Bank B', 'Credit Union'], rows)
+        records['Foreclosure_Sale_Amount'] = amounts
+    else:
+        records['Tax_Lien_Amount_Due'] = amounts
+
+    n_duplicates = int(rows * duplicate_row_rate)
+    if n_duplicates > 0:
+        duplicates = records.iloc[rng.integers(0, rows, n_duplicates)]
+        records = pd.concat([records, duplicates], ignore_index=True)
+    return records
+
+
+def write_synthetic_site(
+    site_path: T.Union[str, Path],
+    rows: int,
+    foreclosure_share: float = 0.2,
+    seed: int = 0,
+    **kwargs,
+) -> Path:
+    """Write a synthetic partner site folder with all 3 categories of data.
+
+    rows is the number of eviction records; the foreclosure and tax lien files each
+    have foreclosure_share times as many records.
+    """
+    site_path = Path(site_path)
+    for i, category in enumerate(CATEGORY_SETTINGS):
+        category_rows = (
+            rows if category == 'evictions' else int(rows * foreclosure_share)
+        )
+        records = generate_records(
+            category, max(category_rows, 1), seed=seed + i, **kwargs
+        )
+        (site_path / category).mkdir(parents=True, exist_ok=True)
+        records.to_csv(site_path / category / f'{category}.csv', index=False)
+    return site_path
+
+
+class StubGeocoder:
+    """Stand-in for `census_geocode_records`: places each address in a tract of the
+    county of its zip code, deterministically, with an optional no-match rate and
+    latency per request."""
+
+    def __init__(self, no_match_rate: float = 0.03, latency: float = 0.0):
+        self.no_match_rate = no_match_rate
+        self.latency = latency
+        self.requests = 0
+        self.zip_counties = {
+            zip_code: county_fips
+            for _, county_fips, _, county_zips in COUNTIES
+            for zip_code in county_zips
+        }
+
+    def __call__(self, df_chunk: pd.DataFrame) -> pd.DataFrame:
+        self.requests += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        ids = df_chunk.iloc[:, 0].to_numpy()
+        streets = df_chunk.iloc[:, 1].astype(str).to_numpy()
+        zip_codes = pd.to_numeric(df_chunk.iloc[:, 4], errors='coerce')
+        address_hash = pd.util.hash_array(streets.astype(object))
+        county_fips = zip_codes.map(self.zip_counties)
+        tract_index = (address_hash % TRACTS_PER_COUNTY).astype('int64')
+        tracts = [
+            county_tracts(county)[i] if isinstance(county, str) else np.nan
+            for county, i in zip(county_fips, tract_index)
+        ]
+        is_match = county_fips.notna().to_numpy() & (
+            (address_hash % 10000) >= self.no_match_rate * 10000
+        )
+        geocoded_df = pd.DataFrame(
+            {
+                'id': ids,
+                'geocoded_address': streets,
+                'is_match': np.where(is_match, 'Match', 'No_Match'),
+                'is_exact': np.where(is_match, 'Exact', np.nan),
+                'returned_address': streets,
+                'coordinates': np.where(is_match, '-77.41,39.41', np.nan),
+                'tiger_line': 1,
+                'side': 'L',
+                'state_fips': int(STATE_FIPS),
+                'county_fips': pd.to_numeric(county_fips),
+                'tract': tracts,
+                'block': 1001,
+            },
+            columns=GEOCODE_RESPONSE_HEADER,
+        )
+        geocoded_df.loc[~is_match, ['state_fips', 'county_fips', 'tract', 'block']] = (
+            np.nan
+        )
+        geocoded_df['long'] = np.where(is_match, '-77.41', np.nan)
+        geocoded_df['lat'] = np.where(is_match, '39.41', np.nan)
+        return geocoded_df
+
+
+def stub_acs_data(
+    state_fips: str, county_fips: str, year: int = 2019, cache_dir: T.Any = None
+) -> T.Tuple[pd.DataFrame, pd.DataFrame]:
+    """Stand-in for `get_acs_data` with random values for the tracts of a county."""
+    tracts = county_tracts(county_fips)
+    rng = np.random.default_rng(int(county_fips))
+    columns = set(get_acs_vars_for_analysis()) | {
+        'total-households',
+        'total-renter-occupied-households',
+        'total-owner-occupied-households',
+    }
+    acs_df = pd.DataFrame(
+        {column: rng.uniform(10, 1000, len(tracts)) for column in sorted(columns)}
+    )
+    acs_df['state'] = state_fips
+    acs_df['county'] = county_fips
+    acs_df['tract'] = [str(tract).zfill(6) for tract in tracts]
+    acs_df = acs_df.reset_index()
+    acs_df['GEOID'] = acs_df['state'] + acs_df['county'] + acs_df['tract']
+    return acs_df, pd.DataFrame()
+
+
+def stub_input_data_geometry(
+    state_fips: str,
+    county_fips: T.List,
+    geojson_filename: str,
+    cache_dir: T.Any = None,
+) -> geopandas.GeoDataFrame:
+    """Stand-in for `get_input_data_geometry`: a grid of square tracts per county."""
+    geoids = []
+    geometries = []
+    for row, county in enumerate(county_fips):
+        for col, tract in enumerate(county_tracts(county)):
+            geoids.append(f'{state_fips}{county}{str(tract).zfill(6)}')
+            geometries.append(box(col, row, col + 1, row + 1))
+    geojson_gdf = geopandas.GeoDataFrame(
+        {'geoid': geoids}, geometry=geometries, crs='EPSG:4326'
+    )
+    geojson_gdf.to_file(geojson_filename, driver='GeoJSON')
+    return geojson_gdf
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('site_path', help='Folder to write the synthetic site data to')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat-address-rate', type=float, default=0.3)
+    parser.add_argument('--duplicate-row-rate', type=float, default=0.02)
+    parser.add_argument('--bad-address-rate', type=float, default=0.01)
+    parser.add_argument('--start-date', default='2016-01-01')
+    parser.add_argument('--end-date', default='2021-12-31')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_synthetic_site(
+        args.site_path,
+        args.rows,
+        seed=args.seed,
+        repeat_address_rate=args.repeat_address_rate,
+        duplicate_row_rate=args.duplicate_row_rate,
+        bad_address_rate=args.bad_address_rate,
+        start_date=args.start_date,
+        end_date=args.end_date,
+    )
+    print('*** Created synthetic site data in ' + str(args.site_path))
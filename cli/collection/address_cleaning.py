@@ -3,6 +3,12 @@ import typing as T
 import numpy as np
 import pandas as pd
 
+SPECIAL_CHARS = '\\`*{}[]()>#^@!+.%$&:\''
+# Translation table that deletes all special characters in a single pass
+SPECIAL_CHARS_TABLE = str.maketrans('', '', SPECIAL_CHARS)
+# Separator used to clean a whole column of text in one call
+ROW_SEPARATOR = '\x00'
+
 
 def remove_special_chars(text: str) -> str:
     """Remove special characters from text
@@ -14,50 +20,102 @@ def remove_special_chars(text: str) -> str:
     text: a clean string with no special characters
     """
     if not isinstance(text, str):
-        print('Non-string text identified, setting field to empty string')
         return str(text)
+    return text.translate(SPECIAL_CHARS_TABLE)
+
+
+def remove_special_chars_series(text: pd.Series) -> pd.Series:
+    """Remove special characters from a whole column of text
+    Inputs
+    ------
+    text: a column of strings; missing values are kept as missing and any other
+      non-string values are converted to strings
+    Outputs
+    -------
+    text: a column of clean strings with no special characters
+    """
+    text = pd.Series(text)
+    if isinstance(text.dtype, pd.CategoricalDtype):
+        # Only clean each category once
+        categories = text.cat.categories
+        return text.map(
+            dict(zip(categories, remove_special_chars_series(categories.to_series())))
+        )
+    missing = text.isna().to_numpy()
+    values = text[~missing].astype(str).tolist()
+    cleaned = np.full(len(text), np.nan, dtype=object)
+    if len(values) == 0:
+        return pd.Series(cleaned, index=text.index)
+    # Translate the whole column in one call by joining the values with a separator
+    joined = ROW_SEPARATOR.join(values)
+    if joined.count(ROW_SEPARATOR) == len(values) - 1:
+        cleaned[~missing] = joined.translate(SPECIAL_CHARS_TABLE).split(ROW_SEPARATOR)
+    else:
+        cleaned[~missing] = [value.translate(SPECIAL_CHARS_TABLE) for value in values]
+    return pd.Series(cleaned, index=text.index)
+
 
-    for special_chars in [
-        '\\',
-        '`',
-        '*',
-        '{',
-        '}',
-        '[',
-        ']',
-        '(',
-        ')',
-        '>',
-        '#',
-        '^',
-        '*',
-        '@',
-        '!',
-        '+',
-        '.',
-        '%',
-        '!',
-        '$',
-        '&',
-        ':',
-        '\'',
-    ]:
-        if special_chars in text:
-            text = text.replace(special_chars, "")
-    return text
+def _zipcode5_from_ints(zip_ints: np.ndarray) -> np.ndarray:
+    """Integer 5-digit zip codes from zip codes stored as numbers."""
+    zip_ints = np.asarray(zip_ints, dtype='int64')
+    n_digits = np.floor(np.log10(np.maximum(zip_ints, 1))).astype('int64') + 1
+    # Numeric ZIP+4 codes have 9 digits, or 8 if the ZIP had a leading zero
+    is_zip_plus_4 = (n_digits == 8) | (n_digits == 9)
+    leading_5_digits = zip_ints // 10 ** np.maximum(n_digits - 5, 0)
+    return np.where(
+        zip_ints <= 99999,
+        zip_ints,
+        np.where(is_zip_plus_4, zip_ints // 10**4, leading_5_digits),
+    )
+
+
+def _zipcode5_from_value(raw_zipcode: T.Union[int, float, str]) -> T.Union[str, None]:
+    """5-character zip code from a single non-missing int, float or string."""
+    if isinstance(raw_zipcode, (int, float, np.number)) and not isinstance(
+        raw_zipcode, bool
+    ):
+        zip_text = str(int(round(raw_zipcode)))
+    else:
+        zip_text = str(raw_zipcode).strip().split('-', 1)[0]
+        # Drop a trailing '.0' from numbers that were read as text
+        whole, point, decimals = zip_text.partition('.')
+        if point and decimals.strip('0') == '':
+            zip_text = whole
+    if zip_text == '':
+        return np.nan
+    if zip_text.isdigit() and len(zip_text) in (8, 9):
+        return zip_text.zfill(9)[:5]
+    return zip_text[:5].zfill(5)
+
+
+def get_zipcode5_series(raw_zipcodes: pd.Series) -> pd.Series:
+    """Clean up a column of zip codes to 5-character strings.
+
+    Handles ints, floats (e.g. 21701.0) and strings, as well as ZIP+4 codes given as
+    '21701-1234', '217011234' or 217011234 (also with the leading zero dropped).
+    """
+    raw_zipcodes = pd.Series(raw_zipcodes)
+    if pd.api.types.is_numeric_dtype(raw_zipcodes.dtype) and not (
+        pd.api.types.is_bool_dtype(raw_zipcodes.dtype)
+    ):
+        values = raw_zipcodes.to_numpy(dtype='float64', na_value=np.nan)
+        missing = np.isnan(values)
+        zip_ints = _zipcode5_from_ints(np.where(missing, 0, np.round(values)))
+        codes, uniques = pd.factorize(zip_ints)
+        labels = np.array([str(u).zfill(5) for u in uniques] + [np.nan], dtype=object)
+        codes[missing] = -1
+    else:
+        # Zip codes repeat heavily, so clean each distinct value once
+        codes, uniques = pd.factorize(raw_zipcodes)
+        labels = np.array(
+            [_zipcode5_from_value(u) for u in uniques] + [np.nan], dtype=object
+        )
+    # Missing values have code -1, i.e. the trailing NaN label
+    return pd.Series(labels[codes], index=raw_zipcodes.index)
 
 
 def get_zipcode5(raw_zipcode: T.Union[int, float, str, None]) -> T.Union[str, None]:
     """Clean up the zip code to convert it to 5-character strings."""
     if pd.isna(raw_zipcode):
-        zip_code_5 = np.nan
-    # If column is numeric, convert to string
-    elif isinstance(raw_zipcode, (int, float)):
-        if raw_zipcode <= 99999:
-            zip_code_5 = str(int(raw_zipcode)).zfill(5)
-        else:
-            zip_code_5 = str(int(raw_zipcode))[:5].zfill(5)
-    else:
-        zip_code_5 = raw_zipcode[:5].zfill(5)
-
-    return zip_code_5
+        return np.nan
+    return _zipcode5_from_value(raw_zipcode)
@@ -5,8 +5,9 @@ A set of functions for geocoding data, either using the census geocoding API, or
 import io
 import json
 import logging
-import math
+import time
 import typing as T
+from collections import deque
 from pathlib import Path
 
 import numpy as np
@@ -14,12 +15,35 @@ import pandas as pd
 import requests
 from tqdm import tqdm
 
+from collection.geoid import (
+    COUNTY_MULTIPLIER,
+    STATE_MULTIPLIER,
+    geoid_key_to_str,
+    geoid_prefix,
+    make_geoid_key,
+    normalize_geoid,
+    to_geoid_key,
+)
+from collection.http_client import get_session
+from collection.record_schema import apply_record_schema
+
 # Global Variables
 from const import (
     GEOCODE_CACHE_SIZE,
+    GEOCODE_CHUNK_GROWTH_FACTOR,
+    GEOCODE_CHUNK_SHRINK_FACTOR,
     GEOCODE_CHUNK_SIZE,
+    GEOCODE_ERROR_WINDOW,
+    GEOCODE_MAX_CHUNK_RETRIES,
+    GEOCODE_MAX_CHUNK_SIZE,
+    GEOCODE_MIN_CHUNK_SIZE,
     GEOCODE_PAYLOAD,
+    GEOCODE_REQUEST_ERROR,
+    GEOCODE_REQUEST_TIMEOUT,
     GEOCODE_RESPONSE_HEADER,
+    GEOCODE_RETRY_BACKOFF_SECONDS,
+    GEOCODE_RETRY_MAX_BACKOFF_SECONDS,
+    GEOCODE_TARGET_CHUNK_SECONDS,
     GEOCODE_URL,
     GEOCODER_CACHE_FILE_PREFIX,
     HUD_XWALK_RESPONSE_BASE,
@@ -29,7 +53,7 @@ from const import (
 
 np.random.seed(RANDOM_SEED)
 
-from collection.address_cleaning import get_zipcode5
+logger = logging.getLogger(__name__)
 
 
 def format_data_for_geocoding(input_df: pd.DataFrame) -> T.Union[pd.DataFrame, None]:
@@ -77,19 +101,114 @@ def format_data_for_geocoding(input_df: pd.DataFrame) -> T.Union[pd.DataFrame, N
     return df_geocode_cols[correct_column_order]
 
 
-def generate_geocode_chunks(df_geocode_cols: pd.DataFrame) -> pd.DataFrame:
-    """Generate chunks of large files already formatted for the Census batch geocoder API"""
+class GeocodeBatchController:
+    """Adapt the Census batch geocoder chunk size to the observed latency and errors.
+
+    The chunk size grows while requests finish within the target latency and no
+    recent request failed, and shrinks on slow requests, timeouts or errors.
+    """
+
+    def __init__(
+        self,
+        initial_size: int = GEOCODE_CHUNK_SIZE,
+        min_size: int = GEOCODE_MIN_CHUNK_SIZE,
+        max_size: int = GEOCODE_MAX_CHUNK_SIZE,
+        target_seconds: float = GEOCODE_TARGET_CHUNK_SECONDS,
+    ) -> None:
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_seconds = target_seconds
+        self.chunk_size = int(min(max(initial_size, min_size), max_size))
+        self.recent_outcomes = deque(maxlen=GEOCODE_ERROR_WINDOW)
+        self.total_records = 0
+        self.total_seconds = 0.0
+        self.total_failures = 0
+        self.sizes_used = []
+
+    @property
+    def error_rate(self) -> float:
+        """Share of failed requests among the most recent ones."""
+        if len(self.recent_outcomes) == 0:
+            return 0.0
+        return 1 - sum(self.recent_outcomes) / len(self.recent_outcomes)
+
+    @property
+    def records_per_second(self) -> float:
+        """Throughput over all successful requests so far."""
+        if self.total_seconds == 0:
+            return 0.0
+        return self.total_records / self.total_seconds
+
+    def _resize(self, new_size: float, reason: str) -> None:
+        new_size = int(min(max(new_size, self.min_size), self.max_size))
+        if new_size != self.chunk_size:
+            logger.info(
+                'Geocoder batch size %d -> %d (%s)', self.chunk_size, new_size, reason
+            )
+            self.chunk_size = new_size
+
+    def record_success(self, record_count: int, seconds: float) -> None:
+        """Register a successful request and adapt the chunk size."""
+        self.recent_outcomes.append(True)
+        self.sizes_used.append(record_count)
+        self.total_records += record_count
+        self.total_seconds += seconds
+        logger.info(
+            'Geocoded batch of %d records in %.1fs (%.1f records/s)',
+            record_count,
+            seconds,
+            record_count / seconds if seconds > 0 else float('inf'),
+        )
+        if seconds > self.target_seconds:
+            # Scale towards the size that would have met the target latency
+            self._resize(
+                max(
+                    self.chunk_size * GEOCODE_CHUNK_SHRINK_FACTOR,
+                    record_count * self.target_seconds / seconds,
+                ),
+                f'{seconds:.1f}s latency above {self.target_seconds}s target',
+            )
+        elif self.error_rate == 0 and record_count >= self.chunk_size:
+            # Only grow once a full-sized chunk went through cleanly
+            self._resize(
+                self.chunk_size * GEOCODE_CHUNK_GROWTH_FACTOR, 'healthy latency'
+            )
+
+    def record_failure(
+        self, record_count: int, seconds: float, error: Exception
+    ) -> None:
+        """Register a failed or timed out request and shrink the chunk size."""
+        self.recent_outcomes.append(False)
+        self.total_failures += 1
+        logger.warning(
+            'Geocoder batch of %d records failed after %.1fs: %s',
+            record_count,
+            seconds,
+            error,
+        )
+        self._resize(
+            min(self.chunk_size, record_count) * GEOCODE_CHUNK_SHRINK_FACTOR,
+            f'request error, recent error rate {self.error_rate:.0%}',
+        )
+
+
+def generate_geocode_chunks(
+    df_geocode_cols: pd.DataFrame,
+    chunk_size: int = GEOCODE_CHUNK_SIZE,
+    controller: T.Optional[GeocodeBatchController] = None,
+) -> pd.DataFrame:
+    """Generate chunks of large files already formatted for the Census batch geocoder API
+
+    If a batch controller is given, each chunk takes the controller's current size, so
+    feedback recorded while a chunk is being geocoded applies to the next one.
+    """
     full_row_count = len(df_geocode_cols)
-    # If the dataset size is <= the chunk size, just yield it and return afterwards
-    if full_row_count <= GEOCODE_CHUNK_SIZE:
-        yield df_geocode_cols
-        return
     chunk_start_row = 0
     while chunk_start_row < full_row_count:
-        chunk_end_row = min(full_row_count, chunk_start_row + GEOCODE_CHUNK_SIZE - 1)
-        # print(chunk_start_row, chunk_end_row)
-        yield df_geocode_cols.loc[chunk_start_row:chunk_end_row, :]
-        chunk_start_row += GEOCODE_CHUNK_SIZE
+        if controller is not None:
+            chunk_size = controller.chunk_size
+        yield df_geocode_cols.iloc[chunk_start_row : chunk_start_row + chunk_size, :]
+        chunk_start_row += chunk_size
 
 
 def census_geocode_records(df_chunk: pd.DataFrame) -> pd.DataFrame:
@@ -105,7 +224,10 @@ def census_geocode_records(df_chunk: pd.DataFrame) -> pd.DataFrame:
     """
     text_df = df_chunk.to_csv(index=False, header=None)
     files = {"addressFile": ("chunk.csv", text_df, "text/csv")}
-    r = requests.post(GEOCODE_URL, files=files, data=GEOCODE_PAYLOAD)
+    r = get_session().post(
+        GEOCODE_URL, files=files, data=GEOCODE_PAYLOAD, timeout=GEOCODE_REQUEST_TIMEOUT
+    )
+    r.raise_for_status()
 
     geocoded_df = pd.read_csv(
         io.StringIO(r.text), names=GEOCODE_RESPONSE_HEADER, low_memory=False
@@ -122,6 +244,61 @@ def census_geocode_records(df_chunk: pd.DataFrame) -> pd.DataFrame:
     return geocoded_df
 
 
+def failed_geocode_records(df_chunk: pd.DataFrame) -> pd.DataFrame:
+    """Geocoder response for records whose requests kept failing: no match, marked
+    as request errors so that they are geocoded again and reported if that fails."""
+    failed_df = pd.DataFrame(
+        np.nan,
+        index=range(len(df_chunk)),
+        columns=GEOCODE_RESPONSE_HEADER + ['long', 'lat'],
+    )
+    failed_df['id'] = df_chunk['Unique ID'].values
+    failed_df['is_match'] = GEOCODE_REQUEST_ERROR
+    return failed_df
+
+
+def census_geocode_chunk_adaptive(
+    df_chunk: pd.DataFrame, controller: GeocodeBatchController, attempt: int = 1
+) -> pd.DataFrame:
+    """Geocode a chunk, splitting it up and retrying with smaller chunks on errors.
+
+    Retries wait exponentially longer, so that a short outage of the geocoder does not
+    use up all attempts; records still failing after the last attempt are returned
+    without a match (see failed_geocode_records) instead of failing the run.
+    """
+    start_time = time.perf_counter()
+    try:
+        geocoded_chunk = census_geocode_records(df_chunk)
+    except (requests.RequestException, pd.errors.ParserError) as e:
+        controller.record_failure(len(df_chunk), time.perf_counter() - start_time, e)
+        if attempt >= GEOCODE_MAX_CHUNK_RETRIES:
+            logger.error(
+                'Giving up on a geocoder batch of %d records after %d attempts: %s',
+                len(df_chunk),
+                attempt,
+                e,
+            )
+            return failed_geocode_records(df_chunk)
+        time.sleep(
+            min(
+                GEOCODE_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1),
+                GEOCODE_RETRY_MAX_BACKOFF_SECONDS,
+            )
+        )
+        # The controller has shrunk the chunk size, re-split the failed chunk to match
+        return pd.concat(
+            [
+                census_geocode_chunk_adaptive(sub_chunk, controller, attempt + 1)
+                for sub_chunk in generate_geocode_chunks(
+                    df_chunk, chunk_size=controller.chunk_size
+                )
+            ],
+            ignore_index=True,
+        )
+    controller.record_success(len(df_chunk), time.perf_counter() - start_time)
+    return geocoded_chunk
+
+
 def census_geocode_full_dataset(
     input_df: pd.DataFrame, data_type: str, cache_filepath: str, cache_off: bool = False
 ) -> T.Union[pd.DataFrame, None]:
@@ -132,18 +309,19 @@ def census_geocode_full_dataset(
 
     # Initialize some variables
     output_df = pd.DataFrame()
-    total_geocoded_chunks = 0
-    cache_every_n_chunks = math.ceil(GEOCODE_CACHE_SIZE / GEOCODE_CHUNK_SIZE)
+    cached_df = None
+    records_since_cache = 0
     cache_filename = (
         str(cache_filepath) + "/" + GEOCODER_CACHE_FILE_PREFIX + data_type + ".csv"
     )
 
     if cache_off == False:
         # Check to see if cached data are available; if so, use them
-        cached_df = None
         if Path(cache_filename).is_file():
             print("Found cached data, resuming geocoding from the previous cache point...")
             cached_df = pd.read_csv(cache_filename)
+            # Records whose requests failed are geocoded again
+            cached_df = cached_df[cached_df["is_match"] != GEOCODE_REQUEST_ERROR]
             # Use the `id` column to find the cached record IDs from the original dataframe
             cached_ids = cached_df["id"].unique()
             # Remove those record IDs from the original dataframe and geocode the rest
@@ -152,30 +330,40 @@ def census_geocode_full_dataset(
     # Format the dataframe for geocoding with Census Batch Geocoder API
     df_geocode_cols = format_data_for_geocoding(input_df)
 
-    # Loop through the dataframe chunks and geocode them
-    for chunk in tqdm(
-        generate_geocode_chunks(df_geocode_cols),
-        desc="Geocoding progress",
-        total=math.ceil(len(df_geocode_cols) / GEOCODE_CHUNK_SIZE),
-    ):
-        geocoded_chunk = census_geocode_records(chunk)
-        if len(output_df) == 0:
-            output_df = geocoded_chunk
-        else:
-            output_df = pd.concat([output_df, geocoded_chunk], ignore_index=True)
-
-        # Check how many chunks we have geocoded and cache if it is time to do so
-        total_geocoded_chunks += 1
-        if total_geocoded_chunks % cache_every_n_chunks == 0:
-            # If we have a cache available, append to the geocoded data, assuming process resumed
-            if cached_df is not None:
-                output_df = pd.concat([cached_df, output_df], ignore_index=True)
-            output_df.to_csv(cache_filename, index=False)
+    # Loop through the dataframe chunks and geocode them, adapting the chunk size
+    controller = GeocodeBatchController()
+    with tqdm(
+        desc=f"Geocoding {data_type} data", total=len(df_geocode_cols), unit="records"
+    ) as progress:
+        for chunk in generate_geocode_chunks(df_geocode_cols, controller=controller):
+            geocoded_chunk = census_geocode_chunk_adaptive(chunk, controller)
+            if len(output_df) == 0:
+                output_df = geocoded_chunk
+            else:
+                output_df = pd.concat([output_df, geocoded_chunk], ignore_index=True)
+            progress.update(len(chunk))
+
+            # Check how many records we have geocoded and cache if it is time to do so
+            records_since_cache += len(chunk)
+            if cache_off == False and records_since_cache >= GEOCODE_CACHE_SIZE:
+                # Keep the records of an earlier (resumed) run in the cache file too
+                pd.concat([cached_df, output_df], ignore_index=True).to_csv(
+                    cache_filename, index=False
+                )
+                records_since_cache = 0
+
+    if controller.total_records > 0:
+        logger.info(
+            'Geocoded %d %s records at %.1f records/s using batch sizes %s',
+            controller.total_records,
+            data_type,
+            controller.records_per_second,
+            sorted(set(controller.sizes_used)),
+        )
 
     # If we have a cache available, append to the geocoded data, assuming process resumed
-    if cache_off == False:
-            if cached_df is not None:
-                output_df = pd.concat([cached_df, output_df], ignore_index=True)
+    if cached_df is not None:
+        output_df = pd.concat([cached_df, output_df], ignore_index=True)
     return output_df
 
 
@@ -201,23 +389,13 @@ def append_census_geocode_data(
     )
 
     # Create a census geoid column
-    state_fips = [
-        str(int(x)).zfill(2) if pd.notna(x) else ""
-        for x in output_geocoded_df["state_fips"]
-    ]
-    county_fips = [
-        str(int(x)).zfill(3) if pd.notna(x) else ""
-        for x in output_geocoded_df["county_fips"]
-    ]
-    tract_id = [
-        str(int(x)).zfill(6) if pd.notna(x) else "" for x in output_geocoded_df["tract"]
-    ]
-
-    output_geocoded_df["geoid"] = [
-        x[0] + x[1] + x[2] for x in zip(state_fips, county_fips, tract_id)
-    ]
-    # Replace blanks by NaN/missing
-    output_geocoded_df["geoid"].replace("", np.nan, inplace=True)
+    output_geocoded_df["geoid"] = geoid_key_to_str(
+        make_geoid_key(
+            output_geocoded_df["state_fips"],
+            output_geocoded_df["county_fips"],
+            output_geocoded_df["tract"],
+        )
+    )
 
     success_record_count = output_geocoded_df["state_fips"].notna().sum()
     # NOTE: Very strange, success rate varies by run... the same record sometimes gets geocoded, sometimes not!
@@ -254,10 +432,7 @@ def geocode_input_data(
     if "geoid" in df_avail_cols:
         output_geocoded_df = input_df.copy()
         # However, standardize geoid column first to avoid merge issues later
-        output_geocoded_df["geoid"] = [
-            str(int(x)).zfill(11) if pd.notna(x) else ""
-            for x in output_geocoded_df["geoid"]
-        ]
+        output_geocoded_df["geoid"] = normalize_geoid(output_geocoded_df["geoid"])
     # If a street address is available, use the census geocoder to geocode
     elif "street_address_1" in df_avail_cols:
         print(f"\nStarting geocoding of {data_type} data...")
@@ -272,14 +447,14 @@ def geocode_input_data(
             f"{addr_success_record_count / len(input_df) * 100:.1f}% of input records",
         )
         #if failed_geocoded_df has rows, try to geocode them again
-        if len(failed_geocoded_df) > 0:
+        if failed_geocoded_df is not None and len(failed_geocoded_df) > 0:
             addr_geocoded_df2, addr_success_record_count2, failed_geocoded_df2 = append_census_geocode_data(
                 failed_geocoded_df, data_type, cache_filepath, cache_off=True
             )
             #append the second geocoded dataframe to the first
             addr_geocoded_df = pd.concat([addr_geocoded_df, addr_geocoded_df2], ignore_index=True)
         
-            if len(failed_geocoded_df2) > 0:
+            if failed_geocoded_df2 is not None and len(failed_geocoded_df2) > 0:
                 addr_geocoded_df3, addr_success_record_count3, failed_geocoded_df3 = append_census_geocode_data(
                     failed_geocoded_df2, data_type, cache_filepath, cache_off=True
                 )
@@ -290,7 +465,7 @@ def geocode_input_data(
     else:
         output_geocoded_df = input_df.copy()
 
-    return output_geocoded_df
+    return apply_record_schema(output_geocoded_df)
 
 
 def find_state_county_city(geocoded_df: pd.DataFrame) -> T.Tuple[str, list, str, str]:
@@ -301,67 +476,39 @@ def find_state_county_city(geocoded_df: pd.DataFrame) -> T.Tuple[str, list, str,
 
     # If geoid is present use that to determine state and county FIPS
     if "geoid" in geocoded_df.columns:
-        # Get the relevant column and drop empty rows
-        only_geo_df = geocoded_df[["geoid"]].copy()
-        only_geo_df.dropna(inplace=True)
-        # Make sure it is a string value, not a numeric value
-        if np.issubdtype(only_geo_df["geoid"].dtype, np.number):
-            only_geo_df["geoid"] = [str(int(x)).zfill(11) for x in only_geo_df["geoid"]]
-        # Now extract the value counts and get the highest one (sorted DESC by default)
-        # Can get more sophisticated for low sample / higher ambiguity data, but leave for later
-        most_likely_state_fips = (
-            only_geo_df["geoid"].str.slice(stop=2).value_counts().index[0]
-        )
-        all_county_fips = (
-            only_geo_df["geoid"].str.slice(stop=5).value_counts().index.to_list()
+        county_keys = geoid_prefix(
+            to_geoid_key(geocoded_df["geoid"]).dropna(), COUNTY_MULTIPLIER
         )
-        #limit the list to those where the first 2 digits match the state fips
-        most_likely_county_fips = [x[2:5] for x in all_county_fips if x[:2] == most_likely_state_fips]
-        most_likely_county_fips_str = []
-
-        #check if the items within most_likely_county_fips are numbers
-        #if so, convert to string and pad with 0s
-        for item in most_likely_county_fips:
-            if isinstance(item, (int, float, complex)):
-                #append to number_list
-                str_item = str(int(item)).zfill(3)
-                most_likely_county_fips_str.append(str_item)
-            elif isinstance(item, str):
-                str_item = item.zfill(3)
-                most_likely_county_fips_str.append(str_item)
-            else:
-                most_likely_county_fips_str.append("None")
-
     # Otherwise check if state_fips and county_fips are present in the data
     elif ("state_fips" in geocoded_df.columns) and (
         "county_fips" in geocoded_df.columns
     ):
-        # Likely these are raw outputs from the census geocoder and numeric by default
-        most_likely_state_fips = geocoded_df["state_fips"].value_counts().index[0]
-        if isinstance(most_likely_state_fips, (int, float)):
-            most_likely_state_fips = str(int(most_likely_state_fips)).zfill(2)
-
-        all_county_fips = (
-            only_geo_df["geoid"].str.slice(stop=5).value_counts().index.to_list()
+        county_keys = geoid_prefix(
+            make_geoid_key(
+                geocoded_df["state_fips"], geocoded_df["county_fips"], 0
+            ).dropna(),
+            COUNTY_MULTIPLIER,
         )
-        #limit the list to those where the first 2 digits match the state fips
-        most_likely_county_fips = [x[2:5] for x in all_county_fips if x[:2] == most_likely_state_fips]
-        most_likely_county_fips_str = []
-        #check if the items within most_likely_county_fips are numbers
-        #if so, convert to string and pad with 0s
-        for item in most_likely_county_fips:
-            if isinstance(item, (int, float, complex)):
-                #append to number_list
-                str_item = str(int(item)).zfill(3)
-                most_likely_county_fips_str.append(str_item)
-            elif isinstance(item, str):
-                str_item = item.zfill(3)
-                most_likely_county_fips_str.append(str_item)
-            else:
-                most_likely_county_fips_str.append("None")
     else:
+        county_keys = None
+
+    if county_keys is None or len(county_keys) == 0:
         most_likely_state_fips = None
         most_likely_county_fips_str = None
+    else:
+        # Take the most common state, and all of its counties (sorted DESC by count)
+        # Can get more sophisticated for low sample / higher ambiguity data, but leave for later
+        county_counts = county_keys.value_counts()
+        state_keys = county_counts.index.values // (
+            STATE_MULTIPLIER // COUNTY_MULTIPLIER
+        )
+        state_counts = county_counts.groupby(state_keys).sum()
+        most_likely_state = state_counts.idxmax()
+        most_likely_state_fips = str(most_likely_state).zfill(2)
+        state_county_keys = county_counts.index[state_keys == most_likely_state]
+        most_likely_county_fips_str = [
+            str(key % 1000).zfill(3) for key in state_county_keys
+        ]
 
     # Find the city
     if "city" in geocoded_df.columns:
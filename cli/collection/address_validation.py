@@ -4,12 +4,10 @@ from pathlib import Path
 import pandas as pd
 import scourgify
 
-from collection.address_cleaning import get_zipcode5
+from collection.address_cleaning import get_zipcode5_series
+from collection.record_schema import apply_record_schema
 from const import MAX_YEAR, MIN_YEAR, REQUIRED_ADDRESS_COLUMNS, REQUIRED_SUB_DIRECTORIES
 
-import debugpy
-
-
 
 # Requires input_path
 def verify_input_directory(input_path: str) -> T.List:
@@ -174,8 +172,20 @@ def validate_address_data(data: pd.DataFrame, data_type: str) -> pd.DataFrame:
 
     columns_to_return = [date_column, 'year', 'month'] + usable_address_cols
 
+    # Also keep the (optional) eviction judgment dates, which the summary counts too;
+    # the data collection template spells the column 'Eviction_Judgement_Date'
+    data = data.rename(columns={'eviction_judgement_date': 'eviction_judgment_date'})
+    judgment_columns = [
+        col
+        for col in ['eviction_judgment_date']
+        if date_column == 'eviction_filing_date'
+        and col in data.columns
+        and data[col].notna().any()
+    ]
+
     data = data.loc[
-        (data['year'] >= MIN_YEAR) & (data['year'] <= MAX_YEAR), columns_to_return
+        (data['year'] >= MIN_YEAR) & (data['year'] <= MAX_YEAR),
+        columns_to_return + judgment_columns,
     ]
 
     return data, columns_to_return
@@ -213,11 +223,17 @@ def standardize_input_addresses(
         return (None, None, None)
     # Standardize the addresses using the usaddress-scourgify library
     output_df, df_avail_cols = validate_address_data(input_df, data_type)
+    df_errors = None
     if 'street_address_1' in df_avail_cols:
         print(f"\nStandardizing {data_type} data addresses for geocoding...")
         df_all_addresses = output_df
-        df_all_addresses['street_address_1_clean'] = output_df['street_address_1'].apply(
-            get_clean_address
+        # Court records repeat addresses heavily, so parse each distinct address once
+        unique_addresses = output_df['street_address_1'].dropna().unique()
+        clean_addresses = {
+            address: get_clean_address(address) for address in unique_addresses
+        }
+        df_all_addresses['street_address_1_clean'] = output_df['street_address_1'].map(
+            clean_addresses
         )
         df_errors = df_all_addresses[df_all_addresses['street_address_1_clean'].str.contains('ERROR')][['street_address_1', 'city', 'state', 'zip_code', 'street_address_1_clean']]
         df_errors.rename(columns = {'street_address_1_clean': 'errors'}, inplace = True)
@@ -229,7 +245,7 @@ def standardize_input_addresses(
         df_avail_cols.append('street_address_1_clean')
     # Also standardize the zip codes to 5-character strings
     if 'zip_code' in df_avail_cols:
-        output_df['zip_code_clean'] = output_df['zip_code'].apply(get_zipcode5)
+        output_df['zip_code_clean'] = get_zipcode5_series(output_df['zip_code'])
         df_avail_cols.append('zip_code_clean')
 
-    return output_df, df_errors, df_avail_cols
+    return apply_record_schema(output_df), df_errors, df_avail_cols
@@ -0,0 +1,140 @@
+"""
+Checkpoints for the stages of a run of the tool
+
+Each stage result is pickled together with a fingerprint of its inputs (input files,
+settings and the fingerprints of upstream stages) and of the version of the pipeline.
+When the tool is run again, a stage whose fingerprint is unchanged and whose output
+files still exist is loaded from its checkpoint instead of being run, so a run resumes
+from the first failed or stale stage.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import pickle
+import time
+import typing as T
+from pathlib import Path
+
+from collection.disk_cache import read_pickle, write_pickle
+from const import PIPELINE_VERSION
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = 'manifest.json'
+
+
+def fingerprint(*parts: T.Any) -> str:
+    """Stable hash of the given values (strings, numbers, paths, lists, dicts)."""
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def files_fingerprint(paths: T.Iterable[T.Union[str, Path]]) -> str:
+    """Fingerprint of the given files and directory trees, by name, size and mtime."""
+    file_stats = []
+    for path in paths:
+        path = Path(path)
+        files = sorted(path.rglob('*')) if path.is_dir() else [path]
+        for f in files:
+            if f.is_file():
+                stat = f.stat()
+                file_stats.append((str(f), stat.st_size, stat.st_mtime_ns))
+    return fingerprint(file_stats)
+
+
+class CheckpointStore:
+    """Run pipeline stages, reusing the persisted result of the stages up to date."""
+
+    def __init__(self, checkpoint_dir: T.Union[str, Path], resume: bool = True):
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.resume = resume
+        # Fingerprints of the stages of this run, for use as inputs of later stages
+        self.fingerprints: T.Dict[str, str] = {}
+        self.manifest = self._read_manifest() if resume else {}
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.checkpoint_dir / MANIFEST_FILENAME
+
+    def _read_manifest(self) -> T.Dict:
+        try:
+            with open(self.manifest_path) as infile:
+                return json.load(infile)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self) -> None:
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as outfile:
+            json.dump(self.manifest, outfile, indent=2)
+        tmp_path.replace(self.manifest_path)
+
+    def stage_file(self, stage: str) -> Path:
+        return self.checkpoint_dir / f'{stage}.pkl'
+
+    def is_current(self, stage: str, stage_fingerprint: str) -> bool:
+        """Whether the stage has a completed checkpoint of these inputs and outputs."""
+        entry = self.manifest.get(stage)
+        return (
+            self.resume
+            and entry is not None
+            and entry.get('status') == 'completed'
+            and entry.get('fingerprint') == stage_fingerprint
+            and self.stage_file(stage).is_file()
+            and all(Path(output).exists() for output in entry.get('outputs', []))
+        )
+
+    def invalidate(self, stages: T.Iterable[str]) -> None:
+        """Forget the checkpoints of the given stages, so the next run reruns them."""
+        removed = [stage for stage in stages if self.manifest.pop(stage, None)]
+        if removed:
+            self._write_manifest()
+
+    def run(
+        self,
+        stage: str,
+        inputs: T.Sequence[T.Any],
+        func: T.Callable[[], T.Any],
+        outputs: T.Sequence[T.Union[str, Path]] = (),
+    ) -> T.Any:
+        """Return the result of a stage, from its checkpoint if it is up to date.
+
+        inputs: values that determine the result of the stage, including the
+          fingerprints of the upstream stages it uses (see `fingerprints`)
+        outputs: files written by the stage, which are checked for on resume
+        """
+        stage_fingerprint = fingerprint(PIPELINE_VERSION, stage, list(inputs))
+        self.fingerprints[stage] = stage_fingerprint
+        if self.is_current(stage, stage_fingerprint):
+            try:
+                value = read_pickle(self.stage_file(stage))
+                print('\u2713', f'Resuming from the checkpoint of the {stage} stage.')
+                return value
+            except (OSError, EOFError, pickle.UnpicklingError):
+                logger.warning('Unreadable checkpoint for stage %s, rerunning', stage)
+
+        entry = {
+            'fingerprint': stage_fingerprint,
+            'status': 'running',
+            'started': datetime.datetime.now().isoformat(timespec='seconds'),
+            'outputs': [str(output) for output in outputs],
+        }
+        self.manifest[stage] = entry
+        self._write_manifest()
+        start_time = time.perf_counter()
+        try:
+            value = func()
+        except BaseException as e:
+            entry['status'] = 'failed'
+            entry['error'] = f'{type(e).__name__}: {e}'
+            self._write_manifest()
+            raise
+        entry['seconds'] = round(time.perf_counter() - start_time, 1)
+        entry['status'] = (
+            'completed' if write_pickle(self.stage_file(stage), value) else 'unsaved'
+        )
+        self._write_manifest()
+        return value
@@ -0,0 +1,92 @@
+"""
+Date handling for the input data: detect the date format of each column from a sample,
+parse each distinct date string once, and derive compact year/month columns
+"""
+
+import typing as T
+
+import numpy as np
+import pandas as pd
+
+from const import (
+    DATE_FORMAT_CANDIDATES,
+    DATE_FORMAT_MIN_MATCH_RATE,
+    DATE_FORMAT_SAMPLE_SIZE,
+)
+
+
+def detect_date_format(
+    dates: pd.Series, sample_size: int = DATE_FORMAT_SAMPLE_SIZE
+) -> T.Union[str, None]:
+    """Find the first candidate format that parses (nearly) all of a sample of dates."""
+    sample = pd.Series(pd.unique(dates.dropna().astype(str).str.strip()))
+    sample = sample[sample != ''].head(sample_size)
+    if len(sample) == 0:
+        return None
+    for date_format in DATE_FORMAT_CANDIDATES:
+        parsed = pd.to_datetime(sample, format=date_format, errors='coerce')
+        if parsed.notna().mean() >= DATE_FORMAT_MIN_MATCH_RATE:
+            return date_format
+    return None
+
+
+def parse_date_column(
+    dates: pd.Series, date_format: T.Optional[str] = None
+) -> pd.Series:
+    """Parse a column of dates, returning it unchanged if it is already parsed.
+
+    Court records repeat the same dates heavily, so each distinct value is parsed only
+    once. Values that do not match the detected format fall back to pandas inference,
+    and unparseable values become NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates.dtype):
+        return dates
+    if not (
+        pd.api.types.is_object_dtype(dates.dtype)
+        or pd.api.types.is_string_dtype(dates.dtype)
+        or isinstance(dates.dtype, pd.CategoricalDtype)
+    ):
+        return pd.to_datetime(dates, errors='coerce')
+
+    codes, uniques = pd.factorize(dates)
+    unique_strs = pd.Series(uniques).astype(str).str.strip()
+    if date_format is None:
+        date_format = detect_date_format(unique_strs)
+    if date_format is not None:
+        parsed = pd.to_datetime(unique_strs, format=date_format, errors='coerce')
+    else:
+        parsed = pd.Series(pd.NaT, index=unique_strs.index)
+    # Anything the detected format missed (mixed formats, Excel datetimes, ...)
+    unparsed = parsed.isna()
+    if unparsed.any():
+        parsed[unparsed] = pd.to_datetime(pd.Series(uniques)[unparsed], errors='coerce')
+    # Missing values have code -1, i.e. the trailing NaT
+    parsed_values = np.append(
+        parsed.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT')
+    )
+    return pd.Series(parsed_values[codes], index=dates.index, name=dates.name)
+
+
+def parse_date_columns(
+    data: pd.DataFrame, min_parsed_rate: float = 0.5
+) -> pd.DataFrame:
+    """Parse every column with 'date' in its name, detecting the format per column.
+
+    Columns where fewer than `min_parsed_rate` of the non-missing values parse as dates
+    are left as they are.
+    """
+    for column in data.columns:
+        if 'date' not in str(column).lower():
+            continue
+        parsed = parse_date_column(data[column])
+        non_missing = data[column].notna().sum()
+        if non_missing > 0 and parsed.notna().sum() / non_missing >= min_parsed_rate:
+            data[column] = parsed
+    return data
+
+
+def add_year_month_columns(data: pd.DataFrame, date_column: str) -> pd.DataFrame:
+    """Add compact `year` (int16) and `month` (monthly period) columns from dates."""
+    data['year'] = data[date_column].dt.year.astype('int16')
+    data['month'] = data[date_column].dt.to_period('M')
+    return data
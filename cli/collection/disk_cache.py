@@ -0,0 +1,64 @@
+"""
+Simple on-disk cache for downloaded reference data (ACS tables, tract geometry)
+
+Entries are pickled to one file per key and written atomically, so several processes
+(e.g. the workers of a batch run) can share a cache directory safely.
+"""
+
+import os
+import pickle
+import tempfile
+import typing as T
+from pathlib import Path
+
+
+def cache_file(cache_dir: T.Union[str, Path], key: str) -> Path:
+    """Path of the cache entry for a key."""
+    return Path(cache_dir) / f'{key}.pkl'
+
+
+def read_pickle(path: T.Union[str, Path]) -> T.Any:
+    """Read a pickled value; raises OSError, EOFError or UnpicklingError if broken."""
+    with open(path, 'rb') as infile:
+        return pickle.load(infile)
+
+
+def write_pickle(path: T.Union[str, Path], value: T.Any) -> bool:
+    """Pickle a value to a file atomically; returns False if it could not be written."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file first so other processes never read a partial entry
+    fd, tmp_filename = tempfile.mkstemp(dir=str(path.parent), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as outfile:
+            pickle.dump(value, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filename, path)
+    except OSError:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        return False
+    return True
+
+
+def load_or_fetch(
+    cache_dir: T.Union[str, Path, None], key: str, fetch: T.Callable[[], T.Any]
+) -> T.Any:
+    """Return the cached value for a key, or fetch it and store it in the cache.
+
+    Without a cache directory the value is always fetched. Empty (None) values are not
+    cached, so failed downloads are retried by the next run.
+    """
+    if cache_dir is None:
+        return fetch()
+    path = cache_file(cache_dir, key)
+    if path.is_file():
+        try:
+            return read_pickle(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            # Unreadable entry, fetch it again below
+            pass
+    value = fetch()
+    if value is None or (isinstance(value, tuple) and value[0] is None):
+        return value
+    write_pickle(path, value)
+    return value
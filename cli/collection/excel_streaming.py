@@ -0,0 +1,251 @@
+"""
+Streaming reader for large .xlsx court exports
+
+`pd.read_excel` loads a whole worksheet through openpyxl cell objects before building
+the dataframe, which is slow and holds every cell in memory twice. This reader parses
+the worksheet XML of the .xlsx archive as a stream instead, one row element at a time,
+and hands out dataframes of a fixed number of rows (`iter_excel_batches`), so a
+consumer of the batches only holds one batch at a time. `read_excel_streaming` builds
+the whole table from the batches: when they are concatenated, both the batches and the
+result are in memory (about twice the table), but never any openpyxl cell objects.
+
+All worksheets with the same (normalized) header as the first one are read, e.g. for
+exports split over several sheets because of the row limit of Excel. Cell values are
+converted like `pd.read_excel` does: shared and inline strings to text, whole numbers
+to ints, numbers with a date format to datetimes, booleans to bools and errors to NaN.
+"""
+
+import re
+import typing as T
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path, PurePosixPath
+
+import pandas as pd
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel
+
+from collection.record_schema import normalize_column_names
+from const import EXCEL_BATCH_ROWS
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+RELATIONSHIP_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+DOCUMENT_RELATIONSHIP_ID = (
+    '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+)
+ROW_TAG = f'{MAIN_NS}row'
+VALUE_TAG = f'{MAIN_NS}v'
+INLINE_STRING_TAG = f'{MAIN_NS}is'
+TEXT_TAG = f'{MAIN_NS}t'
+RICH_TEXT_RUN_TAG = f'{MAIN_NS}r'
+COLUMN_LETTERS = re.compile(r'[A-Z]+')
+
+
+def read_xml(archive: zipfile.ZipFile, member: str) -> T.Optional[ET.Element]:
+    """Parse a (small) XML member of the archive, None if it does not exist."""
+    if member not in archive.namelist():
+        return None
+    with archive.open(member) as infile:
+        return ET.parse(infile).getroot()
+
+
+def string_item_text(item: ET.Element) -> str:
+    """Text of a shared or inline string, without its phonetic runs."""
+    parts = []
+    for child in item:
+        if child.tag == TEXT_TAG:
+            parts.append(child.text or '')
+        elif child.tag == RICH_TEXT_RUN_TAG:
+            parts.extend(text.text or '' for text in child.iter(TEXT_TAG))
+    return ''.join(parts)
+
+
+def shared_strings(archive: zipfile.ZipFile) -> T.List[str]:
+    """The shared string table, streamed since it can be as large as the sheet."""
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as infile:
+        for _, element in ET.iterparse(infile):
+            if element.tag == f'{MAIN_NS}si':
+                strings.append(string_item_text(element))
+                element.clear()
+    return strings
+
+
+def date_styles(archive: zipfile.ZipFile) -> T.Set[int]:
+    """Indexes of the cell styles with a date (or time) number format."""
+    styles = read_xml(archive, 'xl/styles.xml')
+    if styles is None:
+        return set()
+    formats = dict(BUILTIN_FORMATS)
+    for number_format in styles.iter(f'{MAIN_NS}numFmt'):
+        formats[int(number_format.get('numFmtId'))] = number_format.get('formatCode')
+    cell_formats = styles.find(f'{MAIN_NS}cellXfs')
+    if cell_formats is None:
+        return set()
+    return {
+        index
+        for index, cell_format in enumerate(cell_formats)
+        if is_date_format(formats.get(int(cell_format.get('numFmtId', 0)), ''))
+    }
+
+
+def worksheets(archive: zipfile.ZipFile) -> T.List[T.Tuple[str, str]]:
+    """Names and archive members of the worksheets, in workbook order."""
+    workbook = read_xml(archive, 'xl/workbook.xml')
+    relationships = read_xml(archive, 'xl/_rels/workbook.xml.rels')
+    targets = {
+        relationship.get('Id'): relationship.get('Target')
+        for relationship in relationships.iter(f'{RELATIONSHIP_NS}Relationship')
+    }
+    sheets = []
+    for sheet in workbook.iter(f'{MAIN_NS}sheet'):
+        target = targets.get(sheet.get(DOCUMENT_RELATIONSHIP_ID), '')
+        # Targets are relative to xl/, or absolute within the archive
+        member = (
+            target.lstrip('/')
+            if target.startswith('/')
+            else str(PurePosixPath('xl') / target)
+        )
+        if member in archive.namelist():
+            sheets.append((sheet.get('name'), member))
+    return sheets
+
+
+def workbook_epoch(archive: zipfile.ZipFile) -> T.Any:
+    """Date system of the workbook: 1900 (Windows) or 1904 (older Mac files)."""
+    workbook = read_xml(archive, 'xl/workbook.xml')
+    properties = workbook.find(f'{MAIN_NS}workbookPr')
+    if properties is not None and properties.get('date1904') in ('1', 'true'):
+        return CALENDAR_MAC_1904
+    return CALENDAR_WINDOWS_1900
+
+
+def column_index(reference: str, cache: T.Dict[str, int]) -> int:
+    """Zero-based column of a cell reference such as 'AB12'."""
+    letters = COLUMN_LETTERS.match(reference).group()
+    index = cache.get(letters)
+    if index is None:
+        index = 0
+        for letter in letters:
+            index = index * 26 + ord(letter) - 64
+        index = cache[letters] = index - 1
+    return index
+
+
+def iter_sheet_rows(
+    archive: zipfile.ZipFile,
+    member: str,
+    strings: T.List[str],
+    dates: T.Set[int],
+    epoch: T.Any,
+) -> T.Iterator[T.List[T.Any]]:
+    """Values of the non-empty rows of a worksheet, streamed from its XML."""
+    columns: T.Dict[str, int] = {}
+    with archive.open(member) as infile:
+        for _, element in ET.iterparse(infile):
+            if element.tag != ROW_TAG:
+                continue
+            values = []
+            for cell in element:
+                cell_type = cell.get('t')
+                text = None
+                for child in cell:
+                    if child.tag == VALUE_TAG:
+                        text = child.text
+                    elif child.tag == INLINE_STRING_TAG:
+                        text = string_item_text(child)
+                if text is None:
+                    continue
+                if cell_type == 's':
+                    value = strings[int(text)]
+                elif cell_type in ('str', 'inlineStr'):
+                    value = text
+                elif cell_type == 'b':
+                    value = text == '1'
+                elif cell_type == 'e':
+                    value = None
+                elif cell_type == 'd':
+                    value = pd.Timestamp(text)
+                else:
+                    value = float(text)
+                    if int(cell.get('s', 0)) in dates:
+                        value = from_excel(value, epoch)
+                    elif value.is_integer():
+                        value = int(value)
+                reference = cell.get('r')
+                index = column_index(reference, columns) if reference else len(values)
+                if index > len(values):
+                    values.extend([None] * (index - len(values)))
+                values.append(value)
+            element.clear()
+            if values:
+                yield values
+
+
+def batch_frame(rows: T.List[T.List[T.Any]], header: T.List[str]) -> pd.DataFrame:
+    """Dataframe of a batch of rows, with unnamed columns for cells past the header."""
+    width = max(len(header), max((len(row) for row in rows), default=0))
+    columns = header + [f'unnamed_{i}' for i in range(len(header), width)]
+    return pd.DataFrame.from_records(
+        [row + [None] * (width - len(row)) for row in rows], columns=columns
+    )
+
+
+def iter_excel_batches(
+    path: T.Union[str, Path], batch_rows: int = EXCEL_BATCH_ROWS
+) -> T.Iterator[pd.DataFrame]:
+    """Rows of an .xlsx workbook as dataframes of up to batch_rows rows.
+
+    The first non-empty row of each sheet is its header; the column names are
+    normalized like those of CSV files. Sheets with another header than the first
+    sheet are skipped.
+    """
+    with zipfile.ZipFile(path) as archive:
+        strings = shared_strings(archive)
+        dates = date_styles(archive)
+        epoch = workbook_epoch(archive)
+        first_header = None
+        for name, member in worksheets(archive):
+            rows = iter_sheet_rows(archive, member, strings, dates, epoch)
+            header_row = next(rows, None)
+            if header_row is None:
+                continue
+            header = list(
+                normalize_column_names(
+                    pd.Index(
+                        [
+                            f'Unnamed: {i}' if value is None else value
+                            for i, value in enumerate(header_row)
+                        ]
+                    )
+                )
+            )
+            if first_header is None:
+                first_header = header
+            elif header != first_header:
+                print(
+                    '\u2326',
+                    f'Sheet {name} has other columns than the first sheet and is',
+                    'ignored.',
+                )
+                continue
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == batch_rows:
+                    yield batch_frame(batch, header)
+                    batch = []
+            if batch:
+                yield batch_frame(batch, header)
+
+
+def read_excel_streaming(
+    path: T.Union[str, Path], batch_rows: int = EXCEL_BATCH_ROWS
+) -> pd.DataFrame:
+    """Read the sheets of a workbook with the header of the first into one table."""
+    batches = list(iter_excel_batches(path, batch_rows))
+    if not batches:
+        return pd.DataFrame()
+    return pd.concat(batches, ignore_index=True)
@@ -0,0 +1,113 @@
+"""
+Vectorized construction and normalization of census tract GEOIDs
+
+A tract GEOID is handled as a compact integer key, state * 10^9 + county * 10^6 + tract,
+with an 11-character zero-padded string view for output files. Joins between geocoded
+data, ACS data and tract geometry are done on the integer keys.
+"""
+
+import typing as T
+
+import numpy as np
+import pandas as pd
+
+GEOID_LENGTH = 11
+STATE_MULTIPLIER = 10**9
+COUNTY_MULTIPLIER = 10**6
+# Temporary column used to join dataframes on integer GEOID keys
+GEOID_KEY_COLUMN = 'geoid_key'
+
+
+def to_int_codes(values: T.Any) -> T.Union[pd.Series, int, None]:
+    """Convert FIPS/tract codes or GEOIDs (numbers or strings) to nullable integers.
+
+    Scalars are returned as a plain int (or None when missing) so they broadcast.
+    """
+    if np.isscalar(values) or values is None:
+        if pd.isna(values) or str(values).strip() == '':
+            return None
+        return int(float(values))
+    codes = pd.Series(values)
+    if not pd.api.types.is_numeric_dtype(codes.dtype):
+        # Strings such as '021' or '24021750100', but also '21.0' read from CSV files
+        codes = pd.to_numeric(
+            codes.astype(object).where(codes.notna()).astype(str).str.strip(),
+            errors='coerce',
+        )
+    return codes.round().astype('Int64')
+
+
+def make_geoid_key(state_fips: T.Any, county_fips: T.Any, tract: T.Any) -> pd.Series:
+    """Build integer tract GEOID keys from state, county and tract codes.
+
+    Any of the inputs can be a scalar; a key is missing if any of its parts is missing.
+    """
+    state = to_int_codes(state_fips)
+    county = to_int_codes(county_fips)
+    tract_code = to_int_codes(tract)
+    if any(part is None for part in (state, county, tract_code)):
+        length = max(
+            (len(p) for p in (state, county, tract_code) if isinstance(p, pd.Series)),
+            default=1,
+        )
+        return pd.Series([pd.NA] * length, dtype='Int64')
+    keys = state * STATE_MULTIPLIER + county * COUNTY_MULTIPLIER + tract_code
+    if not isinstance(keys, pd.Series):
+        keys = pd.Series([keys], dtype='Int64')
+    return keys
+
+
+def to_geoid_key(geoids: T.Any) -> pd.Series:
+    """Normalize a GEOID column of strings, ints or floats to integer keys."""
+    return to_int_codes(pd.Series(geoids))
+
+
+def geoid_key_to_str(keys: pd.Series, width: int = GEOID_LENGTH) -> pd.Series:
+    """Fixed-width, zero-padded string view of GEOID keys; missing keys stay NaN."""
+    keys = pd.Series(keys, dtype='Int64')
+    missing = keys.isna()
+    geoid_strs = keys.fillna(0).astype('int64').astype(str).str.zfill(width)
+    return geoid_strs.where(~missing, np.nan)
+
+
+def normalize_geoid(geoids: T.Any) -> pd.Series:
+    """Normalize a GEOID column (e.g. integers read from CSV) to 11-character text."""
+    return geoid_key_to_str(to_geoid_key(geoids))
+
+
+def geoid_prefix(keys: pd.Series, multiplier: int) -> pd.Series:
+    """Integer prefix of GEOID keys, e.g. the state (10^9) or state+county (10^6)."""
+    return pd.Series(keys, dtype='Int64') // multiplier
+
+
+def tract_basename_to_code(basenames: T.Any) -> pd.Series:
+    """Convert TIGERweb tract names such as '53.38' or '53' to codes 5338 and 5300."""
+    parts = pd.Series(basenames).astype(str).str.split('.', n=1, expand=True)
+    if parts.shape[1] == 1:
+        parts[1] = None
+    whole = pd.to_numeric(parts[0], errors='coerce')
+    decimal = pd.to_numeric(parts[1].fillna('').str.ljust(2, '0'), errors='coerce')
+    return (whole * 100 + decimal).round().astype('Int64')
+
+
+def merge_on_geoid(
+    left: pd.DataFrame,
+    right: pd.DataFrame,
+    left_on: str = 'geoid',
+    right_on: str = 'GEOID',
+    how: str = 'inner',
+    **kwargs,
+) -> pd.DataFrame:
+    """Merge two dataframes on their GEOID columns using integer keys.
+
+    This avoids mismatches due to padding or number/string differences between sources.
+    Both GEOID columns are kept (the right one is dropped if it has the same name).
+    """
+    left_keyed = left.assign(**{GEOID_KEY_COLUMN: to_geoid_key(left[left_on]).values})
+    right_keyed = right.assign(
+        **{GEOID_KEY_COLUMN: to_geoid_key(right[right_on]).values}
+    )
+    if left_on == right_on:
+        right_keyed = right_keyed.drop(columns=right_on)
+    merged = left_keyed.merge(right_keyed, how=how, on=GEOID_KEY_COLUMN, **kwargs)
+    return merged.drop(columns=GEOID_KEY_COLUMN)
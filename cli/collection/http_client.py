@@ -0,0 +1,244 @@
+"""
+A shared HTTP client for all calls to external services (Census geocoder, TIGERweb and
+the Census ACS API), with connection pooling, timeouts, compression and request stats
+"""
+
+import bisect
+import logging
+import threading
+import time
+import typing as T
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from collection.http_replay import RecordReplayAdapter
+from const import (
+    HTTP_CONNECT_RETRIES,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_INJECTED_ERROR_RATE,
+    HTTP_INJECTED_LATENCY,
+    HTTP_LATENCY_BUCKETS,
+    HTTP_MAX_CONCURRENT_REQUESTS_PER_HOST,
+    HTTP_MAX_CONNECTIONS_PER_HOST,
+    HTTP_MAX_REQUESTS_PER_SECOND_PER_HOST,
+    HTTP_MODE,
+    HTTP_READ_TIMEOUT,
+    HTTP_RECORDINGS_PATH,
+    HTTP_REQUEST_BURST_PER_HOST,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    """Thread-safe request counts and latency histograms, per host."""
+
+    def __init__(self, latency_buckets: T.Sequence[float] = HTTP_LATENCY_BUCKETS):
+        self.latency_buckets = list(latency_buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._requests = defaultdict(int)
+            self._errors = defaultdict(int)
+            self._seconds = defaultdict(float)
+            # One extra bucket for latencies above the largest bound
+            self._histograms = defaultdict(
+                lambda: [0] * (len(self.latency_buckets) + 1)
+            )
+
+    def record(self, host: str, seconds: float, error: bool = False) -> None:
+        bucket = bisect.bisect_left(self.latency_buckets, seconds)
+        with self._lock:
+            self._requests[host] += 1
+            self._errors[host] += int(error)
+            self._seconds[host] += seconds
+            self._histograms[host][bucket] += 1
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return one row per host with counts, mean latency and histogram buckets."""
+        bucket_names = [f'latency_le_{b}s' for b in self.latency_buckets] + [
+            f'latency_gt_{self.latency_buckets[-1]}s'
+        ]
+        with self._lock:
+            rows = [
+                {
+                    'host': host,
+                    'requests': self._requests[host],
+                    'errors': self._errors[host],
+                    'total_seconds': round(self._seconds[host], 3),
+                    'mean_seconds': round(
+                        self._seconds[host] / self._requests[host], 3
+                    ),
+                    **dict(zip(bucket_names, self._histograms[host])),
+                }
+                for host in sorted(self._requests)
+            ]
+        return pd.DataFrame(
+            rows,
+            columns=['host', 'requests', 'errors', 'total_seconds', 'mean_seconds']
+            + bucket_names,
+        )
+
+
+REQUEST_STATS = RequestStats()
+
+
+class RateLimiter:
+    """Thread-safe token bucket: `rate` requests per second, bursts of up to `burst`."""
+
+    def __init__(
+        self,
+        rate: float = HTTP_MAX_REQUESTS_PER_SECOND_PER_HOST,
+        burst: int = HTTP_REQUEST_BURST_PER_HOST,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Wait for a request token; returns the number of seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._last_refill) * self.rate
+                )
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait_seconds = (1 - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+            waited += wait_seconds
+
+
+def make_adapter(
+    mode: str = HTTP_MODE,
+    recordings_path: T.Union[str, Path] = HTTP_RECORDINGS_PATH,
+    latency: float = HTTP_INJECTED_LATENCY,
+    error_rate: float = HTTP_INJECTED_ERROR_RATE,
+) -> HTTPAdapter:
+    """Pooled transport adapter; records/replays traffic unless the mode is 'live'."""
+    # Only retry failed connections; read errors are left to the callers to handle
+    pool_settings = dict(
+        pool_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+        pool_maxsize=HTTP_MAX_CONNECTIONS_PER_HOST,
+        max_retries=Retry(
+            total=HTTP_CONNECT_RETRIES,
+            connect=HTTP_CONNECT_RETRIES,
+            read=0,
+            status=0,
+            backoff_factor=0.5,
+        ),
+    )
+    if mode == 'live' and latency == 0 and error_rate == 0:
+        return HTTPAdapter(**pool_settings)
+    return RecordReplayAdapter(
+        mode, recordings_path, latency, error_rate, **pool_settings
+    )
+
+
+class PooledSession(requests.Session):
+    """A keep-alive session with default timeouts and per-host rate/concurrency caps."""
+
+    def __init__(
+        self,
+        timeout: T.Tuple[float, float] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+        max_concurrent_per_host: int = HTTP_MAX_CONCURRENT_REQUESTS_PER_HOST,
+        stats: RequestStats = REQUEST_STATS,
+        max_requests_per_second: float = HTTP_MAX_REQUESTS_PER_SECOND_PER_HOST,
+        adapter: T.Union[HTTPAdapter, None] = None,
+    ) -> None:
+        super().__init__()
+        self.timeout = timeout
+        self.max_concurrent_per_host = max_concurrent_per_host
+        self.max_requests_per_second = max_requests_per_second
+        self.stats = stats
+        self._host_slots = {}
+        self._host_rate_limiters = {}
+        self._host_slots_lock = threading.Lock()
+        adapter = adapter or make_adapter()
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        self.headers.update({'Accept-Encoding': 'gzip, deflate'})
+
+    def _host_slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._host_slots_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(
+                    self.max_concurrent_per_host
+                )
+            return self._host_slots[host]
+
+    def _host_rate_limiter(self, host: str) -> RateLimiter:
+        with self._host_slots_lock:
+            if host not in self._host_rate_limiters:
+                self._host_rate_limiters[host] = RateLimiter(
+                    self.max_requests_per_second
+                )
+            return self._host_rate_limiters[host]
+
+    def request(self, method, url, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlsplit(str(url)).netloc
+        # All threads share the request budget and concurrency cap of each host
+        self._host_rate_limiter(host).acquire()
+        with self._host_slot(host):
+            start_time = time.perf_counter()
+            try:
+                response = super().request(method, url, **kwargs)
+            except requests.RequestException:
+                self.stats.record(host, time.perf_counter() - start_time, error=True)
+                raise
+        self.stats.record(
+            host, time.perf_counter() - start_time, error=response.status_code >= 400
+        )
+        return response
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> PooledSession:
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = PooledSession()
+        return _session
+
+
+def configure_session(
+    mode: str = HTTP_MODE,
+    recordings_path: T.Union[str, Path] = HTTP_RECORDINGS_PATH,
+    latency: float = HTTP_INJECTED_LATENCY,
+    error_rate: float = HTTP_INJECTED_ERROR_RATE,
+) -> PooledSession:
+    """Replace the process-wide session, e.g. to record or replay traffic."""
+    global _session
+    with _session_lock:
+        _session = PooledSession(
+            adapter=make_adapter(mode, recordings_path, latency, error_rate)
+        )
+        return _session
+
+
+def get_request_stats() -> pd.DataFrame:
+    """Request counts and latency histograms for all hosts called in this process."""
+    return REQUEST_STATS.to_frame()
+
+
+def reset_request_stats() -> None:
+    REQUEST_STATS.reset()
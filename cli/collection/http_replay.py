@@ -0,0 +1,256 @@
+"""
+Record/replay transport for the external services (Census geocoder, ACS and TIGERweb)
+
+In 'record' mode responses of the real services are saved to a local store; in 'replay'
+mode they are served from that store without any network access. Latency and errors
+can be injected in both modes, to load-test the concurrency and retry logic.
+
+Batch geocoder requests are stored per address record rather than per request, so
+that they can be replayed when the adaptive batching splits the records differently.
+"""
+
+import base64
+import csv
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+import typing as T
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from const import GEOCODE_URL
+
+HTTP_MODES = ('live', 'record', 'replay')
+# Query parameters left out of the request keys (and of the stored URLs)
+IGNORED_QUERY_PARAMS = {'key'}
+GEOCODER_FILE_FIELD = b'name="addressFile"'
+GEOCODER_RECORDS_FILENAME = 'geocoder_records.jsonl'
+
+
+class ReplayMissError(requests.ConnectionError):
+    """A request that is not in the replay store."""
+
+
+def normalize_url(url: str) -> str:
+    """URL with sorted query parameters and without the API key."""
+    parts = urlsplit(url)
+    query = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name not in IGNORED_QUERY_PARAMS
+    )
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def multipart_boundary(request: requests.PreparedRequest) -> T.Union[bytes, None]:
+    content_type = request.headers.get('Content-Type', '')
+    if 'boundary=' not in content_type:
+        return None
+    return content_type.split('boundary=', 1)[1].strip().encode('utf-8')
+
+
+def normalized_body(request: requests.PreparedRequest) -> bytes:
+    """Request body with the random multipart boundary replaced by a fixed one."""
+    body = request.body or b''
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    boundary = multipart_boundary(request)
+    if boundary:
+        body = body.replace(boundary, b'BOUNDARY')
+    return body
+
+
+def request_key(request: requests.PreparedRequest) -> str:
+    """Stable key of a request, from its method, URL and body."""
+    key = hashlib.sha256()
+    key.update(request.method.encode('utf-8'))
+    key.update(normalize_url(request.url).encode('utf-8'))
+    key.update(normalized_body(request))
+    return key.hexdigest()
+
+
+def geocoder_file_lines(
+    request: requests.PreparedRequest,
+) -> T.Union[T.List[str], None]:
+    """The address records uploaded in a batch geocoder request, or None."""
+    if not request.url.startswith(GEOCODE_URL):
+        return None
+    boundary = multipart_boundary(request)
+    if not boundary or not isinstance(request.body, bytes):
+        return None
+    for part in request.body.split(b'--' + boundary):
+        if GEOCODER_FILE_FIELD in part:
+            content = part.split(b'\r\n\r\n', 1)[1]
+            if content.endswith(b'\r\n'):
+                content = content[:-2]
+            return [line for line in content.decode('utf-8').splitlines() if line]
+    return None
+
+
+def first_field(line: str) -> str:
+    """First field (the record ID) of a CSV line."""
+    return next(csv.reader(io.StringIO(line)), [''])[0]
+
+
+def build_response(
+    request: requests.PreparedRequest,
+    status_code: int,
+    content: bytes,
+    headers: T.Dict = None,
+) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers = CaseInsensitiveDict(headers or {})
+    response.url = request.url
+    response.request = request
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.reason = 'Replayed' if status_code < 400 else 'Injected error'
+    return response
+
+
+class RecordReplayAdapter(HTTPAdapter):
+    """Transport adapter that records responses to, or replays them from, a store."""
+
+    def __init__(
+        self,
+        mode: str = 'replay',
+        store_dir: T.Union[str, Path] = 'http_recordings',
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        **kwargs,
+    ) -> None:
+        if mode not in HTTP_MODES:
+            raise ValueError(f'Unknown HTTP mode {mode}, use one of {HTTP_MODES}')
+        super().__init__(**kwargs)
+        self.mode = mode
+        self.store_dir = Path(store_dir)
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._geocoder_records = None
+
+    # Injected latency and errors
+
+    def _inject_faults(self, request: requests.PreparedRequest) -> bool:
+        """Sleep for the injected latency; returns True if the request should fail."""
+        if self.latency > 0:
+            time.sleep(self.latency)
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    # Storage of whole responses
+
+    def _response_file(self, request: requests.PreparedRequest) -> Path:
+        return self.store_dir / f'{request_key(request)}.json'
+
+    def _save_response(
+        self, request: requests.PreparedRequest, response: requests.Response
+    ) -> None:
+        headers = {
+            name: value
+            for name, value in response.headers.items()
+            # The content is stored decoded
+            if name.lower() not in ('content-encoding', 'content-length')
+        }
+        entry = {
+            'method': request.method,
+            'url': normalize_url(request.url),
+            'status_code': response.status_code,
+            'headers': headers,
+            'content': base64.b64encode(response.content).decode('ascii'),
+        }
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._response_file(request).with_suffix('.tmp')
+        with open(tmp_path, 'w') as outfile:
+            json.dump(entry, outfile)
+        tmp_path.replace(self._response_file(request))
+
+    def _load_response(self, request: requests.PreparedRequest) -> requests.Response:
+        try:
+            with open(self._response_file(request)) as infile:
+                entry = json.load(infile)
+        except OSError:
+            raise ReplayMissError(
+                f'No recorded response for {request.method} '
+                f'{normalize_url(request.url)}'
+            )
+        return build_response(
+            request,
+            entry['status_code'],
+            base64.b64decode(entry['content']),
+            entry['headers'],
+        )
+
+    # Storage of batch geocoder results per address record
+
+    def _load_geocoder_records(self) -> T.Dict[str, str]:
+        if self._geocoder_records is None:
+            self._geocoder_records = {}
+            records_path = self.store_dir / GEOCODER_RECORDS_FILENAME
+            if records_path.is_file():
+                with open(records_path) as infile:
+                    for line in infile:
+                        entry = json.loads(line)
+                        self._geocoder_records[entry['request']] = entry['response']
+        return self._geocoder_records
+
+    def _save_geocoder_records(
+        self, request_lines: T.List[str], response: requests.Response
+    ) -> None:
+        response_lines = {
+            first_field(line): line for line in response.text.splitlines() if line
+        }
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(
+            self.store_dir / GEOCODER_RECORDS_FILENAME, 'a'
+        ) as outfile:
+            for line in request_lines:
+                if first_field(line) in response_lines:
+                    entry = {
+                        'request': line,
+                        'response': response_lines[first_field(line)],
+                    }
+                    outfile.write(json.dumps(entry) + '\n')
+
+    def _replay_geocoder_records(
+        self, request: requests.PreparedRequest, request_lines: T.List[str]
+    ) -> requests.Response:
+        with self._lock:
+            records = self._load_geocoder_records()
+        missing = [line for line in request_lines if line not in records]
+        if missing:
+            raise ReplayMissError(
+                f'No recorded geocoder result for {len(missing)} records, '
+                f'e.g. {missing[0]}'
+            )
+        content = '\n'.join(records[line] for line in request_lines) + '\n'
+        return build_response(
+            request, 200, content.encode('utf-8'), {'Content-Type': 'text/csv'}
+        )
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        if self._inject_faults(request):
+            return build_response(request, 503, b'Injected error')
+        geocoder_lines = geocoder_file_lines(request)
+        if self.mode == 'replay':
+            if geocoder_lines is not None:
+                return self._replay_geocoder_records(request, geocoder_lines)
+            return self._load_response(request)
+
+        response = super().send(request, **kwargs)
+        if self.mode == 'record' and response.status_code < 400:
+            if geocoder_lines is not None:
+                self._save_geocoder_records(geocoder_lines, response)
+            else:
+                self._save_response(request, response)
+        return response
@@ -0,0 +1,98 @@
+"""
+Cache of the parsed input files of a site, keyed by their content
+
+Reading a large CSV or Excel file, normalizing its column names and detecting the
+format of its date columns takes much longer than reading the resulting table back.
+The parsed table of each input file is stored under a hash of the file's bytes and of
+INPUT_CACHE_VERSION, so unchanged files are read from the cache and only new or
+modified ones are parsed again, whatever their names or modification times.
+
+Tables are stored as Parquet files when pyarrow is installed. Tables Parquet cannot
+hold (e.g. columns of mixed numbers and text from Excel) and installs without pyarrow
+fall back to pickle files.
+"""
+
+import hashlib
+import logging
+import pickle
+import typing as T
+from pathlib import Path
+
+import pandas as pd
+
+from collection.disk_cache import read_pickle, write_pickle
+from const import INPUT_CACHE_VERSION
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def content_hash(path: T.Union[str, Path]) -> str:
+    """SHA-256 of the bytes of a file and of the version of the parsing code."""
+    digest = hashlib.sha256(f'{INPUT_CACHE_VERSION}|{pd.__version__}|'.encode())
+    with open(path, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_cached_table(cache_dir: Path, key: str) -> T.Optional[pd.DataFrame]:
+    """The cached table of a key, None if there is no (readable) entry."""
+    parquet_path = cache_dir / f'{key}.parquet'
+    pickle_path = cache_dir / f'{key}.pkl'
+    try:
+        if pyarrow is not None and parquet_path.is_file():
+            return pd.read_parquet(parquet_path, engine='pyarrow')
+        if pickle_path.is_file():
+            return read_pickle(pickle_path)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError) as error:
+        logger.warning('Ignoring unreadable input cache entry %s: %s', key, error)
+    return None
+
+
+def write_cached_table(cache_dir: Path, key: str, data: pd.DataFrame) -> None:
+    """Store a table as Parquet if it can be, else as a pickle."""
+    if pyarrow is not None:
+        parquet_path = cache_dir / f'{key}.parquet'
+        tmp_path = parquet_path.with_suffix('.tmp')
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            data.to_parquet(tmp_path, engine='pyarrow', index=False)
+            tmp_path.replace(parquet_path)
+            return
+        except (OSError, ValueError, TypeError, pyarrow.ArrowException):
+            # Not representable in Parquet, pickle it below
+            if tmp_path.exists():
+                tmp_path.unlink()
+    write_pickle(cache_dir / f'{key}.pkl', data)
+
+
+def load_or_parse(
+    cache_dir: T.Union[str, Path, None],
+    path: T.Union[str, Path],
+    parse: T.Callable[[Path], T.Optional[pd.DataFrame]],
+) -> T.Optional[pd.DataFrame]:
+    """The parsed table of an input file, from the cache if the file is unchanged.
+
+    Without a cache directory the file is always parsed. Files that cannot be parsed
+    (None) are not cached.
+    """
+    path = Path(path)
+    if cache_dir is None:
+        return parse(path)
+    cache_dir = Path(cache_dir)
+    key = content_hash(path)
+    data = read_cached_table(cache_dir, key)
+    if data is not None:
+        print('\u2713', f'{path.name} is unchanged, loaded it from the input cache.')
+        return data
+    data = parse(path)
+    if data is not None:
+        write_cached_table(cache_dir, key, data)
+    return data
@@ -0,0 +1,117 @@
+"""
+Compact column types for the loaded case records
+
+Applied at load time and again after standardization and geocoding, so that repeated
+values (cities, states, zip codes, GEOIDs) are stored as categoricals, addresses as
+Arrow-backed strings (when pyarrow is installed) and numbers in the smallest dtype.
+"""
+
+import typing as T
+
+import pandas as pd
+
+from collection.address_cleaning import remove_special_chars_series
+
+try:
+    import pyarrow  # noqa: F401
+
+    STRING_DTYPE = pd.StringDtype('pyarrow')
+except ImportError:
+    # Python-backed strings save no memory over object columns, so leave those as is
+    STRING_DTYPE = None
+
+CATEGORY_COLUMNS = [
+    'city',
+    'state',
+    'county',
+    'zip_code',
+    'zip_code_clean',
+    'geoid',
+    'errors',
+    'is_match',
+    'is_exact',
+    'side',
+]
+STRING_COLUMNS = [
+    'street_address_1',
+    'street_address_2',
+    'street_address_1_clean',
+    'geocoded_address',
+    'returned_address',
+]
+RECORD_SCHEMA = {
+    **{column: 'category' for column in CATEGORY_COLUMNS},
+    **{column: STRING_DTYPE for column in STRING_COLUMNS},
+    'year': 'int16',
+    'latitude': 'float32',
+    'longitude': 'float32',
+    'lat': 'float32',
+    'long': 'float32',
+    # Nullable FIPS codes returned by the geocoder
+    'state_fips': 'Int8',
+    'county_fips': 'Int16',
+    'tract': 'Int32',
+    'block': 'Int16',
+}
+
+
+def _convert_column(column: pd.Series, dtype: T.Any) -> pd.Series:
+    if dtype == 'category' or isinstance(dtype, pd.StringDtype):
+        return column.astype(dtype)
+    if str(dtype).startswith('Int'):
+        return pd.to_numeric(column, errors='coerce').round().astype(dtype)
+    if str(dtype).startswith('float'):
+        return pd.to_numeric(column, errors='coerce').astype(dtype)
+    return column.astype(dtype)
+
+
+def apply_record_schema(
+    data: T.Union[pd.DataFrame, None], schema: T.Dict[str, T.Any] = RECORD_SCHEMA
+) -> T.Union[pd.DataFrame, None]:
+    """Convert the columns present in the dataframe to their compact types.
+
+    Columns that cannot be converted (e.g. out of range values) are left unchanged.
+    """
+    if data is None:
+        return None
+    for column, dtype in schema.items():
+        if dtype is None or column not in data.columns or data[column].dtype == dtype:
+            continue
+        try:
+            data[column] = _convert_column(data[column], dtype)
+        except (ValueError, TypeError, OverflowError):
+            continue
+    return data
+
+
+def normalize_column_names(columns: pd.Index) -> pd.Index:
+    """Convert column names to lowercase, with underscores and no special characters."""
+    return pd.Index(
+        remove_special_chars_series(
+            columns.to_series().astype(str).str.replace(' ', '_').str.lower()
+        ).str.strip()
+    )
+
+
+def memory_usage_mb(data: pd.DataFrame) -> float:
+    """Total memory used by a dataframe, including the contents of object columns."""
+    return data.memory_usage(deep=True).sum() / 1e6
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Per-column memory use (MB) and dtypes before and after applying the schema."""
+    report = pd.DataFrame(
+        {
+            'dtype_before': before.dtypes.astype(str),
+            'mb_before': before.memory_usage(deep=True, index=False) / 1e6,
+            'dtype_after': after.dtypes.astype(str),
+            'mb_after': after.memory_usage(deep=True, index=False) / 1e6,
+        }
+    )
+    report.loc['total'] = [
+        '',
+        report['mb_before'].sum(),
+        '',
+        report['mb_after'].sum(),
+    ]
+    return report.round(2)
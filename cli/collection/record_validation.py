@@ -0,0 +1,237 @@
+"""
+Row-level validation of the loaded records, before any address parsing or geocoding
+
+Each rule is evaluated for all records at once as a boolean mask (string rules on the
+distinct values of a column only, since court records repeat their cities, states and
+ZIP codes heavily). Records that fail any rule are tagged with the codes of the rules
+they fail and, unless all of those rules are only warnings, left out of
+standardization and geocoding, so they do not cost a geocoder round trip. The tagged
+records form an error ledger that is written to the address error files of the run.
+
+The out-of-area rules are warnings: they tag the records in states or counties with
+less than VALIDATION_MIN_AREA_SHARE of the records of their category (by default
+none), which may be typos, but are kept since a site can span several counties.
+"""
+
+import typing as T
+
+import numpy as np
+import pandas as pd
+
+from collection.address_cleaning import get_zipcode5_series, remove_special_chars_series
+from collection.date_parsing import parse_date_column
+from const import VALIDATION_MIN_AREA_SHARE
+
+# Reason code -> description of the rules, in the order they are evaluated
+VALIDATION_RULES = {
+    'invalid_zip': 'ZIP code is not a 5-digit code',
+    'invalid_state': 'State is not a US state, DC or territory',
+    'out_of_state': 'State has too few records to be part of the site',
+    'out_of_county': 'County has too few records to be part of the site',
+    'future_date': 'Date is after the date of the run',
+}
+# Rules whose records are tagged in the ledger but still geocoded
+VALIDATION_WARNINGS = ('out_of_state', 'out_of_county')
+LEDGER_COLUMNS = ['street_address_1', 'city', 'state', 'zip_code', 'errors']
+
+US_STATES = {
+    'AL': 'Alabama',
+    'AK': 'Alaska',
+    'AZ': 'Arizona',
+    'AR': 'Arkansas',
+    'CA': 'California',
+    'CO': 'Colorado',
+    'CT': 'Connecticut',
+    'DE': 'Delaware',
+    'DC': 'District of Columbia',
+    'FL': 'Florida',
+    'GA': 'Georgia',
+    'HI': 'Hawaii',
+    'ID': 'Idaho',
+    'IL': 'Illinois',
+    'IN': 'Indiana',
+    'IA': 'Iowa',
+    'KS': 'Kansas',
+    'KY': 'Kentucky',
+    'LA': 'Louisiana',
+    'ME': 'Maine',
+    'MD': 'Maryland',
+    'MA': 'Massachusetts',
+    'MI': 'Michigan',
+    'MN': 'Minnesota',
+    'MS': 'Mississippi',
+    'MO': 'Missouri',
+    'MT': 'Montana',
+    'NE': 'Nebraska',
+    'NV': 'Nevada',
+    'NH': 'New Hampshire',
+    'NJ': 'New Jersey',
+    'NM': 'New Mexico',
+    'NY': 'New York',
+    'NC': 'North Carolina',
+    'ND': 'North Dakota',
+    'OH': 'Ohio',
+    'OK': 'Oklahoma',
+    'OR': 'Oregon',
+    'PA': 'Pennsylvania',
+    'RI': 'Rhode Island',
+    'SC': 'South Carolina',
+    'SD': 'South Dakota',
+    'TN': 'Tennessee',
+    'TX': 'Texas',
+    'UT': 'Utah',
+    'VT': 'Vermont',
+    'VA': 'Virginia',
+    'WA': 'Washington',
+    'WV': 'West Virginia',
+    'WI': 'Wisconsin',
+    'WY': 'Wyoming',
+    'AS': 'American Samoa',
+    'GU': 'Guam',
+    'MP': 'Northern Mariana Islands',
+    'PR': 'Puerto Rico',
+    'VI': 'U.S. Virgin Islands',
+}
+STATE_CODES = {
+    **{code: code for code in US_STATES},
+    **{name.upper(): code for code, name in US_STATES.items()},
+    'US VIRGIN ISLANDS': 'VI',
+    'VIRGIN ISLANDS': 'VI',
+}
+COUNTY_SUFFIXES = r'\s+(county|parish|borough|city and borough|census area)$'
+
+
+def map_distinct(
+    column: pd.Series,
+    func: T.Callable[[pd.Series], pd.Series],
+    missing: T.Any = np.nan,
+) -> pd.Series:
+    """Apply a vectorized function to the distinct values of a column only."""
+    codes, uniques = pd.factorize(column)
+    mapped = func(pd.Series(uniques)).to_numpy(dtype=object)
+    values = np.append(mapped, missing).astype(object)
+    # Missing values have code -1, i.e. the trailing missing value
+    return pd.Series(values[codes], index=column.index)
+
+
+def normalize_states(states: pd.Series) -> pd.Series:
+    """Uppercase state codes or names with single spaces."""
+    return (
+        states.astype(str).str.strip().str.upper().str.replace(r'\s+', ' ', regex=True)
+    )
+
+
+def state_codes(states: pd.Series) -> pd.Series:
+    """Two-letter codes of states given as codes or names, NaN if not a US state."""
+    return map_distinct(
+        states, lambda uniques: normalize_states(uniques).map(STATE_CODES)
+    )
+
+
+def invalid_states(states: pd.Series) -> np.ndarray:
+    """Mask of the non-blank states that are not a US state code or name."""
+
+    def is_invalid(uniques: pd.Series) -> pd.Series:
+        normalized = normalize_states(uniques)
+        return (normalized != '') & normalized.map(STATE_CODES).isna()
+
+    return map_distinct(states, is_invalid, missing=False).to_numpy(dtype=bool)
+
+
+def invalid_zip_codes(zip_codes: pd.Series) -> np.ndarray:
+    """Mask of the ZIP codes that do not clean up to a 5-digit code other than 00000."""
+
+    def is_invalid(uniques: pd.Series) -> pd.Series:
+        zip5 = get_zipcode5_series(uniques)
+        return zip5.notna() & ~(
+            zip5.astype(str).str.fullmatch(r'\d{5}') & (zip5 != '00000')
+        )
+
+    return map_distinct(zip_codes, is_invalid, missing=False).to_numpy(dtype=bool)
+
+
+def county_names(counties: pd.Series) -> pd.Series:
+    """Comparable county names: lowercase, without special characters or 'County'."""
+    return map_distinct(
+        counties,
+        lambda uniques: remove_special_chars_series(uniques.astype(str).str.lower())
+        .str.strip()
+        .str.replace(COUNTY_SUFFIXES, '', regex=True)
+        .replace('', np.nan),
+    )
+
+
+def minor_values(values: pd.Series, min_share: float) -> np.ndarray:
+    """Mask of the non-missing values with less than min_share of the values."""
+    shares = values.value_counts(normalize=True)
+    return values.isin(shares.index[shares < min_share]).to_numpy()
+
+
+def validation_masks(
+    data: pd.DataFrame,
+    date_column: T.Optional[str] = None,
+    min_area_share: float = VALIDATION_MIN_AREA_SHARE,
+    today: T.Optional[pd.Timestamp] = None,
+) -> T.Dict[str, np.ndarray]:
+    """Boolean mask of the records failing each rule (for the columns present)."""
+    masks = {code: np.zeros(len(data), dtype=bool) for code in VALIDATION_RULES}
+    if 'zip_code' in data.columns:
+        masks['invalid_zip'] = invalid_zip_codes(data['zip_code'])
+    if 'state' in data.columns:
+        masks['invalid_state'] = invalid_states(data['state'])
+        masks['out_of_state'] = minor_values(state_codes(data['state']), min_area_share)
+    if 'county' in data.columns:
+        masks['out_of_county'] = minor_values(
+            county_names(data['county']), min_area_share
+        )
+    if date_column is not None and date_column in data.columns:
+        today = (today or pd.Timestamp.now()).normalize()
+        dates = parse_date_column(data[date_column])
+        masks['future_date'] = (dates >= today + pd.Timedelta(days=1)).to_numpy()
+    return masks
+
+
+def validate_records(
+    data: T.Union[pd.DataFrame, None],
+    date_column: T.Optional[str] = None,
+    min_area_share: float = VALIDATION_MIN_AREA_SHARE,
+    today: T.Optional[pd.Timestamp] = None,
+) -> T.Tuple[T.Union[pd.DataFrame, None], T.Union[pd.DataFrame, None]]:
+    """Split the records into the valid ones and an error ledger of the invalid ones.
+
+    The ledger has the address columns of the tagged records and their reason codes
+    (see VALIDATION_RULES), separated by ';', in an errors column. Records tagged
+    with warnings only are kept with the valid records, which are None if there are
+    none.
+    """
+    if data is None:
+        return None, None
+    masks = validation_masks(data, date_column, min_area_share, today)
+    tagged = np.logical_or.reduce(list(masks.values()))
+    invalid = np.logical_or.reduce(
+        [mask for code, mask in masks.items() if code not in VALIDATION_WARNINGS]
+    )
+    errors = np.full(tagged.sum(), '', dtype=object)
+    for code, mask in masks.items():
+        errors = errors + np.where(mask[tagged], code + ';', '')
+        if mask.any():
+            print(
+                '\u2326',
+                f'{mask.sum()} records fail the rule: {VALIDATION_RULES[code]}',
+                f'({code}).',
+            )
+    ledger = data.loc[tagged, [c for c in LEDGER_COLUMNS[:-1] if c in data.columns]]
+    ledger = ledger.astype(object).assign(
+        errors=pd.Series(errors, index=ledger.index, dtype=object).str.rstrip(';')
+    )
+    if invalid.any():
+        print(
+            '\u2326',
+            f'{invalid.sum()} of {len(data)} records are invalid and will not be',
+            'geocoded.',
+        )
+    elif not tagged.any():
+        print('\u2713', f'All {len(data)} records passed validation.')
+    if invalid.all():
+        return None, ledger
+    return data.loc[~invalid], ledger
@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from collection.address_cleaning import (
+    get_zipcode5,
+    get_zipcode5_series,
+    remove_special_chars,
+    remove_special_chars_series,
+)
+
+
+class RemoveSpecialCharsTests(TestCase):
+    def test_scalar(self):
+        self.assertEqual(
+            remove_special_chars("12 O'Neil St. #4 (rear)"), '12 ONeil St 4 rear'
+        )
+        self.assertEqual(remove_special_chars(12), '12')
+
+    def test_series_matches_scalar(self):
+        text = pd.Series(["12 O'Neil St. #4", 'P.O. Box 7*', np.nan, 'Main St'])
+        cleaned = remove_special_chars_series(text)
+        self.assertEqual(
+            cleaned[[0, 1, 3]].tolist(),
+            [remove_special_chars(t) for t in text[[0, 1, 3]]],
+        )
+        self.assertTrue(pd.isna(cleaned[2]))
+
+    def test_categorical_series(self):
+        text = pd.Series(['St. Paul', 'St Paul', 'St. Paul'], dtype='category')
+        self.assertEqual(
+            remove_special_chars_series(text).astype(str).tolist(), ['St Paul'] * 3
+        )
+
+
+class ZipCode5Tests(TestCase):
+    def test_numeric_zip_codes(self):
+        zips = get_zipcode5_series(
+            pd.Series([21701, 2134.0, 217011234, 21341234, None])
+        )
+        self.assertEqual(zips[:4].tolist(), ['21701', '02134', '21701', '02134'])
+        self.assertTrue(pd.isna(zips[4]))
+
+    def test_string_zip_codes(self):
+        zips = get_zipcode5_series(
+            pd.Series(
+                ['21701', ' 2134', '21701-1234', '217011234', '21701.0', '', None]
+            )
+        )
+        self.assertEqual(
+            zips[:5].tolist(), ['21701', '02134', '21701', '21701', '21701']
+        )
+        self.assertTrue(zips[5:].isna().all())
+
+    def test_mixed_zip_codes(self):
+        raw = pd.Series([21701, '02134-1234', 21702.0, np.nan], dtype=object)
+        self.assertEqual(
+            get_zipcode5_series(raw)[:3].tolist(), ['21701', '02134', '21702']
+        )
+        self.assertEqual(
+            [get_zipcode5(z) for z in raw[:3]], ['21701', '02134', '21702']
+        )
+        self.assertTrue(pd.isna(get_zipcode5(np.nan)))
@@ -0,0 +1,98 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from collection.checkpoint import CheckpointStore, files_fingerprint
+
+
+class CheckpointStoreTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp_dir.name)
+        self.calls = []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def stage(self, name, value):
+        def func():
+            self.calls.append(name)
+            return value
+
+        return func
+
+    def run_pipeline(self, source='a', resume=True):
+        checkpoints = CheckpointStore(self.root / 'checkpoints', resume)
+        first = checkpoints.run('first', [source], self.stage('first', source * 2))
+        second = checkpoints.run(
+            'second', [checkpoints.fingerprints['first']], self.stage('second', first)
+        )
+        return second
+
+    def test_unchanged_stages_are_skipped(self):
+        self.assertEqual(self.run_pipeline(), 'aa')
+        self.assertEqual(self.run_pipeline(), 'aa')
+        self.assertEqual(self.calls, ['first', 'second'])
+
+    def test_changed_inputs_rerun_downstream_stages(self):
+        self.run_pipeline('a')
+        self.assertEqual(self.run_pipeline('b'), 'bb')
+        self.assertEqual(self.calls, ['first', 'second', 'first', 'second'])
+
+    def test_restart_without_resume(self):
+        self.run_pipeline()
+        self.run_pipeline(resume=False)
+        self.assertEqual(len(self.calls), 4)
+
+    def test_failed_stage_is_rerun(self):
+        checkpoints = CheckpointStore(self.root / 'checkpoints')
+
+        def failing_stage():
+            raise ValueError('network down')
+
+        with self.assertRaises(ValueError):
+            checkpoints.run('first', ['a'], failing_stage)
+        manifest = json.loads(checkpoints.manifest_path.read_text())
+        self.assertEqual(manifest['first']['status'], 'failed')
+        self.assertEqual(self.run_pipeline(), 'aa')
+        self.assertEqual(self.calls, ['first', 'second'])
+
+    def test_missing_output_reruns_stage(self):
+        output = self.root / 'output.csv'
+
+        def write_output():
+            self.calls.append('write')
+            output.write_text('x')
+
+        for _ in range(2):
+            CheckpointStore(self.root / 'checkpoints').run(
+                'write', [], write_output, outputs=[output]
+            )
+        self.assertEqual(self.calls, ['write'])
+        output.unlink()
+        CheckpointStore(self.root / 'checkpoints').run(
+            'write', [], write_output, outputs=[output]
+        )
+        self.assertEqual(self.calls, ['write', 'write'])
+
+    def test_invalidated_stages_are_rerun(self):
+        self.run_pipeline()
+        CheckpointStore(self.root / 'checkpoints').invalidate(['second'])
+        self.assertEqual(self.run_pipeline(), 'aa')
+        self.assertEqual(self.calls, ['first', 'second', 'second'])
+
+    def test_new_pipeline_version_reruns_all_stages(self):
+        self.run_pipeline()
+        with patch('collection.checkpoint.PIPELINE_VERSION', 2):
+            self.assertEqual(self.run_pipeline(), 'aa')
+        self.assertEqual(self.calls, ['first', 'second', 'first', 'second'])
+
+    def test_files_fingerprint(self):
+        data_file = self.root / 'data.csv'
+        data_file.write_text('a,b\n')
+        before = files_fingerprint([self.root])
+        self.assertEqual(before, files_fingerprint([self.root]))
+        data_file.write_text('a,b\n1,2\n')
+        self.assertNotEqual(before, files_fingerprint([self.root]))
@@ -0,0 +1,56 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from collection.date_parsing import (
+    add_year_month_columns,
+    detect_date_format,
+    parse_date_column,
+    parse_date_columns,
+)
+
+
+class DateParsingTests(TestCase):
+    def test_detect_date_format(self):
+        self.assertEqual(
+            detect_date_format(pd.Series(['2021-01-02', '2021-12-31'])), '%Y-%m-%d'
+        )
+        self.assertEqual(
+            detect_date_format(pd.Series(['01/02/2021', '12/31/2021'])), '%m/%d/%Y'
+        )
+        self.assertIsNone(detect_date_format(pd.Series(['soon', 'later'])))
+
+    def test_parse_date_column(self):
+        dates = pd.Series(['01/02/2021', '01/02/2021', np.nan, '2021-03-04', 'n/a'])
+        parsed = parse_date_column(dates)
+        self.assertEqual(parsed[0], pd.Timestamp('2021-01-02'))
+        self.assertEqual(parsed[1], pd.Timestamp('2021-01-02'))
+        self.assertEqual(parsed[3], pd.Timestamp('2021-03-04'))
+        self.assertTrue(parsed[[2, 4]].isna().all())
+
+    def test_parsed_column_is_returned_as_is(self):
+        dates = pd.Series(pd.to_datetime(['2021-01-02']))
+        self.assertIs(parse_date_column(dates), dates)
+
+    def test_parse_date_columns_skips_non_dates(self):
+        data = pd.DataFrame(
+            {
+                'eviction_filing_date': ['2021-01-02', '2021-02-03'],
+                'date_notes': ['unknown', 'see file'],
+            }
+        )
+        data = parse_date_columns(data)
+        self.assertTrue(
+            pd.api.types.is_datetime64_any_dtype(data['eviction_filing_date'])
+        )
+        self.assertEqual(data['date_notes'].dtype, object)
+
+    def test_add_year_month_columns(self):
+        data = pd.DataFrame({'date': pd.to_datetime(['2021-01-02', '2022-02-03'])})
+        data = add_year_month_columns(data, 'date')
+        self.assertEqual(data['year'].dtype, np.int16)
+        self.assertEqual(
+            data['month'].tolist(),
+            [pd.Period('2021-01', 'M'), pd.Period('2022-02', 'M')],
+        )
@@ -0,0 +1,41 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from collection.disk_cache import cache_file, load_or_fetch
+
+
+class DiskCacheTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.tmp_dir.name) / 'cache'
+        self.calls = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def fetch(self):
+        self.calls += 1
+        return {'value': self.calls}
+
+    def test_value_is_fetched_once(self):
+        self.assertEqual(load_or_fetch(self.cache_dir, 'key', self.fetch)['value'], 1)
+        self.assertEqual(load_or_fetch(self.cache_dir, 'key', self.fetch)['value'], 1)
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(cache_file(self.cache_dir, 'key').is_file())
+
+    def test_no_cache_dir(self):
+        load_or_fetch(None, 'key', self.fetch)
+        load_or_fetch(None, 'key', self.fetch)
+        self.assertEqual(self.calls, 2)
+
+    def test_empty_values_are_not_cached(self):
+        self.assertEqual(
+            load_or_fetch(self.cache_dir, 'key', lambda: (None, None)), (None, None)
+        )
+        self.assertFalse(cache_file(self.cache_dir, 'key').exists())
+
+    def test_unreadable_entry_is_refetched(self):
+        self.cache_dir.mkdir()
+        cache_file(self.cache_dir, 'key').write_bytes(b'not a pickle')
+        self.assertEqual(load_or_fetch(self.cache_dir, 'key', self.fetch)['value'], 1)
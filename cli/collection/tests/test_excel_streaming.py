@@ -0,0 +1,75 @@
+import datetime
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import pandas as pd
+from openpyxl import Workbook
+
+from collection.excel_streaming import iter_excel_batches, read_excel_streaming
+
+
+class ExcelStreamingTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / 'evictions.xlsx'
+        workbook = Workbook()
+        first = workbook.active
+        first.title = 'Part 1'
+        first.append(['Case Number', 'Filing Date', 'Street Address 1', 'Amount'])
+        first.append(['C-1', datetime.datetime(2020, 1, 5), '1 Main St', 1200])
+        first.append(['C-2', datetime.datetime(2020, 2, 6), None, 950.5])
+        # Exports split over sheets repeat the header
+        second = workbook.create_sheet('Part 2')
+        second.append(['case number', 'filing date', 'street address 1', 'amount'])
+        second.append(['C-3', datetime.datetime(2021, 3, 7), '1 Main St', True])
+        other = workbook.create_sheet('Notes')
+        other.append(['Comment'])
+        other.append(['Not case records'])
+        workbook.save(self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_reads_sheets_with_the_same_columns(self):
+        data = read_excel_streaming(self.path)
+        self.assertEqual(
+            list(data.columns),
+            ['case_number', 'filing_date', 'street_address_1', 'amount'],
+        )
+        self.assertEqual(data['case_number'].tolist(), ['C-1', 'C-2', 'C-3'])
+        self.assertEqual(
+            list(pd.to_datetime(data['filing_date'])),
+            list(pd.to_datetime(['2020-01-05', '2020-02-06', '2021-03-07'])),
+        )
+        self.assertEqual(data['street_address_1'][0], '1 Main St')
+        self.assertTrue(pd.isna(data['street_address_1'][1]))
+        self.assertEqual(data['amount'].tolist(), [1200, 950.5, True])
+
+    def test_same_values_as_read_excel(self):
+        expected = pd.read_excel(self.path, sheet_name='Part 1')
+        data = read_excel_streaming(self.path)
+        self.assertEqual(data['amount'][:2].tolist(), expected['Amount'].tolist())
+        self.assertEqual(list(data['filing_date'][:2]), list(expected['Filing Date']))
+
+    def test_batches(self):
+        batches = list(iter_excel_batches(self.path, batch_rows=1))
+        self.assertEqual([len(batch) for batch in batches], [1, 1, 1])
+        batches = list(iter_excel_batches(self.path, batch_rows=2))
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+
+    def test_cells_past_the_header_and_sparse_rows(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['A', None, 'C'])
+        sheet['A2'] = 'x'
+        sheet['D2'] = 4
+        sheet['C4'] = 'z'
+        workbook.save(self.path)
+        data = read_excel_streaming(self.path)
+        self.assertEqual(list(data.columns), ['a', 'unnamed_1', 'c', 'unnamed_3'])
+        self.assertEqual(data['a'].tolist()[0], 'x')
+        self.assertEqual(data['unnamed_3'].tolist()[0], 4)
+        # Empty rows are skipped
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data['c'].tolist()[1], 'z')
@@ -0,0 +1,112 @@
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
+import requests
+
+from collection.address_geocoding import (
+    GeocodeBatchController,
+    census_geocode_full_dataset,
+    generate_geocode_chunks,
+)
+from const import GEOCODE_REQUEST_ERROR
+
+
+def prefix(name):
+    return f'collection.address_geocoding.{name}'
+
+
+def fake_geocoder_response(df_chunk):
+    return pd.DataFrame({'id': df_chunk['Unique ID'].values, 'is_match': 'Match'})
+
+
+class GeocodeBatchControllerTests(TestCase):
+    def test_grows_while_healthy(self):
+        controller = GeocodeBatchController(initial_size=100, max_size=1000)
+        for _ in range(10):
+            controller.record_success(controller.chunk_size, 1.0)
+        self.assertEqual(controller.chunk_size, 1000)
+
+    def test_shrinks_on_failure(self):
+        controller = GeocodeBatchController(initial_size=800, min_size=50)
+        controller.record_failure(800, 5.0, requests.Timeout())
+        self.assertEqual(controller.chunk_size, 400)
+        for _ in range(10):
+            controller.record_failure(controller.chunk_size, 5.0, requests.Timeout())
+        self.assertEqual(controller.chunk_size, 50)
+
+    def test_no_growth_after_recent_failure(self):
+        controller = GeocodeBatchController(initial_size=200)
+        controller.record_failure(200, 5.0, requests.ConnectionError())
+        controller.record_success(controller.chunk_size, 1.0)
+        self.assertEqual(controller.chunk_size, 100)
+
+    def test_shrinks_towards_target_latency(self):
+        controller = GeocodeBatchController(initial_size=1000, target_seconds=10)
+        controller.record_success(1000, 40.0)
+        self.assertEqual(controller.chunk_size, 500)
+        controller.record_success(500, 12.5)
+        self.assertEqual(controller.chunk_size, 400)
+
+    def test_generate_chunks_follows_controller(self):
+        df = pd.DataFrame({'Unique ID': range(10)})
+        controller = GeocodeBatchController(initial_size=2, min_size=1)
+        sizes = []
+        for chunk in generate_geocode_chunks(df, controller=controller):
+            sizes.append(len(chunk))
+            controller.record_success(len(chunk), 0.1)
+        self.assertEqual(sizes, [2, 4, 4])
+
+
+class CensusGeocodeFullDatasetTests(TestCase):
+    def setUp(self):
+        self.input_df = pd.DataFrame(
+            {'street_address_1_clean': [f'{i} MAIN ST' for i in range(60)]}
+        )
+
+    @patch(prefix('time.sleep'))
+    @patch(prefix('census_geocode_records'), autospec=True)
+    def test_failed_chunk_is_split_and_retried(self, mock_geocode, mock_sleep):
+        calls = []
+
+        def geocode(df_chunk):
+            calls.append(len(df_chunk))
+            if len(calls) == 1:
+                raise requests.Timeout('read timed out')
+            return fake_geocoder_response(df_chunk)
+
+        mock_geocode.side_effect = geocode
+        output_df = census_geocode_full_dataset(
+            self.input_df, 'eviction', '.', cache_off=True
+        )
+        self.assertEqual(sorted(output_df['id']), list(range(60)))
+        self.assertGreater(len(calls), 2)
+        mock_sleep.assert_called_once_with(2)
+
+    @patch(prefix('time.sleep'))
+    @patch(prefix('census_geocode_records'), autospec=True)
+    def test_records_of_failing_chunks_are_marked(self, mock_geocode, mock_sleep):
+        mock_geocode.side_effect = requests.ConnectionError('connection refused')
+        output_df = census_geocode_full_dataset(
+            self.input_df, 'eviction', '.', cache_off=True
+        )
+        self.assertEqual(sorted(output_df['id']), list(range(60)))
+        self.assertTrue((output_df['is_match'] == GEOCODE_REQUEST_ERROR).all())
+        self.assertTrue(output_df['state_fips'].isna().all())
+        # The waits between the attempts of a chunk grow exponentially
+        self.assertEqual([c.args[0] for c in mock_sleep.call_args_list[:3]], [2, 4, 8])
+
+    @patch(prefix('GEOCODE_CACHE_SIZE'), 10)
+    @patch(prefix('time.sleep'))
+    @patch(prefix('census_geocode_records'), autospec=True)
+    def test_failed_records_are_geocoded_again_on_resume(self, mock_geocode, _):
+        mock_geocode.side_effect = requests.ConnectionError('connection refused')
+        with tempfile.TemporaryDirectory() as cache_dir:
+            census_geocode_full_dataset(self.input_df.iloc[:30], 'eviction', cache_dir)
+            mock_geocode.side_effect = fake_geocoder_response
+            output_df = census_geocode_full_dataset(
+                self.input_df, 'eviction', cache_dir
+            )
+        self.assertEqual(sorted(output_df['id']), list(range(60)))
+        self.assertTrue((output_df['is_match'] == 'Match').all())
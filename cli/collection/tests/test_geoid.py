@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from collection.address_geocoding import find_state_county_city
+from collection.geoid import (
+    geoid_key_to_str,
+    make_geoid_key,
+    merge_on_geoid,
+    normalize_geoid,
+    tract_basename_to_code,
+)
+
+
+class GeoidTests(TestCase):
+    def test_make_geoid_key_from_numbers_and_strings(self):
+        keys = make_geoid_key(
+            pd.Series([24, 24.0, np.nan]),
+            pd.Series(['021', '21', '021']),
+            pd.Series([750100, 5338, 750100]),
+        )
+        self.assertEqual(keys[0], 24021750100)
+        self.assertEqual(keys[1], 24021005338)
+        self.assertTrue(pd.isna(keys[2]))
+
+    def test_geoid_key_to_str(self):
+        geoids = geoid_key_to_str(pd.Series([1001020100, pd.NA], dtype='Int64'))
+        self.assertEqual(geoids[0], '01001020100')
+        self.assertTrue(pd.isna(geoids[1]))
+
+    def test_normalize_geoid(self):
+        geoids = normalize_geoid(pd.Series([1001020100.0, '01001020100', '', None]))
+        self.assertEqual(geoids[:2].tolist(), ['01001020100', '01001020100'])
+        self.assertTrue(geoids[2:].isna().all())
+
+    def test_tract_basename_to_code(self):
+        codes = tract_basename_to_code(['53.38', '53', '9501.01', '7.1'])
+        self.assertEqual(codes.tolist(), [5338, 5300, 950101, 710])
+
+    def test_merge_on_geoid_ignores_padding(self):
+        left = pd.DataFrame({'geoid': ['01001020100', '24021750100'], 'n': [1, 2]})
+        right = pd.DataFrame({'GEOID': [1001020100], 'households': [10]})
+        merged = merge_on_geoid(left, right, how='left')
+        self.assertEqual(merged['households'].tolist()[0], 10)
+        self.assertTrue(pd.isna(merged['households'].tolist()[1]))
+        self.assertIn('GEOID', merged.columns)
+        self.assertNotIn('geoid_key', merged.columns)
+
+
+class FindStateCountyCityTests(TestCase):
+    def test_most_likely_state_and_counties(self):
+        geocoded_df = pd.DataFrame(
+            {
+                'geoid': ['24021750100', '24021750200', '24005400100', '51001090100'],
+                'city': ['Frederick', 'Frederick', 'Towson', 'Accomac'],
+                'state': ['MD', 'MD', 'MD', 'VA'],
+            }
+        )
+        state_fips, county_fips, city, state = find_state_county_city(geocoded_df)
+        self.assertEqual(state_fips, '24')
+        self.assertEqual(county_fips, ['021', '005'])
+        self.assertEqual((city, state), ('Frederick', 'MD'))
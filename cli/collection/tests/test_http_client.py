@@ -0,0 +1,75 @@
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from collection.http_client import PooledSession, RateLimiter, RequestStats
+
+
+class PooledSessionTests(TestCase):
+    def setUp(self):
+        self.stats = RequestStats(latency_buckets=(1, 10))
+        self.session = PooledSession(timeout=(2, 20), stats=self.stats)
+
+    @patch('requests.Session.request', autospec=True)
+    def test_default_timeout_applied(self, mock_request):
+        mock_request.return_value = MagicMock(status_code=200)
+        self.session.get('https://geocoding.geo.census.gov/geocoder')
+        self.assertEqual(mock_request.call_args.kwargs['timeout'], (2, 20))
+
+        self.session.post('https://geocoding.geo.census.gov/geocoder', timeout=5)
+        self.assertEqual(mock_request.call_args.kwargs['timeout'], 5)
+
+    @patch('requests.Session.request', autospec=True)
+    def test_request_stats(self, mock_request):
+        mock_request.side_effect = [
+            MagicMock(status_code=200),
+            MagicMock(status_code=500),
+            requests.ConnectTimeout('connect timed out'),
+        ]
+        self.session.get('https://api.census.gov/data')
+        self.session.get('https://api.census.gov/data')
+        with self.assertRaises(requests.ConnectTimeout):
+            self.session.get('https://tigerweb.geo.census.gov/arcgis')
+
+        stats_df = self.stats.to_frame().set_index('host')
+        self.assertEqual(stats_df.loc['api.census.gov', 'requests'], 2)
+        self.assertEqual(stats_df.loc['api.census.gov', 'errors'], 1)
+        self.assertEqual(stats_df.loc['tigerweb.geo.census.gov', 'errors'], 1)
+        self.assertEqual(stats_df.loc['api.census.gov', 'latency_le_1s'], 2)
+        self.assertEqual(stats_df.loc['api.census.gov', 'latency_gt_10s'], 0)
+
+    def test_connections_are_pooled(self):
+        adapter = self.session.get_adapter('https://api.census.gov/data')
+        self.assertIs(
+            adapter, self.session.get_adapter('https://geocoding.geo.census.gov')
+        )
+        self.assertEqual(adapter.max_retries.read, 0)
+
+
+class RateLimiterTests(TestCase):
+    def test_burst_then_rate(self):
+        limiter = RateLimiter(rate=50, burst=5)
+        start_time = time.monotonic()
+        for _ in range(5):
+            self.assertEqual(limiter.acquire(), 0)
+        # The next 5 requests are spread at 50 per second
+        for _ in range(5):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.08)
+
+    def test_budget_is_shared_between_threads(self):
+        limiter = RateLimiter(rate=100, burst=1)
+        start_time = time.monotonic()
+        threads = [
+            threading.Thread(target=lambda: [limiter.acquire() for _ in range(5)])
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 15 requests at 100 per second, minus the initial token
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.13)
@@ -0,0 +1,105 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+
+from collection.http_client import PooledSession, RequestStats, make_adapter
+from collection.http_replay import (
+    RecordReplayAdapter,
+    ReplayMissError,
+    build_response,
+    normalize_url,
+)
+from const import GEOCODE_URL
+
+ACS_URL = 'https://api.census.gov/data/2019/acs/acs5?get=NAME&for=county:021&key=abc'
+
+
+def fake_service(adapter, request, **kwargs):
+    """Stand-in for the network: echoes the geocoder records, or a fixed payload."""
+    if request.url.startswith(GEOCODE_URL):
+        lines = [
+            line
+            for line in request.body.decode('utf-8').splitlines()
+            if line[:1].isdigit()
+        ]
+        content = ''.join(f'{line},Match\n' for line in lines)
+        return build_response(request, 200, content.encode('utf-8'))
+    return build_response(request, 200, b'[["NAME"],["Frederick County"]]')
+
+
+class RecordReplayTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store_dir = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def session(self, mode, **kwargs):
+        return PooledSession(
+            stats=RequestStats(),
+            adapter=RecordReplayAdapter(mode, self.store_dir, **kwargs),
+        )
+
+    def geocode(self, session, lines):
+        text = ''.join(f'{line}\n' for line in lines)
+        files = {'addressFile': ('chunk.csv', text, 'text/csv')}
+        return session.post(
+            GEOCODE_URL, files=files, data={'benchmark': 'Public_AR_Current'}
+        )
+
+    @patch('requests.adapters.HTTPAdapter.send', autospec=True)
+    def test_record_then_replay(self, mock_send):
+        mock_send.side_effect = fake_service
+        recorded = self.session('record').get(ACS_URL)
+        self.assertEqual(mock_send.call_count, 1)
+
+        mock_send.side_effect = AssertionError('network used in replay mode')
+        replayed = self.session('replay').get(ACS_URL.replace('abc', 'other-key'))
+        self.assertEqual(replayed.status_code, 200)
+        self.assertEqual(replayed.json(), recorded.json())
+
+    @patch('requests.adapters.HTTPAdapter.send', autospec=True)
+    def test_geocoder_batches_replay_per_record(self, mock_send):
+        mock_send.side_effect = fake_service
+        lines = [f'{i},{i} Main St,Frederick,MD,21701' for i in range(4)]
+        recording_session = self.session('record')
+        self.geocode(recording_session, lines[:2])
+        self.geocode(recording_session, lines[2:])
+
+        # The records are replayed even when batched differently
+        mock_send.side_effect = AssertionError('network used in replay mode')
+        response = self.geocode(self.session('replay'), lines[1:])
+        self.assertEqual(
+            response.text.splitlines(), [f'{line},Match' for line in lines[1:]]
+        )
+
+    def test_replay_miss(self):
+        with self.assertRaises(ReplayMissError):
+            self.session('replay').get(ACS_URL)
+        with self.assertRaises(requests.ConnectionError):
+            self.geocode(self.session('replay'), ['0,1 Main St,Frederick,MD,21701'])
+
+    def test_injected_errors(self):
+        response = self.session('replay', error_rate=1).get(ACS_URL)
+        self.assertEqual(response.status_code, 503)
+
+    def test_normalize_url(self):
+        self.assertEqual(
+            normalize_url(ACS_URL),
+            'https://api.census.gov/data/2019/acs/acs5?for=county%3A021&get=NAME',
+        )
+
+    def test_make_adapter(self):
+        self.assertIs(
+            type(make_adapter('live', self.store_dir, 0, 0)),
+            requests.adapters.HTTPAdapter,
+        )
+        adapter = make_adapter('live', self.store_dir, 0.5, 0)
+        self.assertIsInstance(adapter, RecordReplayAdapter)
+        self.assertEqual(adapter.max_retries.read, 0)
+        with self.assertRaises(ValueError):
+            make_adapter('offline', self.store_dir, 0, 0)
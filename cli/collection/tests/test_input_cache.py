@@ -0,0 +1,63 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import pandas as pd
+
+from collection.input_cache import content_hash, load_or_parse
+
+
+class InputCacheTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.tmp_dir.name) / 'input_cache'
+        self.path = Path(self.tmp_dir.name) / 'evictions.csv'
+        self.path.write_text(
+            'case_number,filing_date,amount\nC-1,2020-01-05,1200\nC-2,2020-02-06,\n'
+        )
+        self.parsed = []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def parse(self, path: Path) -> pd.DataFrame:
+        self.parsed.append(path.name)
+        return pd.read_csv(path, parse_dates=['filing_date'])
+
+    def test_unchanged_files_are_not_parsed_again(self):
+        first = load_or_parse(self.cache_dir, self.path, self.parse)
+        second = load_or_parse(self.cache_dir, self.path, self.parse)
+        self.assertEqual(self.parsed, ['evictions.csv'])
+        pd.testing.assert_frame_equal(first, second)
+        # The key is the content, not the name of the file
+        copy = self.path.with_name('evictions_copy.csv')
+        copy.write_bytes(self.path.read_bytes())
+        load_or_parse(self.cache_dir, copy, self.parse)
+        self.assertEqual(self.parsed, ['evictions.csv'])
+
+    def test_modified_files_are_parsed_again(self):
+        load_or_parse(self.cache_dir, self.path, self.parse)
+        key = content_hash(self.path)
+        with open(self.path, 'a') as outfile:
+            outfile.write('C-3,2020-03-07,800\n')
+        self.assertNotEqual(content_hash(self.path), key)
+        data = load_or_parse(self.cache_dir, self.path, self.parse)
+        self.assertEqual(len(self.parsed), 2)
+        self.assertEqual(len(data), 3)
+
+    def test_mixed_type_columns_are_cached(self):
+        def parse(path: Path) -> pd.DataFrame:
+            self.parsed.append(path.name)
+            return pd.DataFrame({'amount': [1200, 'unknown', None]})
+
+        first = load_or_parse(self.cache_dir, self.path, parse)
+        second = load_or_parse(self.cache_dir, self.path, parse)
+        self.assertEqual(len(self.parsed), 1)
+        self.assertEqual(second['amount'].tolist()[:2], [1200, 'unknown'])
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_without_cache_directory(self):
+        load_or_parse(None, self.path, self.parse)
+        load_or_parse(None, self.path, self.parse)
+        self.assertEqual(len(self.parsed), 2)
+        self.assertFalse(self.cache_dir.exists())
@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from collection.record_schema import (
+    STRING_DTYPE,
+    apply_record_schema,
+    memory_report,
+    memory_usage_mb,
+)
+
+
+class RecordSchemaTests(TestCase):
+    def setUp(self):
+        self.records = pd.DataFrame(
+            {
+                'street_address_1': ['1 Main St', '2 Elm Ave', '1 Main St'],
+                'city': ['Frederick', 'Frederick', 'Thurmont'],
+                'zip_code': ['21701', '21701', '21788'],
+                'year': [2020, 2021, 2021],
+                'lat': [39.41, 39.42, np.nan],
+                'state_fips': [24.0, 24.0, np.nan],
+                'tract': ['750100', '750200', None],
+                'notes': ['a', 'b', 'c'],
+            }
+        )
+
+    def test_compact_dtypes(self):
+        records = apply_record_schema(self.records.copy())
+        self.assertIsInstance(records['city'].dtype, pd.CategoricalDtype)
+        self.assertIsInstance(records['zip_code'].dtype, pd.CategoricalDtype)
+        self.assertEqual(records['year'].dtype, 'int16')
+        self.assertEqual(records['lat'].dtype, 'float32')
+        self.assertEqual(records['state_fips'].dtype, 'Int8')
+        self.assertEqual(records['tract'].dtype, 'Int32')
+        self.assertEqual(records['tract'][0], 750100)
+        self.assertTrue(pd.isna(records['tract'][2]))
+        # Columns outside of the schema are left alone
+        self.assertEqual(records['notes'].dtype, object)
+        if STRING_DTYPE is not None:
+            self.assertEqual(records['street_address_1'].dtype, STRING_DTYPE)
+
+    def test_values_are_kept(self):
+        records = apply_record_schema(self.records.copy())
+        self.assertEqual(records['city'].tolist(), self.records['city'].tolist())
+        self.assertEqual(
+            records['street_address_1'].tolist(),
+            self.records['street_address_1'].tolist(),
+        )
+
+    def test_unconvertible_column_is_unchanged(self):
+        records = self.records.copy()
+        records['year'] = [2020, None, 2021]
+        records = apply_record_schema(records)
+        self.assertEqual(records['year'].dtype, 'float64')
+        self.assertIsNone(apply_record_schema(None))
+
+    def test_memory_report(self):
+        records = pd.concat([self.records] * 1000, ignore_index=True)
+        compact_records = apply_record_schema(records.copy())
+        self.assertLess(memory_usage_mb(compact_records), memory_usage_mb(records))
+        report = memory_report(records, compact_records)
+        self.assertIn('total', report.index)
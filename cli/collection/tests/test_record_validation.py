@@ -0,0 +1,115 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from collection.record_validation import (
+    invalid_states,
+    invalid_zip_codes,
+    state_codes,
+    validate_records,
+)
+
+TODAY = pd.Timestamp('2022-06-15')
+
+
+class RecordValidationTests(TestCase):
+    def setUp(self):
+        rows = 200
+        self.data = pd.DataFrame(
+            {
+                'street_address_1': [f'{i} Main St' for i in range(rows)],
+                'city': ['Frederick'] * rows,
+                'state': ['MD'] * rows,
+                'county': ['Frederick'] * rows,
+                'zip_code': [21701] * rows,
+                'eviction_filing_date': pd.to_datetime(['2021-03-01'] * rows),
+            }
+        )
+
+    def test_valid_records_pass(self):
+        valid, ledger = validate_records(self.data, 'eviction_filing_date', today=TODAY)
+        self.assertEqual(len(valid), len(self.data))
+        self.assertEqual(len(ledger), 0)
+        self.assertEqual(
+            list(ledger.columns),
+            ['street_address_1', 'city', 'state', 'zip_code', 'errors'],
+        )
+
+    def test_ledger_has_the_reason_codes_of_each_record(self):
+        data = self.data.copy()
+        data.loc[0, 'zip_code'] = 0
+        data.loc[1, 'state'] = 'XX'
+        data.loc[2, ['state', 'zip_code']] = ['VA', 123456]
+        data.loc[3, 'county'] = 'Kent County'
+        data.loc[4, 'eviction_filing_date'] = pd.Timestamp('2022-06-16')
+        data.loc[5, 'eviction_filing_date'] = TODAY
+        data['state'] = data['state'].astype('category')
+        valid, ledger = validate_records(
+            data, 'eviction_filing_date', min_area_share=0.01, today=TODAY
+        )
+        # Out-of-area records are only tagged, they are still geocoded
+        self.assertEqual(len(valid), len(data) - 3)
+        self.assertEqual(list(valid.index[:3]), [2, 3, 5])
+        self.assertEqual(list(ledger.index), [0, 1, 2, 3, 4])
+        self.assertEqual(
+            ledger['errors'].tolist(),
+            [
+                'invalid_zip',
+                'invalid_state',
+                'out_of_state',
+                'out_of_county',
+                'future_date',
+            ],
+        )
+
+    def test_multiple_reasons(self):
+        data = self.data.copy()
+        data.loc[0, ['zip_code', 'state']] = ['2170', 'Texas']
+        data.loc[0, 'eviction_filing_date'] = pd.Timestamp('2030-01-01')
+        _, ledger = validate_records(
+            data, 'eviction_filing_date', min_area_share=0.01, today=TODAY
+        )
+        self.assertEqual(ledger['errors'].tolist(), ['out_of_state;future_date'])
+        # By default records are never out of the area
+        _, ledger = validate_records(data, 'eviction_filing_date', today=TODAY)
+        self.assertEqual(ledger['errors'].tolist(), ['future_date'])
+
+    def test_small_counties_of_a_site_are_kept(self):
+        data = pd.concat([self.data] * 5, ignore_index=True)
+        data.loc[:7, 'county'] = 'Washington County'
+        valid, ledger = validate_records(data, 'eviction_filing_date', today=TODAY)
+        self.assertEqual(len(valid), len(data))
+        self.assertEqual(len(ledger), 0)
+        valid, ledger = validate_records(
+            data, 'eviction_filing_date', min_area_share=0.01, today=TODAY
+        )
+        self.assertEqual(len(valid), len(data))
+        self.assertEqual(ledger['errors'].unique().tolist(), ['out_of_county'])
+
+    def test_zip_codes(self):
+        zip_codes = pd.Series(
+            ['21701', '21701-1234', 2170, 217011234.0, 'ABCDE', '00000', None, '']
+        )
+        self.assertEqual(
+            invalid_zip_codes(zip_codes).tolist(),
+            [False, False, False, False, True, True, False, False],
+        )
+
+    def test_states(self):
+        states = pd.Series(['md', ' Maryland ', 'new  york', 'PR', 'ZZ', '', np.nan])
+        self.assertEqual(
+            state_codes(states).tolist()[:5], ['MD', 'MD', 'NY', 'PR', np.nan]
+        )
+        self.assertEqual(
+            invalid_states(states).tolist(),
+            [False, False, False, False, True, False, False],
+        )
+
+    def test_no_valid_records(self):
+        data = self.data.copy()
+        data['zip_code'] = 'unknown'
+        valid, ledger = validate_records(data, 'eviction_filing_date', today=TODAY)
+        self.assertIsNone(valid)
+        self.assertEqual(len(ledger), len(data))
+        self.assertEqual(validate_records(None), (None, None))
@@ -0,0 +1,60 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+
+from collection.tigerweb_api import get_input_data_geometry
+
+COUNTY_GEOMETRY = {
+    'type': 'FeatureCollection',
+    'features': [
+        {
+            'type': 'Feature',
+            'properties': {'OBJECTID': 1, 'geoid': '24021750100'},
+            'geometry': {
+                'type': 'Polygon',
+                'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]],
+            },
+        }
+    ],
+}
+
+
+class InputDataGeometryTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.geojson_filename = str(Path(self.tmp_dir.name) / 'tracts.geojson')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def assertEmptyGeometry(self, tracts_gdf):
+        self.assertEqual(len(tracts_gdf), 0)
+        self.assertIn('geoid', tracts_gdf.columns)
+        self.assertEqual(tracts_gdf.geometry.name, 'geometry')
+        self.assertEqual(tracts_gdf.crs, 'EPSG:4326')
+        self.assertTrue(Path(self.geojson_filename).is_file())
+
+    def test_no_counties(self):
+        self.assertEmptyGeometry(
+            get_input_data_geometry('24', [], self.geojson_filename)
+        )
+        self.assertIsNone(get_input_data_geometry(None, ['021'], self.geojson_filename))
+
+    @patch('collection.tigerweb_api.get_county_geometry')
+    def test_failed_county_lookups_are_left_out(self, get_county_geometry):
+        get_county_geometry.side_effect = requests.HTTPError('500 Server Error')
+        self.assertEmptyGeometry(
+            get_input_data_geometry('24', ['021', '031'], self.geojson_filename)
+        )
+
+        get_county_geometry.side_effect = [
+            COUNTY_GEOMETRY,
+            requests.HTTPError('500 Server Error'),
+        ]
+        tracts_gdf = get_input_data_geometry(
+            '24', ['021', '031'], self.geojson_filename
+        )
+        self.assertEqual(list(tracts_gdf['geoid']), ['24021750100'])
@@ -0,0 +1,119 @@
+import io
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+from pkg_resources import resource_filename
+
+from analysis.housing_loss_summary import summarize_housing_loss
+from analysis.space_time_cube import SpaceTimeCube
+from collection.tract_crosswalk import (
+    TractCrosswalk,
+    is_2010_vintage,
+    read_tract_relationship,
+)
+
+# Excerpt of a Census tract relationship file: 2010 tract 750100 was split in two 2020
+# tracts (3/4 and 1/4 of its land), 750200 kept its GEOID and 990000 is a water tract
+RELATIONSHIP_FILE = resource_filename(
+    'collection.tests', 'resources/tract_relationship_2010_2020.txt'
+)
+
+
+class TractCrosswalkTests(TestCase):
+    def setUp(self):
+        self.relationship = read_tract_relationship(RELATIONSHIP_FILE)
+        self.crosswalk = TractCrosswalk(self.relationship)
+
+    def test_read_relationship(self):
+        self.assertEqual(
+            list(self.relationship.columns), ['geoid_2020', 'geoid_2010', 'area']
+        )
+        self.assertEqual(self.relationship['geoid_2010'][0], 24021750100)
+        # Water area only counts for the water tract
+        self.assertEqual(self.relationship['area'].tolist(), [300, 100, 500, 80, 20])
+
+    def test_matrix_keeps_counts(self):
+        geoids = np.array([24021750100, 24021750200, 24021990000, 24021999999])
+        matrix, new_geoids = self.crosswalk.matrix(geoids)
+        self.assertEqual(
+            list(new_geoids),
+            [24021750101, 24021750102, 24021750200, 24021990000, 24021999999],
+        )
+        np.testing.assert_allclose(np.asarray(matrix.sum(axis=0)).ravel(), 1.0)
+        dense = matrix.toarray()
+        np.testing.assert_allclose(dense[:2, 0], [0.75, 0.25])
+        np.testing.assert_allclose(dense[2:4, 2], [0.2, 0.8])
+        # Tracts that are not in the relationship file keep their counts
+        self.assertEqual(dense[4, 3], 1.0)
+
+    def test_reallocate_cube(self):
+        cube = SpaceTimeCube.from_frames(
+            {
+                'evictions': pd.DataFrame(
+                    {
+                        'date': pd.to_datetime(
+                            ['2020-01-05', '2020-01-20', '2020-02-02', '2020-02-09']
+                        ),
+                        'geoid': ['24021750100'] * 3 + ['24021750200'],
+                    }
+                )
+            },
+            {'evictions': 'date'},
+        )
+        reallocated = self.crosswalk.reallocate(cube)
+        self.assertEqual(
+            list(reallocated.geoids), [24021750101, 24021750102, 24021750200]
+        )
+        np.testing.assert_allclose(
+            reallocated.counts[:, :, 0], [[1.5, 0.75], [0.5, 0.25], [0.0, 1.0]]
+        )
+        self.assertEqual(reallocated.total(), cube.total())
+
+    def test_is_2010_vintage(self):
+        self.assertTrue(
+            is_2010_vintage(['24021750100', '24021750200'], self.relationship)
+        )
+        self.assertFalse(
+            is_2010_vintage(['24021750101', '24021750200'], self.relationship)
+        )
+
+    def test_housing_unit_weights_need_a_crosswalk_with_them(self):
+        with self.assertRaises(ValueError):
+            TractCrosswalk(self.relationship, 'housing_units')
+        crosswalk = read_tract_relationship(
+            io.StringIO(
+                'tr2010ge,tr2020ge,wt_hu\n'
+                '24021750100,24021750101,0.9\n'
+                '24021750100,24021750102,0.1\n'
+            ),
+            sep=',',
+        )
+        matrix, _ = TractCrosswalk(crosswalk, 'housing_units').matrix([24021750100])
+        np.testing.assert_allclose(matrix.toarray()[:, 0], [0.9, 0.1])
+
+    def test_summary_uses_2020_tracts(self):
+        records = pd.DataFrame(
+            {
+                'eviction_filing_date': pd.to_datetime(
+                    ['2020-01-05', '2020-03-20', '2021-02-02', '2021-02-09']
+                ),
+                'geoid': ['24021750100'] * 4,
+            }
+        )
+        households = pd.DataFrame(
+            {
+                'GEOID': ['24021750101', '24021750102'],
+                'households_by_geoid': [30, 10],
+            }
+        )
+        summary = summarize_housing_loss(
+            records,
+            households,
+            'evic',
+            crosswalk=self.crosswalk.subset(['24021750100']),
+        )
+        self.assertEqual(summary['geoid'].tolist(), ['24021750101', '24021750102'])
+        self.assertEqual(summary['total_filings'].tolist(), [3.0, 1.0])
+        self.assertEqual(summary['2020_eviction_filings'].tolist(), [1.5, 0.5])
+        self.assertEqual(summary['avg_eviction_filing_rate'].tolist(), [0.05, 0.05])
@@ -1,10 +1,20 @@
 import json
 import typing as T
+from pathlib import Path
 
 import geopandas
 import pandas as pd
 import requests
 
+from collection.disk_cache import load_or_fetch
+from collection.geoid import geoid_key_to_str, make_geoid_key, tract_basename_to_code
+from collection.http_client import get_session
+from const import TIGERWEB_VINTAGE
+
+# Columns of the tract geometry of a site, also when no county geometry was retrieved
+TRACT_GEOMETRY_COLUMNS = ['geoid', 'geometry']
+TRACT_GEOMETRY_CRS = 'EPSG:4326'
+
 
 # 1. Formatting JSON response objects to be more easily parsed by eye
 def jprint(obj):
@@ -16,7 +26,7 @@ def jprint(obj):
 # 2. Retrieving all census tracts for the given county
 def create_tigerweb_query(state_code: str, county_code: str) -> str:
     # Create an API call with the input state and county code
-    base_uri = "https://tigerweb.geo.census.gov/arcgis/rest/services/TIGERweb/tigerWMS_Census2020/MapServer/6/query?where="
+    base_uri = f"https://tigerweb.geo.census.gov/arcgis/rest/services/TIGERweb/tigerWMS_{TIGERWEB_VINTAGE}/MapServer/6/query?where="
     #base_uri = "https://tigerweb.geo.census.gov/arcgis/rest/services/TIGERweb/tigerWMS_ACS2019/MapServer/8/query?where="
     connector = f"STATE%3D%27{state_code}%27+AND+COUNTY%3D%27{county_code}%27"
     end_uri = "&text=&objectIds=&time=&geometry=&geometryType=esriGeometryPolygon&inSR=&spatialRel=esriSpatialRelIntersects&distance=&units=esriSRUnit_Foot&relationParam=&outFields=&returnGeometry=true&returnTrueCurves=false&maxAllowableOffset=&geometryPrecision=&outSR=&havingClause=&returnIdsOnly=false&returnCountOnly=false&orderByFields=&groupByFieldsForStatistics=&outStatistics=&returnZ=false&returnM=false&gdbVersion=&historicMoment=&returnDistinctValues=false&resultOffset=&resultRecordCount=&returnExtentOnly=false&datumTransformation=&parameterValues=&rangeValues=&quantizationParameters=&featureEncoding=esriDefault&f=geojson"
@@ -26,76 +36,73 @@ def create_tigerweb_query(state_code: str, county_code: str) -> str:
     return api_call
 
 
-# 3. Function to reformat the tract codes in the TIGERweb response objects
-def reformat_tract_code(tract: str, state_code: str, county_code: str) -> str:
-    """Helper function to return GEOIDs compatible with those in deep-dive data files.
-
-    Parameters
-    ----------
-    tract : A string
-        An unformatted tract code, e.g. '53.38'
-    state_code : A string
-        The FIPS code for the state that we want to append.
-    county_code : A string
-        The FIPS code for the county that we want to append.
-
-    Returns
-    -------
-    str
-    """
-
-    # If the tract code contains a period, remove it, then prepend zeroes until length is 6
-    if "." in tract:
-        tract = tract.replace(".", "")
-        num_zeroes = 6 - len(tract)
-        tract = ("0" * num_zeroes) + tract
-    # Else prepend zeroes until the length is 4, then add 2 zeroes to the end
-    else:
-        num_zeroes = 4 - len(tract)
-        tract = ("0" * num_zeroes) + tract + "00"
-
-    # Prepend state and county FIPS codes
-    geoid = state_code + county_code + tract
-
-    return geoid
-
-
+# 3. Rename and reformat the tract codes in the TIGERweb response objects
 def rename_baseline(geojson_data, state_code: str, county_code: str) -> str:
     """Rename the 'BASELINE' identifiers to be named 'geoid', making it consistent with previous code output."""
-    for ind, i in enumerate(geojson_data['features']):
-        # Renaming 'BASELINE' key to 'census_tract_GEOID'
-        geojson_data['features'][ind].get('properties')['geoid'] = (
-            geojson_data['features'][ind].get('properties').pop('BASENAME')
-        )
-        # Reformatting the Census Tract IDs to conform to processed data set IDs
-        geojson_data['features'][ind].get('properties')['geoid'] = reformat_tract_code(
-            geojson_data['features'][ind].get('properties')['geoid'],
+    properties = [feature.get('properties') for feature in geojson_data['features']]
+    # Reformatting the Census Tract IDs (e.g. '53.38') to conform to processed data set IDs
+    geoids = geoid_key_to_str(
+        make_geoid_key(
             state_code,
             county_code,
+            tract_basename_to_code([p.pop('BASENAME') for p in properties]),
         )
+    )
+    for feature_properties, geoid in zip(properties, geoids):
+        feature_properties['geoid'] = geoid
 
     # Return the re-labeled GeoJSON
     return geojson_data
 
 
+def get_county_geometry(
+    state_fips: str, county_fips: str, cache_dir: T.Union[str, Path, None] = None
+) -> dict:
+    """Return the tract GeoJSON of a county, with tract codes renamed to GEOIDs."""
+
+    def fetch_geometry() -> dict:
+        # Assemble the request URI and retrieve the data
+        request = create_tigerweb_query(state_fips, county_fips)
+        response = get_session().get(str(request))
+        response.raise_for_status()
+        return rename_baseline(response.json(), state_fips, county_fips)
+
+    return load_or_fetch(cache_dir, f'tracts_{state_fips}{county_fips}', fetch_geometry)
+
+
 def get_input_data_geometry(
-    state_fips: str, county_fips: list, geojson_filename: str
+    state_fips: str,
+    county_fips: list,
+    geojson_filename: str,
+    cache_dir: T.Union[str, Path, None] = None,
 ) -> T.Union[geopandas.GeoDataFrame, None]:
-    """Main function to return geometry data for the input data/partner site."""
+    """Main function to return geometry data for the input data/partner site.
+
+    Counties whose geometry cannot be retrieved are left out; if none is left, the
+    geometry is an empty GeoDataFrame.
+    """
     # Check for invalid input
     if state_fips is None or county_fips is None:
         return None
-    geojson_gdf_output = geopandas.GeoDataFrame()
+    geojson_gdfs = []
     for i in county_fips:
-        # Assemble the request URI and retrieve the data
-        request = create_tigerweb_query(state_fips, i)
-        response = requests.get(str(request))
-        response = rename_baseline(response.json(), state_fips, i)
+        try:
+            response = get_county_geometry(state_fips, i, cache_dir)
+        except (requests.RequestException, ValueError) as e:
+            print('\u2326', f'No tract geometry for county {state_fips}{i}: {e}')
+            continue
 
         # Write the JSON response to a file and read into a geopandas dataframe
         with open(geojson_filename, 'w') as outfile:
             json.dump(response, outfile)
-        geojson_gdf = geopandas.read_file(geojson_filename)
-        geojson_gdf_output = geojson_gdf_output.append(geojson_gdf)
+        geojson_gdfs.append(geopandas.read_file(geojson_filename))
 
-    return geojson_gdf_output
+    if not geojson_gdfs:
+        geojson_gdf = geopandas.GeoDataFrame(
+            columns=TRACT_GEOMETRY_COLUMNS, geometry='geometry', crs=TRACT_GEOMETRY_CRS
+        )
+        # Still write the (empty) tract boundary file of the site
+        geojson_gdf.to_file(geojson_filename, driver='GeoJSON')
+        return geojson_gdf
+    # Concatenating GeoDataFrames (unlike appending to an empty one) keeps the geometry
+    return pd.concat(geojson_gdfs, ignore_index=True)
@@ -0,0 +1,177 @@
+"""
+Reallocation of housing loss counts from 2010 to 2020 census tracts
+
+Partner data with a GEOID column often uses 2010 tracts, while the ACS data and the
+TIGERweb geometry use 2020 tracts. The Census tract relationship file lists the parts
+that 2010 and 2020 tracts share; it is read once (from a local copy or the on-disk
+cache) and turned into a sparse (2020 tract x 2010 tract) matrix of weights, so the
+counts of all months and categories are reallocated with a single matrix product.
+
+The counts of a 2010 tract are split between the 2020 tracts it overlaps in proportion
+to the land area of the shared parts, or to their housing units if the relationship
+file has them (e.g. an NHGIS tract crosswalk). Reallocated counts are fractional.
+"""
+
+import copy
+import io
+import typing as T
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from collection.disk_cache import load_or_fetch
+from collection.geoid import to_geoid_key
+from collection.http_client import get_session
+from const import TRACT_RELATIONSHIP_PATH, TRACT_RELATIONSHIP_URL
+
+if T.TYPE_CHECKING:
+    from analysis.space_time_cube import SpaceTimeCube
+
+# Columns of the Census relationship file (pipe-delimited) and of an NHGIS crosswalk
+CENSUS_RELATIONSHIP_COLUMNS = {
+    'GEOID_TRACT_10': 'geoid_2010',
+    'GEOID_TRACT_20': 'geoid_2020',
+    'AREALAND_PART': 'area',
+    'AREAWATER_PART': 'water_area',
+}
+NHGIS_CROSSWALK_COLUMNS = {
+    'tr2010ge': 'geoid_2010',
+    'tr2020ge': 'geoid_2020',
+    'wt_hu': 'housing_units',
+}
+# Weights a 2010 tract can be split by, and the relationship column holding them
+CROSSWALK_WEIGHTS = {'area': 'area', 'housing_units': 'housing_units'}
+
+
+def read_tract_relationship(
+    source: T.Union[str, Path, T.IO], sep: str = '|'
+) -> pd.DataFrame:
+    """Read a tract relationship file to 2010 and 2020 GEOID keys and part weights.
+
+    Both the Census file and NHGIS crosswalks (with sep=',') are recognized. Water
+    area only weighs in for 2010 tracts without any land.
+    """
+    header = pd.read_csv(source, sep=sep, nrows=0).columns
+    if isinstance(source, io.IOBase):
+        source.seek(0)
+    columns = (
+        CENSUS_RELATIONSHIP_COLUMNS
+        if 'GEOID_TRACT_10' in header
+        else NHGIS_CROSSWALK_COLUMNS
+    )
+    missing = [column for column in columns if column not in header]
+    if missing:
+        raise ValueError(f'Not a tract relationship file, missing columns {missing}')
+    relationship = pd.read_csv(
+        source,
+        sep=sep,
+        usecols=list(columns),
+        dtype={column: str for column in columns},
+    ).rename(columns=columns)
+    for column in ('geoid_2010', 'geoid_2020'):
+        relationship[column] = to_geoid_key(relationship[column]).astype(np.int64)
+    for column in ('area', 'water_area', 'housing_units'):
+        if column in relationship.columns:
+            relationship[column] = pd.to_numeric(
+                relationship[column], errors='coerce'
+            ).fillna(0.0)
+    if 'water_area' in relationship.columns:
+        land = relationship.groupby('geoid_2010')['area'].transform('sum')
+        relationship['area'] = relationship['area'].where(
+            land > 0, relationship['area'] + relationship['water_area']
+        )
+        relationship = relationship.drop(columns='water_area')
+    return relationship
+
+
+def get_tract_relationship(
+    cache_dir: T.Union[str, Path, None] = None,
+    path: T.Union[str, Path, None] = TRACT_RELATIONSHIP_PATH,
+) -> pd.DataFrame:
+    """The tract relationship file, read from path or downloaded once to the cache."""
+    if path:
+        sep = ',' if Path(path).suffix.lower() == '.csv' else '|'
+        return read_tract_relationship(path, sep)
+
+    def fetch_relationship() -> pd.DataFrame:
+        response = get_session().get(TRACT_RELATIONSHIP_URL)
+        response.raise_for_status()
+        return read_tract_relationship(io.StringIO(response.text))
+
+    return load_or_fetch(cache_dir, 'tract_relationship_2010_2020', fetch_relationship)
+
+
+def is_2010_vintage(geoids: T.Any, relationship: pd.DataFrame) -> bool:
+    """Whether more of the GEOIDs are only 2010 tracts than only 2020 tracts.
+
+    GEOIDs of tracts that exist in both vintages do not count either way.
+    """
+    keys = to_geoid_key(pd.Series(geoids)).dropna().unique().astype(np.int64)
+    in_2010 = np.isin(keys, relationship['geoid_2010'].values)
+    in_2020 = np.isin(keys, relationship['geoid_2020'].values)
+    return int((in_2010 & ~in_2020).sum()) > int((in_2020 & ~in_2010).sum())
+
+
+class TractCrosswalk:
+    """Weights to reallocate counts by 2010 tract to 2020 tracts."""
+
+    def __init__(self, relationship: pd.DataFrame, weights: str = 'area'):
+        if weights not in CROSSWALK_WEIGHTS:
+            raise ValueError(
+                f'Unknown crosswalk weights {weights!r}, use one of '
+                f'{list(CROSSWALK_WEIGHTS)}'
+            )
+        column = CROSSWALK_WEIGHTS[weights]
+        if column not in relationship.columns:
+            raise ValueError(
+                f'The tract relationship file has no {weights} weights; use a '
+                'crosswalk with housing unit weights (e.g. from NHGIS) or area weights'
+            )
+        self.relationship = relationship[['geoid_2010', 'geoid_2020', column]].rename(
+            columns={column: 'weight'}
+        )
+        self.weights = weights
+
+    def subset(self, geoids: T.Any) -> 'TractCrosswalk':
+        """The crosswalk of the given 2010 tracts only, e.g. to store it with a site."""
+        keys = to_geoid_key(pd.Series(geoids)).dropna().astype(np.int64)
+        crosswalk = copy.copy(self)
+        crosswalk.relationship = self.relationship[
+            self.relationship['geoid_2010'].isin(keys)
+        ].reset_index(drop=True)
+        return crosswalk
+
+    def matrix(self, geoids: np.ndarray) -> T.Tuple[sparse.csr_matrix, np.ndarray]:
+        """Sparse (2020 tract x 2010 tract) matrix of weights and its 2020 GEOID keys.
+
+        geoids are sorted 2010 GEOID keys. Every column sums to 1, so counts are kept;
+        tracts missing from the relationship file keep their counts and GEOID, and
+        tracts whose parts have no weight are split evenly.
+        """
+        geoids = np.asarray(geoids, dtype=np.int64)
+        parts = self.relationship[self.relationship['geoid_2010'].isin(geoids)]
+        unknown = geoids[~np.isin(geoids, parts['geoid_2010'].values)]
+        from_geoids = np.concatenate([parts['geoid_2010'].values, unknown])
+        to_geoids = np.concatenate([parts['geoid_2020'].values, unknown])
+        weights = np.concatenate([parts['weight'].values, np.ones(len(unknown))])
+
+        columns = np.searchsorted(geoids, from_geoids)
+        column_totals = np.bincount(columns, weights, minlength=len(geoids))
+        column_parts = np.bincount(columns, minlength=len(geoids))
+        weights = np.where(
+            column_totals[columns] > 0,
+            weights / np.where(column_totals > 0, column_totals, 1)[columns],
+            1.0 / column_parts[columns],
+        )
+        new_geoids, rows = np.unique(to_geoids, return_inverse=True)
+        matrix = sparse.csr_matrix(
+            (weights, (rows, columns)), shape=(len(new_geoids), len(geoids))
+        )
+        return matrix, new_geoids
+
+    def reallocate(self, cube: 'SpaceTimeCube') -> 'SpaceTimeCube':
+        """The cube with its counts by 2010 tract reallocated to 2020 tracts."""
+        matrix, new_geoids = self.matrix(cube.geoids)
+        return cube.reallocate(matrix, new_geoids)
@@ -13,6 +13,35 @@ REQUIRED_ADDRESS_COLUMNS = ['street_address_1', 'city', 'state', 'zip_code']
 MIN_YEAR = 2016
 MAX_YEAR = 2999
 
+# Date formats tried (in order) when detecting the format of a date column
+DATE_FORMAT_CANDIDATES = [
+    '%Y-%m-%d',
+    '%m/%d/%Y',
+    '%m/%d/%y',
+    '%Y/%m/%d',
+    '%m-%d-%Y',
+    '%d-%b-%Y',
+    '%d-%b-%y',
+    '%b %d, %Y',
+    '%Y%m%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%m/%d/%Y %H:%M',
+    '%m/%d/%Y %H:%M:%S',
+    '%m/%d/%Y %I:%M:%S %p',
+]
+# Number of distinct values sampled per date column to detect its format
+DATE_FORMAT_SAMPLE_SIZE = 500
+# Share of sampled values a format must parse to be chosen for the column
+DATE_FORMAT_MIN_MATCH_RATE = 0.95
+
+# Records in states or counties with a smaller share of the records of their category
+# than this are tagged as out of the site's area in the address error files (they are
+# still geocoded); e.g. 0.01 to flag areas with less than 1% of the records
+VALIDATION_MIN_AREA_SHARE = 0
+
+# Rows per dataframe batch when streaming the sheets of .xlsx input files
+EXCEL_BATCH_ROWS = 50000
+
 # The year used to get ACS data
 ACS_YEAR = 2020
 
@@ -27,6 +56,21 @@ GEOCODE_PAYLOAD = {
 
 #https://geocoding.geo.census.gov/geocoder/vintages?benchmark=Public_AR_Current
 
+# TIGERweb map service of the tract boundaries (tracts are layer 6 of Census2020)
+TIGERWEB_VINTAGE = 'Census2020'
+
+# Census relationship file of 2020 and 2010 tracts, used to reallocate the counts of
+# partner data with 2010 tract GEOIDs to the 2020 tracts of the ACS and TIGERweb data.
+# It is downloaded once to the cache, unless the path of a local copy is given.
+TRACT_RELATIONSHIP_URL = (
+    'https://www2.census.gov/geo/docs/maps-data/data/rel2020/tract/'
+    'tab20_tract20_tract10_natl.txt'
+)
+TRACT_RELATIONSHIP_PATH = os.getenv('TRACT_RELATIONSHIP_PATH', '')
+# Split the counts of a 2010 tract by the 'area' of its parts, or by 'housing_units'
+# (needs a crosswalk with housing unit weights, e.g. the NHGIS tract crosswalk)
+TRACT_CROSSWALK_WEIGHTS = 'area'
+
 GEOCODE_RESPONSE_HEADER = [
     'id',
     'geocoded_address',
@@ -41,18 +85,73 @@ GEOCODE_RESPONSE_HEADER = [
     'tract',
     'block',
 ]
+# Initial batch size; the batch controller adapts it between the min and max below
 GEOCODE_CHUNK_SIZE = 100
+GEOCODE_MIN_CHUNK_SIZE = 25
+# The Census batch geocoder accepts at most 10,000 records per request
+GEOCODE_MAX_CHUNK_SIZE = 10000
+# Grow batches while a request takes less than this, shrink when it takes longer
+GEOCODE_TARGET_CHUNK_SECONDS = 60
+GEOCODE_CHUNK_GROWTH_FACTOR = 2.0
+GEOCODE_CHUNK_SHRINK_FACTOR = 0.5
+# Number of recent requests used to judge the geocoder error rate
+GEOCODE_ERROR_WINDOW = 5
+GEOCODE_MAX_CHUNK_RETRIES = 4
+# Seconds to wait before the first retry of a failed request, doubled for each further
+# retry up to the maximum
+GEOCODE_RETRY_BACKOFF_SECONDS = 2
+GEOCODE_RETRY_MAX_BACKOFF_SECONDS = 60
+# is_match value of the records whose requests failed after all retries
+GEOCODE_REQUEST_ERROR = 'Geocoder Error'
+# (connect, read) timeouts in seconds for a single batch geocoder request
+GEOCODE_REQUEST_TIMEOUT = (10, 300)
 GEOCODE_CACHE_SIZE = 1000
 
+# Shared HTTP client settings used for all external services
+HTTP_CONNECT_TIMEOUT = 10
+HTTP_READ_TIMEOUT = 120
+HTTP_CONNECT_RETRIES = 3
+HTTP_MAX_CONNECTIONS_PER_HOST = 10
+HTTP_MAX_CONCURRENT_REQUESTS_PER_HOST = 4
+# Request budget per host shared by all threads of a run (token bucket rate and burst)
+HTTP_MAX_REQUESTS_PER_SECOND_PER_HOST = 5.0
+HTTP_REQUEST_BURST_PER_HOST = 10
+# Upper bounds (in seconds) of the request latency histogram buckets
+HTTP_LATENCY_BUCKETS = (0.1, 0.5, 1, 5, 30, 120)
+
 HUD_XWALK_RESPONSE_BASE = "https://www.huduser.gov/hudapi/public/usps?type=1"
 # Load the .env file and get the HUD PD&R data access token from it
 dotenv.load_dotenv()
 PDR_ACCESS_TOKEN = os.getenv("HUD_PDR_TOKEN", "")
+
+# Record/replay of external service traffic: 'live' (default), 'record' or 'replay',
+# with optional injected latency (seconds per request) and error rate (0 to 1)
+HTTP_MODE = os.getenv('HTTP_MODE', 'live')
+HTTP_RECORDINGS_PATH = os.getenv('HTTP_RECORDINGS_PATH', 'http_recordings')
+HTTP_INJECTED_LATENCY = float(os.getenv('HTTP_INJECTED_LATENCY', '0'))
+HTTP_INJECTED_ERROR_RATE = float(os.getenv('HTTP_INJECTED_ERROR_RATE', '0'))
+
 # Set a random number seed; try to find a better method than setting this here
 RANDOM_SEED = 123456
 
 STAT_SIGNIFICANCE_CUTOFF = 0.05
 
+# Spatial clustering (Moran's I, Getis-Ord Gi*) of these summary measures over tracts
+SPATIAL_ANALYSIS_VARIABLES = [
+    'housing-loss-index',
+    'total_filings',
+    'total_foreclosures',
+]
+SPATIAL_PERMUTATIONS = 999
+
+# Monthly anomaly detection and forecasts per tract: months of baseline history, recent
+# months to raise alerts for, and the minimum anomaly score and filings of an alert
+ANOMALY_BASELINE_MONTHS = 12
+ANOMALY_ALERT_MONTHS = 3
+ANOMALY_SCORE_THRESHOLD = 3.0
+ANOMALY_MIN_COUNT = 3
+FORECAST_MONTHS = 3
+
 OUTPUT_PATH_GEOCODER_CACHE = 'output_data/geocoder_caches/'
 GEOCODER_CACHE_FILE_PREFIX = 'geocoder_cache_'
 OUTPUT_PATH_GEOCODED_DATA = 'output_data/full_datasets/'
@@ -63,17 +162,68 @@ OUTPUT_ALL_HOUSING_LOSS_PLOTS = (
 )
 OUTPUT_EVICTION_PLOTS = 'output_data/analysis_plots/correlations_eviction_only'
 OUTPUT_FORECLOSURE_PLOTS = 'output_data/analysis_plots/correlations_foreclosure_only'
+# Housing loss summary column -> folder of the plots of its correlations with the ACS
+# variables; other columns given as correlation targets get a folder of their own
+CORRELATION_TARGETS = {
+    'housing-loss-index': OUTPUT_ALL_HOUSING_LOSS_PLOTS,
+    'total_filings': OUTPUT_EVICTION_PLOTS,
+    'total_foreclosures': OUTPUT_FORECLOSURE_PLOTS,
+}
 OUTPUT_PATH_SUMMARIES = 'output_data/data_summaries/'
 OUTPUT_PATH_MAPS = 'output_data/mapping_data/'
+OUTPUT_PATH_CHECKPOINTS = 'output_data/checkpoints/'
+# Part of the fingerprint of every stage: bump when the code of the pipeline changes its
+# results, so that checkpoints of an earlier version are not resumed
+PIPELINE_VERSION = 1
+# Parsed input files, by content hash (see collection/input_cache.py)
+OUTPUT_PATH_INPUT_CACHE = 'output_data/input_cache/'
+# Bump when the reading, column normalization or date parsing of input files changes,
+# so that files parsed by an earlier version are parsed again
+INPUT_CACHE_VERSION = 1
 
 GEOCODED_EVICTIONS_FILENAME = 'evictions_data_geocoded.csv'
 GEOCODED_FORECLOSURES_FILENAME = 'foreclosures_data_geocoded.csv'
 GEOCODED_TAX_LIENS_FILENAME = 'tax_liens_data_geocoded.csv'
 HOUSING_LOSS_TIMESERIES_FILENAME = 'housing_loss_timeseries.png'
+# Count tables per level ('county' or 'tract') and frequency, e.g. tract_monthly
+HOUSING_LOSS_TIMESERIES_TABLE_FILENAME = 'housing_loss_timeseries_{}.csv'
+# Add 'weekly' to also write weekly count tables
+TIMESERIES_FREQUENCIES = ['monthly']
 ACS_DATA_DICT_FILENAME = 'acs_data_dictionary.csv'
 HOUSING_LOSS_SUMMARY_FILENAME = 'housing_loss_summary.csv'
+# Counts and rates by geographic level: 'block_group', 'tract', 'county' and 'zip'
+AGGREGATION_LEVELS = ['block_group', 'tract', 'county', 'zip']
+HOUSING_LOSS_LEVEL_SUMMARY_FILENAME = 'housing_loss_summary_{}.csv'
+HOUSING_LOSS_CUBE_FILENAME = 'housing_loss_cube.npz'
+HOUSING_LOSS_ALERTS_FILENAME = 'housing_loss_alerts.csv'
+HOUSING_LOSS_FORECAST_FILENAME = 'housing_loss_forecast.csv'
 TRACT_BOUNDARY_FILENAME = 'census_tract_boundaries.geojson'
 GIS_IMPORT_FILENAME = 'gis_data_import.gpkg'
+# Name of an extra layer with a point per tract in the GeoPackage (None for no layer)
+GIS_IMPORT_POINT_LAYER = None
+# Simplified tract geometry for the web map, one TopoJSON file per level
+WEB_GEOMETRY_FILENAME = 'census_tract_boundaries_{}.topojson'
+WEB_GEOMETRY_INDEX_FILENAME = 'census_tract_boundaries_index.json'
+# Simplification tolerance of each level, in degrees (0.0001 is about 10 m)
+WEB_GEOMETRY_TOLERANCES = {'high': 0.0001, 'medium': 0.0005, 'low': 0.002}
+# Number of grid cells the coordinates are quantized to across the site
+WEB_GEOMETRY_QUANTIZATION = 100000
 EVIC_ADDRESS_ERR_FILENAME = 'evic_address_errors.csv'
 MORT_ADDRESS_ERR_FILENAME = 'mort_address_errors.csv'
 TAX_ADDRESS_ERR_FILENAME= 'tax_address_errors.csv'
+HTTP_REQUEST_STATS_FILENAME = 'http_request_stats.csv'
+
+# Batch runs over many partner sites
+BATCH_MAX_WORKERS = 4
+# Evictions, mortgage foreclosures and tax liens are processed concurrently
+CATEGORY_MAX_WORKERS = 3
+OUTPUT_PATH_SHARED_CACHE = 'shared_cache/'
+BATCH_RUN_LOG_FILENAME = 'run_log.txt'
+BATCH_SUMMARY_FILENAME = 'batch_run_summary'
+
+# Local HTTP service that runs sites as queued jobs (service.py)
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+SERVICE_MAX_WORKERS = 2
+# Further jobs are refused until some of the queued ones have started
+SERVICE_MAX_QUEUED_JOBS = 20
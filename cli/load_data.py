@@ -3,68 +3,134 @@ Created on Sat Sep 18 23:11:22 2021
 
 @author: datakind
 """
+
+import argparse
+import hashlib
 import logging
+import multiprocessing
 import os
 import sys
 import typing as T
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from functools import reduce
 from pathlib import Path
 
 import pandas as pd
-import requests
-from matplotlib import collections
-from matplotlib import pyplot as plt
-
-from analysis.acs_correlation import correlation_analysis
-from analysis.acs_data import get_acs_data
-from analysis.housing_loss_summary import summarize_housing_loss
-from analysis.timeseries import create_timeseries
-from collection.address_cleaning import remove_special_chars
+
 from collection.address_geocoding import find_state_county_city, geocode_input_data
 from collection.address_validation import (
     standardize_input_addresses,
     validate_address_data,
     verify_input_directory,
 )
-from collection.tigerweb_api import (
-    create_tigerweb_query,
-    get_input_data_geometry,
-    jprint,
-    rename_baseline,
+from collection.checkpoint import CheckpointStore, files_fingerprint, fingerprint
+from collection.date_parsing import (
+    add_year_month_columns,
+    parse_date_column,
+    parse_date_columns,
 )
+from collection.geoid import merge_on_geoid, to_geoid_key
+from collection.http_client import get_request_stats
+from collection.input_cache import load_or_parse
+from collection.record_schema import (
+    apply_record_schema,
+    memory_usage_mb,
+    normalize_column_names,
+)
+from collection.record_validation import validate_records
 from const import (
     ACS_DATA_DICT_FILENAME,
     ACS_YEAR,
+    AGGREGATION_LEVELS,
+    CATEGORY_MAX_WORKERS,
+    CORRELATION_TARGETS,
     GEOCODED_EVICTIONS_FILENAME,
     GEOCODED_FORECLOSURES_FILENAME,
     GEOCODED_TAX_LIENS_FILENAME,
     GIS_IMPORT_FILENAME,
+    GIS_IMPORT_POINT_LAYER,
+    HOUSING_LOSS_ALERTS_FILENAME,
+    HOUSING_LOSS_CUBE_FILENAME,
+    HOUSING_LOSS_FORECAST_FILENAME,
+    HOUSING_LOSS_LEVEL_SUMMARY_FILENAME,
     HOUSING_LOSS_SUMMARY_FILENAME,
     HOUSING_LOSS_TIMESERIES_FILENAME,
+    HOUSING_LOSS_TIMESERIES_TABLE_FILENAME,
     MAX_YEAR,
     MIN_YEAR,
-    OUTPUT_ALL_HOUSING_LOSS_PLOTS,
-    OUTPUT_EVICTION_PLOTS,
-    OUTPUT_FORECLOSURE_PLOTS,
+    OUTPUT_PATH_CHECKPOINTS,
     OUTPUT_PATH_GEOCODED_DATA,
     OUTPUT_PATH_GEOCODER_CACHE,
+    OUTPUT_PATH_INPUT_CACHE,
     OUTPUT_PATH_MAPS,
     OUTPUT_PATH_PLOTS,
     OUTPUT_PATH_PLOTS_DETAIL,
     OUTPUT_PATH_SUMMARIES,
+    TIMESERIES_FREQUENCIES,
     TRACT_BOUNDARY_FILENAME,
+    TRACT_CROSSWALK_WEIGHTS,
+    TRACT_RELATIONSHIP_PATH,
     EVIC_ADDRESS_ERR_FILENAME,
     MORT_ADDRESS_ERR_FILENAME,
-    TAX_ADDRESS_ERR_FILENAME
+    TAX_ADDRESS_ERR_FILENAME,
+    HTTP_REQUEST_STATS_FILENAME,
+    TIGERWEB_VINTAGE,
+    VALIDATION_MIN_AREA_SHARE,
+    WEB_GEOMETRY_FILENAME,
+    WEB_GEOMETRY_INDEX_FILENAME,
+    WEB_GEOMETRY_QUANTIZATION,
+    WEB_GEOMETRY_TOLERANCES,
 )
 
+# The analysis and mapping modules (and matplotlib, scipy, seaborn, geopandas and census
+# with them) are imported by the stages that use them, so that starting the CLI and
+# the worker processes stays fast
+
+if T.TYPE_CHECKING:
+    from analysis.space_time_cube import SpaceTimeCube
+    from collection.tract_crosswalk import TractCrosswalk
+
+
+def read_input_file(path: Path) -> T.Union[pd.DataFrame, None]:
+    """Read a CSV or Excel input file, with normalized column names and parsed dates.
+
+    Returns None for files of other types.
+    """
+    if path.name.lower().endswith('.csv'):
+        print(u'\u2713', 'File type: .csv')
+        df = pd.read_csv(path, low_memory=False)
+        print('First row of data:\n', df.iloc[0, :])
+    elif path.name.lower().endswith('.xlsx'):
+        from collection.excel_streaming import read_excel_streaming
+
+        print(u'\u2713', 'File type: .xlsx')
+        # Streamed in batches, all sheets with the columns of the first
+        df = read_excel_streaming(path)
+        print(u'\u2713', 'First row of data:\n', df.iloc[0, :])
+    elif path.name.lower().endswith('.xls'):
+        print(u'\u2713', 'File type: .xls')
+        df = pd.read_excel(path)
+        print(u'\u2713', 'First row of data:\n', df.iloc[0, :])
+    else:
+        print(f'Invalid file detected {path.name}')
+        return None
+    # Convert columns names to lowercase and remove any special characters
+    df.columns = normalize_column_names(df.columns)
+    # Parse the date columns of each file once, detecting the format per file
+    return parse_date_columns(df)
 
-def load_data(sub_directories: T.List, data_category) -> T.Tuple[pd.DataFrame,pd.DataFrame]:
+
+def load_data(
+    sub_directories: T.List,
+    data_category,
+    input_cache_dir: T.Union[str, Path, None] = None,
+) -> T.Tuple[pd.DataFrame, pd.DataFrame]:
     """Load evictions data from csv template
     Inputs
     ------
     sub_directories: list of sub-directories
     data_category: 'evictions', 'mortgage_foreclosures', 'tax_lien_foreclosures'
+    input_cache_dir: directory of the parsed input files cache (None for no cache)
     parameters: If necessary, parameters to determine narrow down timeframe
       or columns of evictions data to return
     Outputs
@@ -80,7 +146,14 @@ def load_data(sub_directories: T.List, data_category) -> T.Tuple[pd.DataFrame,pd
         data_files = os.listdir(data_dir)
         # Alert user if there are no files in the relevant subdirectory
         if len(data_files) == 0:
-            print('\n\u2326', 'Your folder ', data_dir, 'is empty. Please add your', data_category ,'dataset to this folder.')
+            print(
+                '\n\u2326',
+                'Your folder ',
+                data_dir,
+                'is empty. Please add your',
+                data_category,
+                'dataset to this folder.',
+            )
             return None, None
         else:
             print(
@@ -97,16 +170,10 @@ def load_data(sub_directories: T.List, data_category) -> T.Tuple[pd.DataFrame,pd
             print('Loading file: ', f, ' of ', data_files)
             # Read in file depending on file format
             if str(f.lower()).startswith(data_category):
-                if str(f.lower()).endswith('.csv'):
-                    print(u'\u2713', 'File type: .csv')
-                    df = pd.read_csv(data_dir / f, low_memory=False)
-                    print('First row of data:\n', df.iloc[0, :])
-                elif str(f.lower()).endswith(('.xls', '.xlsx')):
-                    print(u'\u2713', 'File type: .xls or .xlsx')
-                    df = pd.read_excel(data_dir / f)
-                    print(u'\u2713', 'First row of data:\n', df.iloc[0, :])
-                else:
-                    print(f'Invalid file detected {str(f)}')
+                # Unchanged files are read from the cache instead of parsed again
+                df = load_or_parse(input_cache_dir, data_dir / f, read_input_file)
+                if df is None:
+                    continue
             else:
                 # Let user know about invalid files
                 print(
@@ -143,19 +210,23 @@ def load_data(sub_directories: T.List, data_category) -> T.Tuple[pd.DataFrame,pd
         # Drop FULL duplicates
         rows = data.shape[0]
         print('You are starting with ', rows, ' rows in your data set.')
-        # Convert columns names to lowercase and remove any special characters
-        data.columns = [
-            remove_special_chars(col.replace(' ', "_").lower().strip())
-            for col in data.columns
-        ]
-        if ('street_address_1' in data.columns and 'city' in data.columns and 'state' in data.columns and 'zip_code' in data.columns):
-           #select records that na for street_address_1 or all fields as df_dups_na
+        if (
+            'street_address_1' in data.columns
+            and 'city' in data.columns
+            and 'state' in data.columns
+            and 'zip_code' in data.columns
+        ):
+            # select records that na for street_address_1 or all fields as df_dups_na
             df_dups_na = data[data['street_address_1'].isna()]
             df_dups_dups = data[data.duplicated()]
             df_dups_na['errors'] = 'NA'
             df_dups_dups['errors'] = 'Duplicate'
-            df_dups_out_na = df_dups_na[['street_address_1','city', 'state', 'zip_code', 'errors']]
-            df_dups_out_dups = df_dups_dups[['street_address_1', 'city', 'state', 'zip_code', 'errors']]
+            df_dups_out_na = df_dups_na[
+                ['street_address_1', 'city', 'state', 'zip_code', 'errors']
+            ]
+            df_dups_out_dups = df_dups_dups[
+                ['street_address_1', 'city', 'state', 'zip_code', 'errors']
+            ]
             df_dups_out = pd.concat([df_dups_out_na, df_dups_out_dups])
         else:
             print(
@@ -163,7 +234,7 @@ def load_data(sub_directories: T.List, data_category) -> T.Tuple[pd.DataFrame,pd
             )
             return None, None
         data = data.drop_duplicates().dropna(how="all", axis=0)
-        if ('street_address_1' in data.columns):
+        if 'street_address_1' in data.columns:
             data = data.dropna(subset=['street_address_1'])
         print(
             u'\u2326',
@@ -171,6 +242,14 @@ def load_data(sub_directories: T.List, data_category) -> T.Tuple[pd.DataFrame,pd
             round(abs(100 * (data.shape[0] - rows) / rows), 1),
             '% of your rows.',
         )
+        # Store repeated values as categoricals and numbers in compact types
+        memory_before = memory_usage_mb(data)
+        data = apply_record_schema(data.copy())
+        print(
+            u'\u2713',
+            f'Compact column types reduced memory use from {memory_before:.2f} MB',
+            f'to {memory_usage_mb(data):.2f} MB.',
+        )
 
         print('\nProcessing Date Columns:')
         if data_category == 'evictions':
@@ -213,10 +292,9 @@ def load_data(sub_directories: T.List, data_category) -> T.Tuple[pd.DataFrame,pd
             )
             return None, None
 
-        if data[date_column].dtype == object:
-            data[date_column] = pd.to_datetime(
-                data[date_column], infer_datetime_format=True
-            )
+        # Dates were parsed per file already, this only parses unparsed or alternative
+        # columns
+        data[date_column] = parse_date_column(data[date_column])
         # Deal with null dates
         if data[date_column].isnull().sum() / data.shape[0] > 0.25:
             print(
@@ -225,12 +303,17 @@ def load_data(sub_directories: T.List, data_category) -> T.Tuple[pd.DataFrame,pd
                 '%, which can negatively affect the time-series analysis.',
             )
 
-        data[date_column] = pd.to_datetime(data[date_column])
         data[date_column] = data[date_column].fillna(method='ffill')
+        if data[date_column].isnull().any():
+            print(
+                u'\u2326',
+                data[date_column].isnull().sum(),
+                'rows without a valid date before the first dated row are dropped.',
+            )
+            data = data[data[date_column].notna()]
         print(f'\nFiltering data to only >= {MIN_YEAR} values:')
-        # Create year and month columns for later aggregation
-        data['year'] = data[date_column].dt.year.astype(int)
-        data['month'] = data[date_column].dt.to_period('M').astype(str)
+        # Create compact year and month columns for later aggregation
+        data = add_year_month_columns(data, date_column)
         print(
             u'\u2713',
             'Data date range is from ',
@@ -261,8 +344,12 @@ def load_data(sub_directories: T.List, data_category) -> T.Tuple[pd.DataFrame,pd
 
     print(
         u'\u2326',
-        'No', data_category, 'sub-folder exists in the folder.',
-        'Please add a', data_category, 'sub-folder.', 
+        'No',
+        data_category,
+        'sub-folder exists in the folder.',
+        'Please add a',
+        data_category,
+        'sub-folder.',
         'Please review FLH Partner Site Data Collection Template for more details.',
     )
     return None, None
@@ -279,124 +366,386 @@ def write_df_to_disk(input_df: pd.DataFrame, write_path_filename: Path) -> None:
     input_df.to_csv(str(write_path_filename), index=False)
 
 
-def main(input_path: str) -> None:
-    """This function is what it says it is. :)
+# Sub-folder name -> label, housing loss summary type, date column, timeseries title,
+# geocoded data and address error filenames for each category of data
+DATA_CATEGORIES = {
+    'evictions': {
+        'label': 'eviction',
+        # ACS households the housing loss rates are relative to
+        'households': 'total-renter-occupied-households',
+        'summary_type': 'evic',
+        'date_column': 'eviction_filing_date',
+        'title': 'Evictions',
+        'geocoded_filename': GEOCODED_EVICTIONS_FILENAME,
+        'errors_filename': EVIC_ADDRESS_ERR_FILENAME,
+    },
+    'mortgage_foreclosures': {
+        'label': 'foreclosure',
+        # ACS households the housing loss rates are relative to
+        'households': 'total-owner-occupied-households',
+        'summary_type': 'mort',
+        'date_column': 'foreclosure_sale_date',
+        'title': 'Foreclosures',
+        'geocoded_filename': GEOCODED_FORECLOSURES_FILENAME,
+        'errors_filename': MORT_ADDRESS_ERR_FILENAME,
+    },
+    'tax_lien_foreclosures': {
+        'label': 'tax lien',
+        # ACS households the housing loss rates are relative to
+        'households': 'total-owner-occupied-households',
+        'summary_type': 'tax',
+        'date_column': 'tax_lien_sale_date',
+        'title': 'Tax_Liens',
+        'geocoded_filename': GEOCODED_TAX_LIENS_FILENAME,
+        'errors_filename': TAX_ADDRESS_ERR_FILENAME,
+    },
+}
 
-    It takes in the input data path as an argument
+
+DATE_COLUMNS_BY_CATEGORY = {
+    category: settings['date_column'] for category, settings in DATA_CATEGORIES.items()
+}
+
+
+def category_executor(max_workers: int = CATEGORY_MAX_WORKERS) -> Executor:
+    """Process pool for the CPU-bound work on each category of data.
+
+    Within a worker process (e.g. of a batch run) threads are used instead, since
+    worker processes may not be able to start processes of their own.
     """
-    # LOOK FOR CORRECT SUBDIRECTORY STRUCTURE
-    sub_directories = verify_input_directory(input_path)
-    # If the input_directory fails, the main function should abort:
-    if sub_directories is None:
-        return("The path provided does not include the following three folders: evictions, mortgage_foreclosures, and tax_lien_foreclosures. ",
-        'Please add these three files to the folder to proceed')
+    if multiprocessing.parent_process() is not None:
+        return ThreadPoolExecutor(max_workers)
+    return ProcessPoolExecutor(max_workers)
 
-    # LOAD ALL 3 TYPES OF DATA (AS AVAILABLE)
-    df_evic, df_evic_dups = load_data(sub_directories, 'evictions')
-    df_mort, df_mort_dups = load_data(sub_directories, 'mortgage_foreclosures')
-    df_tax, df_tax_dups = load_data(sub_directories, 'tax_lien_foreclosures')
 
-    if (df_evic is None) and (df_mort is None) and (df_tax is None):
-        print(
-            'No data files matched our requirements for this analysis.'
-            'Please check the files and restart.'
+def load_all_data(
+    sub_directories: T.List, input_cache_dir: T.Union[str, Path, None] = None
+) -> T.Dict[str, T.Tuple]:
+    """Load all 3 types of data (as available), with their duplicate/empty rows."""
+    with category_executor() as executor:
+        futures = {
+            category: executor.submit(
+                load_data, sub_directories, category, input_cache_dir
+            )
+            for category in DATA_CATEGORIES
+        }
+        return {category: future.result() for category, future in futures.items()}
+
+
+def validate_all_data(
+    loaded: T.Dict[str, T.Tuple], today: T.Optional[pd.Timestamp] = None
+) -> T.Dict[str, T.Tuple]:
+    """Validate the loaded records, with the error ledger of the invalid ones.
+
+    Dates after today (by default the current date) are invalid.
+    """
+    validated = {}
+    for category, settings in DATA_CATEGORIES.items():
+        if loaded[category][0] is not None:
+            print(f"\nValidating {settings['label']} records:")
+        validated[category] = validate_records(
+            loaded[category][0], settings['date_column'], today=today
         )
-        return None
+    return validated
 
-    # STANDARDIZE THE INPUT DATA ADDRESSES
-    df_evic_standardized, df_evic_parse_err, evic_avail_cols = standardize_input_addresses(
-        df_evic, 'eviction'
+
+def validation_fingerprint(validated: T.Dict[str, T.Tuple]) -> str:
+    """Fingerprint of the validation result: the kept records and the error ledger.
+
+    Unlike the fingerprint of the validate stage, which changes with the run date,
+    it only changes when a record is kept or left out differently.
+    """
+
+    def hash_values(values: T.Union[pd.DataFrame, pd.Index, None]) -> T.Optional[str]:
+        if values is None:
+            return None
+        return hashlib.sha256(pd.util.hash_pandas_object(values).to_numpy()).hexdigest()
+
+    return fingerprint(
+        {
+            category: [
+                hash_values(df_valid.index if df_valid is not None else None),
+                hash_values(df_ledger),
+            ]
+            for category, (df_valid, df_ledger) in validated.items()
+        }
+    )
+
+
+def standardize_all_data(loaded: T.Dict[str, T.Tuple]) -> T.Dict[str, T.Tuple]:
+    """Standardize the addresses of all loaded data, with the address parsing errors."""
+    with category_executor() as executor:
+        futures = {
+            category: executor.submit(
+                standardize_input_addresses,
+                loaded[category][0],
+                DATA_CATEGORIES[category]['label'],
+            )
+            for category in DATA_CATEGORIES
+        }
+        return {category: future.result() for category, future in futures.items()}
+
+
+def site_records(
+    standardized: T.Dict[str, T.Tuple],
+    geocoded: T.Dict[str, T.Union[pd.DataFrame, None]],
+) -> T.Dict[str, T.Union[pd.DataFrame, None]]:
+    """Geocoded records of each category (standardized ones if geocoding failed)."""
+    return {
+        category: (
+            geocoded[category]
+            if geocoded[category] is not None
+            else standardized[category][0]
+        )
+        for category in DATA_CATEGORIES
+    }
+
+
+def build_housing_loss_cube(
+    standardized: T.Dict[str, T.Tuple],
+    geocoded: T.Dict[str, T.Union[pd.DataFrame, None]],
+    summary_write_path: Path,
+) -> 'SpaceTimeCube':
+    """Count the records of all categories by tract and month, and save the counts."""
+    from analysis.space_time_cube import SpaceTimeCube
+
+    cube = SpaceTimeCube.from_frames(
+        site_records(standardized, geocoded), DATE_COLUMNS_BY_CATEGORY
     )
-    df_mort_standardized, df_mort_parse_err, mort_avail_cols = standardize_input_addresses(
-        df_mort, 'foreclosure'
+    summary_write_path.mkdir(parents=True, exist_ok=True)
+    cube.save(summary_write_path / HOUSING_LOSS_CUBE_FILENAME)
+    print('*** Created ' + str(summary_write_path / HOUSING_LOSS_CUBE_FILENAME))
+    return cube
+
+
+def create_housing_loss_timeseries(
+    cube: 'SpaceTimeCube',
+    standardized: T.Dict[str, T.Tuple],
+    geocoded: T.Dict[str, T.Union[pd.DataFrame, None]],
+    summary_write_path: Path,
+) -> T.Dict[str, pd.DataFrame]:
+    """Write the site-level and per-tract housing loss counts of all categories.
+
+    Monthly counts are read from the cube; other frequencies are counted from the
+    records.
+    """
+    from analysis.timeseries import create_timeseries_tables
+
+    tables = {}
+    if 'monthly' in TIMESERIES_FREQUENCIES:
+        tables['county_monthly'] = cube.count_table()
+        tables['tract_monthly'] = cube.count_table(by_tract=True)
+    tables.update(
+        create_timeseries_tables(
+            site_records(standardized, geocoded),
+            DATE_COLUMNS_BY_CATEGORY,
+            [f for f in TIMESERIES_FREQUENCIES if f != 'monthly'],
+        )
     )
-    df_tax_standardized, df_tax_parse_err, tax_avail_cols = standardize_input_addresses(
-        df_tax, 'tax lien'
+    summary_write_path.mkdir(parents=True, exist_ok=True)
+    for name, table in tables.items():
+        table_path = summary_write_path / HOUSING_LOSS_TIMESERIES_TABLE_FILENAME.format(
+            name
+        )
+        write_df_to_disk(table, table_path)
+        print('*** Created ' + str(table_path))
+    return tables
+
+
+def detect_housing_loss_anomalies(
+    cube: 'SpaceTimeCube', summary_write_path: Path
+) -> pd.DataFrame:
+    """Write the ranked alerts of tracts with filing spikes, and the tract forecasts."""
+    from analysis.anomaly_detection import alert_table, forecast_table
+
+    alerts = alert_table(cube)
+    forecasts = forecast_table(cube)
+    summary_write_path.mkdir(parents=True, exist_ok=True)
+    write_df_to_disk(alerts, summary_write_path / HOUSING_LOSS_ALERTS_FILENAME)
+    print(
+        '*** Created '
+        + str(summary_write_path / HOUSING_LOSS_ALERTS_FILENAME)
+        + f' with {len(alerts)} alerts'
     )
+    write_df_to_disk(forecasts, summary_write_path / HOUSING_LOSS_FORECAST_FILENAME)
+    print('*** Created ' + str(summary_write_path / HOUSING_LOSS_FORECAST_FILENAME))
+    return alerts
 
 
+def plot_housing_loss_timeseries(
+    county_counts: pd.DataFrame, plot_write_path: Path
+) -> None:
+    """Plot the monthly housing loss counts of all categories to a single image."""
+    from matplotlib import pyplot as plt
 
-    # CREATE TIME SERIES PLOTS
-    plt.rcParams['figure.figsize'] = [25, 10]
-    fig1 = create_timeseries(df_evic_standardized, 'eviction_filing_date', 'Evictions')
-    fig2 = create_timeseries(
-        df_mort_standardized, 'foreclosure_sale_date', 'Foreclosures'
+    from analysis.timeseries import plot_timeseries
+
+    fig = plot_timeseries(
+        county_counts,
+        {category: settings['title'] for category, settings in DATA_CATEGORIES.items()},
     )
-    fig3 = create_timeseries(df_tax_standardized, 'tax_lien_sale_date', 'Tax_Liens')
     # Create the directories to output the plots to
-    plot_write_path = Path(input_path).parent / OUTPUT_PATH_PLOTS
     plot_write_path.mkdir(parents=True, exist_ok=True)
     # Save the plots to this directory
-    plt.legend(prop={'size': 20})
-    plt.savefig(str(plot_write_path / HOUSING_LOSS_TIMESERIES_FILENAME))
+    fig.savefig(str(plot_write_path / HOUSING_LOSS_TIMESERIES_FILENAME))
+    plt.close(fig)
     print(
         '*** Created housing loss timeseries image '
         + str(plot_write_path / HOUSING_LOSS_TIMESERIES_FILENAME)
     )
 
-    # GEOCODE THE CLEANED/STANDARDIZED DATA AND WRITE GEOCODED DATASETS TO DISK
-    # Create the directories to output the geocoder cache to
-    geocoder_cache_write_path = Path(input_path).parent / OUTPUT_PATH_GEOCODER_CACHE
+
+def geocode_all_data(
+    standardized: T.Dict[str, T.Tuple],
+    geocoder_cache_write_path: Path,
+    geocoded_file_write_path: Path,
+) -> T.Dict[str, T.Union[pd.DataFrame, None]]:
+    """Geocode the standardized data and write the geocoded datasets to disk.
+
+    The categories are geocoded in concurrent threads, which share the request budget
+    of the HTTP session (see collection.http_client).
+    """
+    # Create the directories to output the geocoder cache and geocoded datasets to
     geocoder_cache_write_path.mkdir(parents=True, exist_ok=True)
+    geocoded_file_write_path.mkdir(parents=True, exist_ok=True)
 
-    df_evic_geocoded_final = None
-    df_mort_geocoded_final = None
-    if df_evic_standardized is not None:
-        df_evic_geocoded_final = geocode_input_data(
-            df_evic_standardized, evic_avail_cols, 'eviction', geocoder_cache_write_path
+    def geocode_category(category: str) -> T.Union[pd.DataFrame, None]:
+        settings = DATA_CATEGORIES[category]
+        df_standardized, _, avail_cols = standardized[category]
+        df_geocoded = geocode_input_data(
+            df_standardized, avail_cols, settings['label'], geocoder_cache_write_path
         )
-    if df_mort_standardized is not None:
-        df_mort_geocoded_final = geocode_input_data(
-            df_mort_standardized,
-            mort_avail_cols,
-            'foreclosure',
-            geocoder_cache_write_path,
+        write_df_to_disk(
+            df_geocoded, geocoded_file_write_path / settings['geocoded_filename']
         )
-    df_tax_geocoded_final = geocode_input_data(
-        df_tax_standardized, tax_avail_cols, 'tax lien', geocoder_cache_write_path
-    )
+        return df_geocoded
 
-    # Create the directories to output the raw geocoded datasets to
-    geocoded_file_write_path = Path(input_path).parent / OUTPUT_PATH_GEOCODED_DATA
-    geocoded_file_write_path.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(CATEGORY_MAX_WORKERS) as executor:
+        futures = {
+            category: executor.submit(geocode_category, category)
+            for category in DATA_CATEGORIES
+        }
+        return {category: future.result() for category, future in futures.items()}
 
-    write_df_to_disk(
-        df_evic_geocoded_final, geocoded_file_write_path / GEOCODED_EVICTIONS_FILENAME
-    )
-    write_df_to_disk(
-        df_mort_geocoded_final,
-        geocoded_file_write_path / GEOCODED_FORECLOSURES_FILENAME,
-    )
-    write_df_to_disk(
-        df_tax_geocoded_final, geocoded_file_write_path / GEOCODED_TAX_LIENS_FILENAME
-    )
+
+def get_site_acs_data(
+    geocoded: T.Dict[str, T.Union[pd.DataFrame, None]],
+    cache_dir: T.Union[str, Path, None] = None,
+    acs_year: int = ACS_YEAR,
+) -> T.Tuple:
+    """Get the state/county FIPS codes of the site and the ACS data of its counties."""
+    from analysis.acs_data import get_acs_data
 
     # Get the most likely state/county FIPS codes and city from geocoded data
     state_fips, county_fips, city_str, state_str = find_state_county_city(
-        df_evic_geocoded_final
+        geocoded['evictions']
     )
     if state_fips is None or county_fips is None:
         # If we can't find FIPS codes from evictions data, try it from the mortgage foreclosure data
         state_fips, county_fips, city_str_2, state_str_2 = find_state_county_city(
-            df_mort_geocoded_final
+            geocoded['mortgage_foreclosures']
         )
-
+    if state_fips is None or county_fips is None:
+        return state_fips, county_fips, None, None
 
     # GRAB ACS DATA; used in housing loss summary and demographic correlation search
     print("\nPreparing to get ACS data...")
     acs_df = pd.DataFrame()
+    acs_data_dict = None
     for county in county_fips:
-        acs_df_county, acs_data_dict = get_acs_data(state_fips, str(county), ACS_YEAR)
+        acs_df_county, acs_data_dict = get_acs_data(
+            state_fips, str(county), acs_year, cache_dir
+        )
         acs_df = pd.concat([acs_df, acs_df_county], axis=0)
-    if acs_df is None:
+    return state_fips, county_fips, acs_df, acs_data_dict
+
+
+def get_tract_crosswalks(
+    geocoded: T.Dict[str, T.Union[pd.DataFrame, None]],
+    acs_df: pd.DataFrame,
+    cache_dir: T.Union[str, Path, None] = None,
+    weights: str = TRACT_CROSSWALK_WEIGHTS,
+) -> T.Dict[str, T.Union['TractCrosswalk', None]]:
+    """Crosswalks to 2020 tracts for the categories whose GEOIDs are 2010 tracts.
+
+    GEOIDs given in the partner data are taken as is, so they can be of the 2010
+    vintage while the ACS data uses 2020 tracts. The tract relationship file is only
+    read if some GEOIDs are not tracts of the ACS data.
+    """
+    from collection.tract_crosswalk import (
+        TractCrosswalk,
+        get_tract_relationship,
+        is_2010_vintage,
+    )
+
+    crosswalks = {category: None for category in DATA_CATEGORIES}
+    acs_keys = to_geoid_key(acs_df['GEOID']).dropna()
+    relationship = None
+    for category, settings in DATA_CATEGORIES.items():
+        data = geocoded[category]
+        if data is None or 'geoid' not in data.columns:
+            continue
+        keys = to_geoid_key(data['geoid']).dropna()
+        if keys.isin(acs_keys).all():
+            continue
+        if relationship is None:
+            try:
+                relationship = get_tract_relationship(
+                    cache_dir, TRACT_RELATIONSHIP_PATH
+                )
+            except (OSError, ValueError) as e:
+                # Network errors of requests are OSErrors too
+                print('\u2326', 'Unable to read the tract relationship file:', e)
+                return crosswalks
+        if not is_2010_vintage(keys, relationship):
+            continue
+        crosswalks[category] = TractCrosswalk(relationship, weights).subset(keys)
         print(
-            '\u2326  Insufficient geography information to retrieve ACS Data!',
-            'Please input valid state and county FIPS codes.',
+            '\u2713',
+            f'The {settings["label"]} records use 2010 census tracts, their counts are',
+            f'reallocated to 2020 tracts by {weights.replace("_", " ")}.',
         )
+    return crosswalks
+
+
+def get_address_errors(
+    df_geocoded: T.Union[pd.DataFrame, None], hhs: pd.DataFrame
+) -> T.Union[pd.DataFrame, None]:
+    """Get the exceptions from geocoded data - those that don't merge with the ACS data."""
+    if df_geocoded is None:
         return None
+    geoid_noacs = merge_on_geoid(df_geocoded, hhs, how='left', indicator=True)
+    geoid_noacs = geoid_noacs[geoid_noacs['_merge'] == 'left_only'][
+        ['street_address_1', 'city', 'state', 'zip_code']
+    ]
+    no_geoid = df_geocoded[df_geocoded['geoid'].isna()][
+        ['street_address_1', 'city', 'state', 'zip_code']
+    ]
+    no_geoid['errors'] = 'Unable to find a match in the census geocoder'
+    return no_geoid
+
+
+def summarize_all_data(
+    loaded: T.Optional[T.Dict[str, T.Tuple]],
+    standardized: T.Optional[T.Dict[str, T.Tuple]],
+    geocoded: T.Dict[str, T.Union[pd.DataFrame, None]],
+    acs_df: pd.DataFrame,
+    acs_data_dict: T.Union[T.Dict, None],
+    summary_write_path: Path,
+    cube: T.Optional['SpaceTimeCube'] = None,
+    crosswalks: T.Optional[T.Dict[str, T.Union['TractCrosswalk', None]]] = None,
+    validated: T.Optional[T.Dict[str, T.Tuple]] = None,
+) -> pd.DataFrame:
+    """Create the housing loss summary by geoid and the address error files.
+
+    The housing loss counts are read from the space-time cube of the run, if given,
+    and reallocated to 2020 tracts for the categories with a tract crosswalk.
+    The address error files are only written if the loaded and standardized data are
+    given; they include the records that failed validation if validated is given.
+    """
+    from analysis.housing_loss_summary import summarize_housing_loss
 
     # Create the directories to output the ACS data and summary files to
-    summary_write_path = Path(input_path).parent / OUTPUT_PATH_SUMMARIES
     summary_write_path.mkdir(parents=True, exist_ok=True)
 
     # Write the ACS data dictionary to a file for reference
@@ -409,7 +758,6 @@ def main(input_path: str) -> None:
             + str(summary_write_path / ACS_DATA_DICT_FILENAME)
             + ' - inspect for ACS variable definitions and reference'
         )
-    
 
     ### Grab the renter and home owner total count estimates we'll use
     ### later for housing loss rate calculations
@@ -423,34 +771,27 @@ def main(input_path: str) -> None:
     owner_hhs.rename(
         columns={'total-owner-occupied-households': 'households_by_geoid'}, inplace=True
     )
-
-    #Get the exceptions from geocoded data- those that dont merge with the acs data
-    df_evic_errors = None
-    df_mort_errors = None
-    df_tax_errors = None
-    if df_evic_geocoded_final is not None:
-        geoid_noacs_evic = df_evic_geocoded_final.merge(renter_hhs, left_on='geoid', right_on='GEOID', how = 'left', indicator=True)
-        geoid_noacs_evic = geoid_noacs_evic[geoid_noacs_evic['_merge'] == 'left_only'][['street_address_1', 'city', 'state', 'zip_code']]
-        no_geoid_evic = df_evic_geocoded_final[df_evic_geocoded_final['geoid'].isna()][['street_address_1', 'city', 'state', 'zip_code']]
-        no_geoid_evic['errors'] = 'Unable to find a match in the census geocoder'
-        df_evic_errors = no_geoid_evic
-    if df_mort_geocoded_final is not None:
-        geoid_noacs_mort = df_mort_geocoded_final.merge(owner_hhs, left_on='geoid', right_on='GEOID', how = 'left', indicator=True)
-        geoid_noacs_mort = geoid_noacs_mort[geoid_noacs_mort['_merge'] == 'left_only'][['street_address_1', 'city', 'state', 'zip_code']]
-        no_geoid_mort = df_mort_geocoded_final[df_mort_geocoded_final['geoid'].isna()][['street_address_1', 'city', 'state', 'zip_code']]
-        no_geoid_mort['errors'] = 'Unable to find a match in the census geocoder'
-        df_mort_errors = no_geoid_mort
-    if df_tax_geocoded_final is not None:
-        geoid_noacs_tax = df_tax_geocoded_final.merge(owner_hhs, left_on='geoid', right_on='GEOID', how = 'left', indicator=True)
-        geoid_noacs_tax = geoid_noacs_tax[geoid_noacs_tax['_merge'] == 'left_only'][['street_address_1', 'city', 'state', 'zip_code']]
-        no_geoid_tax = df_tax_geocoded_final[df_tax_geocoded_final['geoid'].isna()][['street_address_1', 'city', 'state', 'zip_code']]
-        no_geoid_tax['errors'] = 'Unable to find a match in the census geocoder'
-        df_tax_errors = no_geoid_tax
+    # Evictions are relative to renters, foreclosures and tax liens to home owners
+    hhs_by_category = {
+        'evictions': renter_hhs,
+        'mortgage_foreclosures': owner_hhs,
+        'tax_lien_foreclosures': owner_hhs,
+    }
 
     # CREATE HOUSING LOSS SUMMARIES
-    evic_summ = summarize_housing_loss(df_evic_geocoded_final, renter_hhs, 'evic')
-    mort_summ = summarize_housing_loss(df_mort_geocoded_final, owner_hhs, 'mort')
-    tax_summ = summarize_housing_loss(df_tax_geocoded_final, owner_hhs, 'tax')
+    summaries = {
+        category: summarize_housing_loss(
+            geocoded[category],
+            hhs_by_category[category],
+            DATA_CATEGORIES[category]['summary_type'],
+            cube.select(categories=[category]) if cube is not None else None,
+            (crosswalks or {}).get(category),
+        )
+        for category in DATA_CATEGORIES
+    }
+    evic_summ = summaries['evictions']
+    mort_summ = summaries['mortgage_foreclosures']
+    tax_summ = summaries['tax_lien_foreclosures']
 
     # Stack the data together for summarization while counting all housing loss events for the housing loss index calculation
     coll_dfs = []
@@ -467,47 +808,42 @@ def main(input_path: str) -> None:
 
     # Create the summary dataframe, add the ACS variables and get all housing loss events
     df_summ_mrg = reduce(
-        lambda left, right: pd.merge(left, right, on='geoid'), coll_dfs
+        lambda left, right: merge_on_geoid(left, right, right_on='geoid'), coll_dfs
     )
-    df_summ_mrg = pd.merge(df_summ_mrg, acs_df, left_on='geoid', right_on='GEOID')
+    df_summ_mrg = merge_on_geoid(df_summ_mrg, acs_df)
 
-    if mort_summ is not None:
-        if tax_summ is not None:
-            df_summ_mrg['total_housing_loss'] = (
-                df_summ_mrg['total_filings']
-                + df_summ_mrg['total_mortgage_foreclosures']
-                + df_summ_mrg['total_tax_liens']
-            )
-            df_summ_mrg['total_foreclosures'] = (
-                df_summ_mrg['total_mortgage_foreclosures']
-                + df_summ_mrg['total_tax_liens']
-            )
-        else:
-            df_summ_mrg['total_housing_loss'] = (
-                df_summ_mrg['total_filings']
-                + df_summ_mrg['total_mortgage_foreclosures']
-            )
-            df_summ_mrg['total_foreclosures'] = df_summ_mrg[
-                'total_mortgage_foreclosures'
-            ]
-    else:
-        if tax_summ is not None:
-            df_summ_mrg['total_housing_loss'] = (
-                df_summ_mrg['total_filings'] + df_summ_mrg['total_tax_liens']
-            )
-            df_summ_mrg['total_foreclosures'] = df_summ_mrg['total_tax_liens']
-        else:
-            df_summ_mrg['total_housing_loss'] = df_summ_mrg['total_filings']
+    # Sum the housing loss events of the categories with data
+    foreclosure_totals = [
+        column
+        for summ, column in [
+            (mort_summ, 'total_mortgage_foreclosures'),
+            (tax_summ, 'total_tax_liens'),
+        ]
+        if summ is not None
+    ]
+    loss_totals = (['total_filings'] if evic_summ is not None else []) + (
+        foreclosure_totals
+    )
+    df_summ_mrg['total_housing_loss'] = df_summ_mrg[loss_totals].sum(axis=1)
+    if foreclosure_totals:
+        df_summ_mrg['total_foreclosures'] = df_summ_mrg[foreclosure_totals].sum(axis=1)
 
     # Calculate the housing loss index - note this assumes complete records of evictions and foreclosures for all years present in eviction data
-    df_summ_mrg['housing-loss-index'] = (
-        df_summ_mrg['total_housing_loss']
-        / (
-            df_summ_mrg['total-renter-occupied-households']
-            + df_summ_mrg['total-owner-occupied-households']
+    if evic_summ is not None:
+        df_summ_mrg['housing-loss-index'] = (
+            df_summ_mrg['total_housing_loss']
+            / (
+                df_summ_mrg['total-renter-occupied-households']
+                + df_summ_mrg['total-owner-occupied-households']
+            )
+            / df_summ_mrg['nyears_evic_data']
+        )
+    else:
+        print(
+            '\u2326',
+            'No eviction data: the housing loss index, which is averaged over the',
+            'years of eviction data, is left out of the summary.',
         )
-        / df_summ_mrg['nyears_evic_data']
-    )
 
     # Save the summary file to this directory
     write_df_to_disk(df_summ_mrg, summary_write_path / HOUSING_LOSS_SUMMARY_FILENAME)
@@ -515,109 +851,428 @@ def main(input_path: str) -> None:
         '*** Created ' + str(summary_write_path / HOUSING_LOSS_SUMMARY_FILENAME) + msg
     )
 
-    #Create summary of the errors and output to file
-    if (df_evic_parse_err is not None or df_evic_errors is not None or df_evic_dups is not None):
-        df_evic_errors = pd.concat([df_evic_parse_err, df_evic_errors, df_evic_dups])
-        write_df_to_disk(
-            df_evic_errors, summary_write_path / EVIC_ADDRESS_ERR_FILENAME
-        )
-    if (df_mort_parse_err is not None or df_mort_errors is not None or df_mort_dups is not None):
-        df_mort_errors = pd.concat([df_mort_parse_err,df_mort_errors, df_mort_dups])
-        write_df_to_disk(
-            df_mort_errors, summary_write_path / MORT_ADDRESS_ERR_FILENAME
-        )
-    if (df_tax_parse_err is not None or df_tax_errors is not None or df_tax_dups is not None):
-        df_tax_errors = pd.concat([df_tax_parse_err, df_tax_errors, df_tax_dups])
-        write_df_to_disk(
-            df_tax_errors, summary_write_path / TAX_ADDRESS_ERR_FILENAME
-        )
+    # Create summary of the errors and output to file
+    if loaded is None or standardized is None:
+        return df_summ_mrg
+    for category, settings in DATA_CATEGORIES.items():
+        df_dups = loaded[category][1]
+        df_invalid = validated[category][1] if validated is not None else None
+        df_parse_err = standardized[category][1]
+        df_errors = get_address_errors(geocoded[category], hhs_by_category[category])
+        error_frames = [df_invalid, df_parse_err, df_errors, df_dups]
+        if any(df is not None for df in error_frames):
+            df_errors = pd.concat(error_frames)
+            write_df_to_disk(
+                df_errors, summary_write_path / settings['errors_filename']
+            )
 
+    return df_summ_mrg
 
-    # Prepare subdirectories to store correlation analysis results
 
-    all_housing_loss_write_path = (
-        Path(input_path).parent / OUTPUT_ALL_HOUSING_LOSS_PLOTS
-    )
-    all_housing_loss_write_path.mkdir(parents=True, exist_ok=True)
+def correlation_plot_path(target: str) -> str:
+    """Output folder of the correlation plots of a housing loss measure."""
+    return CORRELATION_TARGETS.get(target, f'{OUTPUT_PATH_PLOTS}correlations_{target}')
 
-    all_housing_loss_plot_detail_write_path = (
-        Path(input_path).parent
-        / OUTPUT_ALL_HOUSING_LOSS_PLOTS
-        / OUTPUT_PATH_PLOTS_DETAIL
-    )
-    all_housing_loss_plot_detail_write_path.mkdir(parents=True, exist_ok=True)
 
-    evictions_write_path = Path(input_path).parent / OUTPUT_EVICTION_PLOTS
-    evictions_write_path.mkdir(parents=True, exist_ok=True)
+def create_level_summaries(
+    geocoded: T.Dict[str, T.Union[pd.DataFrame, None]],
+    state_fips: str,
+    county_fips: T.List[str],
+    summary_write_path: Path,
+    crosswalks: T.Optional[T.Dict[str, T.Union['TractCrosswalk', None]]] = None,
+    cache_dir: T.Union[str, Path, None] = None,
+    acs_year: int = ACS_YEAR,
+    levels: T.Sequence[str] = tuple(AGGREGATION_LEVELS),
+) -> T.Dict[str, pd.DataFrame]:
+    """Write the housing loss counts and rates by block group, tract, county and ZIP.
 
-    evictions_plot_detail_write_path = (
-        Path(input_path).parent / OUTPUT_EVICTION_PLOTS / OUTPUT_PATH_PLOTS_DETAIL
-    )
-    evictions_plot_detail_write_path.mkdir(parents=True, exist_ok=True)
+    The rates are missing for a level whose ACS households could not be retrieved.
+    """
+    from analysis.acs_data import get_acs_households
+    from analysis.geo_aggregation import aggregate_levels, level_summary, years_of_data
 
-    foreclosure_write_path = Path(input_path).parent / OUTPUT_FORECLOSURE_PLOTS
-    foreclosure_write_path.mkdir(parents=True, exist_ok=True)
+    summary_write_path.mkdir(parents=True, exist_ok=True)
+    level_counts = aggregate_levels(geocoded, levels, crosswalks)
+    nyears = years_of_data(geocoded, DATE_COLUMNS_BY_CATEGORY)
+    household_columns = {
+        category: settings['households']
+        for category, settings in DATA_CATEGORIES.items()
+    }
+    summaries = {}
+    for level in levels:
+        # ZIP code tabulation areas are fetched for the whole country at once
+        counties = county_fips[:1] if level == 'zip' else county_fips
+        try:
+            households = pd.concat(
+                [
+                    get_acs_households(
+                        level, state_fips, str(county), acs_year, cache_dir
+                    )
+                    for county in counties
+                ],
+                ignore_index=True,
+            )
+        except Exception as e:
+            print('\u2326', f'Unable to get the ACS households by {level}:', e)
+            households = None
+        summaries[level] = level_summary(
+            level,
+            level_counts[level],
+            list(DATA_CATEGORIES),
+            households,
+            household_columns,
+            nyears,
+        )
+        filename = HOUSING_LOSS_LEVEL_SUMMARY_FILENAME.format(level)
+        write_df_to_disk(summaries[level], summary_write_path / filename)
+        print('*** Created ' + str(summary_write_path / filename))
+    return summaries
 
-    foreclosure_plot_detail_write_path = (
-        Path(input_path).parent / OUTPUT_FORECLOSURE_PLOTS / OUTPUT_PATH_PLOTS_DETAIL
-    )
-    foreclosure_plot_detail_write_path.mkdir(parents=True, exist_ok=True)
 
-    # # RUN CORRELATION ANALYSIS WITH ACS VARIABLES
-    # target_var options:
-    # evictions --> 'total_filings'
-    # mortgage foreclosures including tax liens --> 'total_foreclosures'
-    # all housing loss events --> 'housing-loss-index'
-    plt.rcParams['figure.figsize'] = [15, 10]
+def run_correlation_analysis(
+    acs_df: pd.DataFrame,
+    df_summ_mrg: pd.DataFrame,
+    output_path: Path,
+    targets: T.Sequence[str] = tuple(CORRELATION_TARGETS),
+) -> None:
+    """Correlate the housing loss measures with the ACS variables and plot the results.
 
-    try:
-        correlation_analysis(
-            acs_df, df_summ_mrg, 'housing-loss-index', all_housing_loss_write_path
-        )
-    except KeyError:
-        print('Unable to create correlations for housing-loss-index')
+    targets: columns of the housing loss summary, by default 'housing-loss-index'
+      (all housing loss events), 'total_filings' (evictions) and 'total_foreclosures'
+      (mortgage foreclosures including tax liens)
+    """
+    from matplotlib import pyplot as plt
 
-    try:
-        correlation_analysis(acs_df, df_summ_mrg, 'total_filings', evictions_write_path)
-    except KeyError:
-        print('Unable to create correlations for total_filings')
+    from analysis.acs_correlation import correlation_analysis
 
-    try:
-        correlation_analysis(
-            acs_df, df_summ_mrg, 'total_foreclosures', foreclosure_write_path
+    # Prepare subdirectories to store correlation analysis results
+    for target in targets:
+        (output_path / correlation_plot_path(target) / OUTPUT_PATH_PLOTS_DETAIL).mkdir(
+            parents=True, exist_ok=True
         )
-    except KeyError:
-        print('Unable to create correlations for total_foreclosures')
+
+    # # RUN CORRELATION ANALYSIS WITH ACS VARIABLES
+    plt.rcParams['figure.figsize'] = [15, 10]
+    for target in targets:
+        try:
+            correlation_analysis(
+                acs_df, df_summ_mrg, target, output_path / correlation_plot_path(target)
+            )
+        except KeyError:
+            print('Unable to create correlations for ' + target)
+
+
+def create_mapping_data(
+    state_fips: str,
+    county_fips: T.List,
+    df_summ_mrg: pd.DataFrame,
+    mapping_write_path: Path,
+    cache_dir: T.Union[str, Path, None] = None,
+) -> None:
+    """Get the tract geometry and write it, with the summary data, to a geopackage."""
+    from analysis.spatial_analysis import add_spatial_statistics, tract_weights
+    from collection.tigerweb_api import get_input_data_geometry
+    from mapping.gpkg_writer import write_geopackage
 
     # Create the directories to output the mapping files to
-    mapping_write_path = Path(input_path).parent / OUTPUT_PATH_MAPS
     mapping_write_path.mkdir(parents=True, exist_ok=True)
 
     # GET GEOMETRY DATA FROM CENSUS TIGERWEB API
     print("\nRetrieving geography data from Census TIGERweb API...")
     geojson_gdf = get_input_data_geometry(
-        state_fips, county_fips, str(mapping_write_path / TRACT_BOUNDARY_FILENAME)
+        state_fips,
+        county_fips,
+        str(mapping_write_path / TRACT_BOUNDARY_FILENAME),
+        cache_dir,
     )
     print('*** Created ' + str(mapping_write_path / TRACT_BOUNDARY_FILENAME))
     # Merge the geometry dataframe with the housing + ACS data summary, but avoid
     #   duplicate column names (since they are non-case sensitive in databases)
     # First drop the 'index' column also, since the `censusdata.censusgeo.censusgeo` datatype
     #   throws an error in the .gpkg file creation
-    df_summ_mrg.drop(columns='index', inplace=True)
+    df_summ_mrg = df_summ_mrg.drop(columns='index')
     if 'geoid' in df_summ_mrg.columns and 'GEOID' in df_summ_mrg.columns:
         df_summ_mrg.drop(columns='GEOID', inplace=True)
     elif 'GEOID' in df_summ_mrg.columns:
         df_summ_mrg.rename(columns={'GEOID': 'geoid'}, inplace=True)
-    df_summ_mrg['geoid'] = df_summ_mrg['geoid'].astype('str').str.zfill(11)
-    merged_gdf = geojson_gdf.merge(df_summ_mrg, how='left', on='geoid')
-    merged_gdf.to_file(str(mapping_write_path / GIS_IMPORT_FILENAME), driver='GPKG')
+    merged_gdf = merge_on_geoid(
+        geojson_gdf, df_summ_mrg, left_on='geoid', right_on='geoid', how='left'
+    )
+    # Add the spatial clustering (hot spots) of housing loss over neighbouring tracts;
+    # the tract adjacency only depends on the counties, so it is cached per county set
+    weight_geoids, weights = tract_weights(
+        geojson_gdf,
+        cache_dir,
+        f"tract_weights_{state_fips}{'_'.join(sorted(map(str, county_fips)))}",
+    )
+    merged_gdf = add_spatial_statistics(merged_gdf, weight_geoids, weights)
+    write_geopackage(
+        merged_gdf,
+        mapping_write_path / GIS_IMPORT_FILENAME,
+        point_layer=GIS_IMPORT_POINT_LAYER,
+    )
     print('*** Created ' + str(mapping_write_path / GIS_IMPORT_FILENAME))
 
+
+def main(
+    input_path: str,
+    output_path: T.Union[str, Path, None] = None,
+    cache_dir: T.Union[str, Path, None] = None,
+    resume: bool = True,
+) -> T.Optional[T.Tuple[str, ...]]:
+    """This function is what it says it is. :)
+
+    It takes in the input data path as an argument. Outputs are written to an
+    `output_data` folder in output_path (by default one level up from the input data),
+    and downloaded ACS/geometry data is shared through cache_dir if one is given.
+
+    Each stage of the run is checkpointed: running it again skips the stages whose
+    inputs have not changed, unless resume is False.
+
+    Returns None once all stages (up to the mapping data) have run, or the message
+    explaining why the run stopped early because of its input data.
+    """
+    output_path = Path(output_path) if output_path else Path(input_path).parent
+    # LOOK FOR CORRECT SUBDIRECTORY STRUCTURE
+    sub_directories = verify_input_directory(input_path)
+    # If the input_directory fails, the main function should abort:
+    if sub_directories is None:
+        return (
+            "The path provided does not include the following three folders: evictions, mortgage_foreclosures, and tax_lien_foreclosures. ",
+            'Please add these three files to the folder to proceed',
+        )
+
+    checkpoints = CheckpointStore(output_path / OUTPUT_PATH_CHECKPOINTS, resume)
+    fingerprints = checkpoints.fingerprints
+
+    # LOAD ALL 3 TYPES OF DATA (AS AVAILABLE)
+    loaded = checkpoints.run(
+        'load',
+        [files_fingerprint(sorted(sub_directories)), MIN_YEAR, MAX_YEAR],
+        lambda: load_all_data(sub_directories, output_path / OUTPUT_PATH_INPUT_CACHE),
+    )
+    if all(df is None for df, _ in loaded.values()):
+        message = (
+            'No data files matched our requirements for this analysis.',
+            'Please check the files and restart.',
+        )
+        print(*message)
+        return message
+
+    # LEAVE OUT INVALID RECORDS (ZIP, STATE, DATE) BEFORE ANY GEOCODING
+    # Future dates are relative to the day of the run, so validate again on a new day
+    run_date = pd.Timestamp.now().normalize()
+    validated = checkpoints.run(
+        'validate',
+        [
+            fingerprints['load'],
+            VALIDATION_MIN_AREA_SHARE,
+            run_date.date().isoformat(),
+        ],
+        lambda: validate_all_data(loaded, run_date),
+    )
+
+    # The later stages only depend on which records were kept or left out
+    validated_fingerprint = validation_fingerprint(validated)
+
+    # STANDARDIZE THE INPUT DATA ADDRESSES
+    standardized = checkpoints.run(
+        'standardize',
+        [validated_fingerprint],
+        lambda: standardize_all_data(validated),
+    )
+
+    # GEOCODE THE CLEANED/STANDARDIZED DATA AND WRITE GEOCODED DATASETS TO DISK
+    geocoder_cache_write_path = output_path / OUTPUT_PATH_GEOCODER_CACHE
+    geocoded_file_write_path = output_path / OUTPUT_PATH_GEOCODED_DATA
+    geocoded = checkpoints.run(
+        'geocode',
+        [fingerprints['standardize']],
+        lambda: geocode_all_data(
+            standardized, geocoder_cache_write_path, geocoded_file_write_path
+        ),
+        outputs=[
+            geocoded_file_write_path / DATA_CATEGORIES[category]['geocoded_filename']
+            for category in DATA_CATEGORIES
+            if standardized[category][0] is not None
+        ],
+    )
+
+    # COUNT THE HOUSING LOSS EVENTS BY TRACT, MONTH AND CATEGORY
+    summary_write_path = output_path / OUTPUT_PATH_SUMMARIES
+    cube = checkpoints.run(
+        'cube',
+        [fingerprints['standardize'], fingerprints['geocode']],
+        lambda: build_housing_loss_cube(standardized, geocoded, summary_write_path),
+        outputs=[summary_write_path / HOUSING_LOSS_CUBE_FILENAME],
+    )
+
+    # CREATE MONTHLY/WEEKLY COUNT TABLES FOR THE SITE AND EACH TRACT, AND PLOT THEM
+    timeseries = checkpoints.run(
+        'timeseries',
+        [fingerprints['cube'], TIMESERIES_FREQUENCIES],
+        lambda: create_housing_loss_timeseries(
+            cube, standardized, geocoded, summary_write_path
+        ),
+        outputs=[
+            summary_write_path
+            / HOUSING_LOSS_TIMESERIES_TABLE_FILENAME.format(f'{level}_{frequency}')
+            for level in ('county', 'tract')
+            for frequency in TIMESERIES_FREQUENCIES
+        ],
+    )
+    plot_write_path = output_path / OUTPUT_PATH_PLOTS
+    if 'monthly' in TIMESERIES_FREQUENCIES:
+        checkpoints.run(
+            'timeseries_plot',
+            [fingerprints['timeseries']],
+            lambda: plot_housing_loss_timeseries(
+                timeseries['county_monthly'], plot_write_path
+            ),
+            outputs=[plot_write_path / HOUSING_LOSS_TIMESERIES_FILENAME],
+        )
+
+    # FLAG TRACTS WITH UNEXPECTED SPIKES IN FILINGS AND FORECAST THE NEXT MONTHS
+    checkpoints.run(
+        'alerts',
+        [fingerprints['cube']],
+        lambda: detect_housing_loss_anomalies(cube, summary_write_path),
+        outputs=[
+            summary_write_path / HOUSING_LOSS_ALERTS_FILENAME,
+            summary_write_path / HOUSING_LOSS_FORECAST_FILENAME,
+        ],
+    )
+
+    # GET THE SITE'S COUNTIES AND THEIR ACS DATA
+    state_fips, county_fips, acs_df, acs_data_dict = checkpoints.run(
+        'acs',
+        [fingerprints['geocode'], ACS_YEAR],
+        lambda: get_site_acs_data(geocoded, cache_dir),
+    )
+    if acs_df is None:
+        message = (
+            'Insufficient geography information to retrieve ACS Data!',
+            'Please input valid state and county FIPS codes.',
+        )
+        print('\u2326 ', *message)
+        return message
+
+    # REALLOCATE THE COUNTS OF PARTNER DATA WITH 2010 TRACT GEOIDS TO 2020 TRACTS
+    crosswalks = checkpoints.run(
+        'tract_vintage',
+        [
+            fingerprints['geocode'],
+            fingerprints['acs'],
+            TRACT_CROSSWALK_WEIGHTS,
+            TRACT_RELATIONSHIP_PATH,
+        ],
+        lambda: get_tract_crosswalks(geocoded, acs_df, cache_dir),
+    )
+
+    # CREATE HOUSING LOSS SUMMARIES AND ERROR FILES
+    df_summ_mrg = checkpoints.run(
+        'summary',
+        [
+            fingerprints['load'],
+            validated_fingerprint,
+            fingerprints['geocode'],
+            fingerprints['cube'],
+            fingerprints['acs'],
+            fingerprints['tract_vintage'],
+        ],
+        lambda: summarize_all_data(
+            loaded,
+            standardized,
+            geocoded,
+            acs_df,
+            acs_data_dict,
+            summary_write_path,
+            cube,
+            crosswalks,
+            validated,
+        ),
+        outputs=[summary_write_path / HOUSING_LOSS_SUMMARY_FILENAME],
+    )
+
+    # COUNT AND RATE THE HOUSING LOSS BY BLOCK GROUP, TRACT, COUNTY AND ZIP CODE
+    checkpoints.run(
+        'levels',
+        [
+            fingerprints['geocode'],
+            fingerprints['acs'],
+            fingerprints['tract_vintage'],
+            AGGREGATION_LEVELS,
+        ],
+        lambda: create_level_summaries(
+            geocoded,
+            state_fips,
+            county_fips,
+            summary_write_path,
+            crosswalks,
+            cache_dir,
+        ),
+        outputs=[
+            summary_write_path / HOUSING_LOSS_LEVEL_SUMMARY_FILENAME.format(level)
+            for level in AGGREGATION_LEVELS
+        ],
+    )
+
+    # RUN CORRELATION ANALYSIS WITH ACS VARIABLES
+    checkpoints.run(
+        'correlations',
+        [fingerprints['summary']],
+        lambda: run_correlation_analysis(acs_df, df_summ_mrg, output_path),
+        outputs=[
+            output_path / correlation_plot_path(target)
+            for target in CORRELATION_TARGETS
+        ],
+    )
+
+    # CREATE THE MAPPING DATA
+    mapping_write_path = output_path / OUTPUT_PATH_MAPS
+    checkpoints.run(
+        'mapping',
+        [fingerprints['summary']],
+        lambda: create_mapping_data(
+            state_fips, county_fips, df_summ_mrg, mapping_write_path, cache_dir
+        ),
+        outputs=[
+            mapping_write_path / TRACT_BOUNDARY_FILENAME,
+            mapping_write_path / GIS_IMPORT_FILENAME,
+        ],
+    )
+    # Simplified tract boundaries at several levels of detail for the web map
+    from mapping.web_geometry import create_web_geometry
+
+    checkpoints.run(
+        'web_geometry',
+        [
+            fingerprints['acs'],
+            TIGERWEB_VINTAGE,
+            WEB_GEOMETRY_TOLERANCES,
+            WEB_GEOMETRY_QUANTIZATION,
+        ],
+        lambda: create_web_geometry(
+            state_fips, county_fips, mapping_write_path, cache_dir
+        ),
+        outputs=[
+            mapping_write_path / WEB_GEOMETRY_FILENAME.format(level)
+            for level in WEB_GEOMETRY_TOLERANCES
+        ]
+        + [mapping_write_path / WEB_GEOMETRY_INDEX_FILENAME],
+    )
+
+    # Report how the external services behaved during this run
+    request_stats = get_request_stats()
+    write_df_to_disk(request_stats, summary_write_path / HTTP_REQUEST_STATS_FILENAME)
+    print('*** Created ' + str(summary_write_path / HTTP_REQUEST_STATS_FILENAME))
+
     # Now that we have got through the entire process, delete the cached geocoded files
-    for f in geocoder_cache_write_path.iterdir():
-        if f.is_file():
-            f.unlink()
-    geocoder_cache_write_path.rmdir()
+    if geocoder_cache_write_path.exists():
+        for f in geocoder_cache_write_path.iterdir():
+            if f.is_file():
+                f.unlink()
+        geocoder_cache_write_path.rmdir()
 
     return None
 
@@ -626,5 +1281,14 @@ if __name__ == "__main__":
     logging.basicConfig(
         level=logging.INFO, format="%(asctime)s - %(levelname)s: %(message)s"
     )
-    dir_path = sys.argv[1]
-    main(dir_path)
+    parser = argparse.ArgumentParser(
+        description='DataKind New America Housing Loss Analysis Tool'
+    )
+    parser.add_argument('input_path', help='Folder with the input data sub-folders')
+    parser.add_argument(
+        '--restart',
+        action='store_true',
+        help='Run all stages again instead of resuming from the last checkpoints',
+    )
+    args = parser.parse_args()
+    main(args.input_path, resume=not args.restart)
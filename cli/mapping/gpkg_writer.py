@@ -0,0 +1,108 @@
+"""
+Bulk GeoPackage writer for the mapping data
+
+Whole layers are written at once through pyogrio (using Arrow when GDAL and pyarrow
+support it) instead of feature by feature through Fiona. Each layer gets an R-tree
+spatial index and an index on its `geoid` column, so that GIS tools and map servers
+can look tracts up without scanning the table. Without pyogrio, geopandas' default
+writer is used and the indexes are still created.
+"""
+
+import sqlite3
+import typing as T
+from contextlib import closing
+from pathlib import Path
+
+import geopandas
+
+try:
+    import pyogrio
+except ImportError:
+    pyogrio = None
+
+try:
+    import pyarrow  # noqa: F401
+
+    ARROW_AVAILABLE = pyogrio is not None and pyogrio.__gdal_version__ >= (3, 8, 0)
+except ImportError:
+    ARROW_AVAILABLE = False
+
+GPKG_DRIVER = 'GPKG'
+RTREE_EXTENSION = 'gpkg_rtree_index'
+
+
+def write_layer(
+    gdf: geopandas.GeoDataFrame, path: T.Union[str, Path], layer: str
+) -> str:
+    """Write a layer to a GeoPackage in bulk; returns the write method used."""
+    if pyogrio is None:
+        gdf.to_file(str(path), layer=layer, driver=GPKG_DRIVER)
+        return 'fiona'
+    write_options = dict(
+        layer=layer, driver=GPKG_DRIVER, layer_options={'SPATIAL_INDEX': 'YES'}
+    )
+    if ARROW_AVAILABLE:
+        try:
+            pyogrio.write_dataframe(gdf, str(path), use_arrow=True, **write_options)
+            return 'pyogrio-arrow'
+        except (ValueError, TypeError):
+            # Columns that Arrow cannot convert, e.g. of mixed Python objects
+            pass
+    pyogrio.write_dataframe(gdf, str(path), **write_options)
+    return 'pyogrio'
+
+
+def create_attribute_index(path: T.Union[str, Path], layer: str, column: str) -> None:
+    with closing(sqlite3.connect(str(path))) as connection, connection:
+        connection.execute(
+            f'CREATE INDEX IF NOT EXISTS "idx_{layer}_{column}" '
+            f'ON "{layer}" ("{column}")'
+        )
+
+
+def has_spatial_index(path: T.Union[str, Path], layer: str) -> bool:
+    with closing(sqlite3.connect(str(path))) as connection:
+        row = connection.execute(
+            'SELECT COUNT(*) FROM gpkg_extensions '
+            'WHERE lower(table_name) = lower(?) AND extension_name = ?',
+            (layer, RTREE_EXTENSION),
+        ).fetchone()
+    return row[0] > 0
+
+
+def has_attribute_index(path: T.Union[str, Path], layer: str, column: str) -> bool:
+    with closing(sqlite3.connect(str(path))) as connection:
+        indexes = connection.execute(f'PRAGMA index_list("{layer}")').fetchall()
+        for index in indexes:
+            columns = connection.execute(f'PRAGMA index_info("{index[1]}")').fetchall()
+            if [c[2] for c in columns] == [column]:
+                return True
+    return False
+
+
+def write_geopackage(
+    gdf: geopandas.GeoDataFrame,
+    path: T.Union[str, Path],
+    layer: T.Optional[str] = None,
+    point_layer: T.Optional[str] = None,
+    index_columns: T.Sequence[str] = ('geoid',),
+) -> T.List[str]:
+    """Write the tracts (and optionally their points) to a new GeoPackage.
+
+    The layer is named after the file by default, as with `GeoDataFrame.to_file`. The
+    point layer holds the same attributes, with a point inside each tract. Returns the
+    names of the layers written.
+    """
+    path = Path(path)
+    layer = layer or path.stem
+    # Start from a new file, as `to_file` does
+    path.unlink(missing_ok=True)
+    layers = {layer: gdf}
+    if point_layer:
+        layers[point_layer] = gdf.set_geometry(gdf.geometry.representative_point())
+    for name, layer_gdf in layers.items():
+        write_layer(layer_gdf, path, name)
+        for column in index_columns:
+            if column in layer_gdf.columns:
+                create_attribute_index(path, name, column)
+    return list(layers)
@@ -0,0 +1,56 @@
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import geopandas
+import numpy as np
+from shapely.geometry import box
+
+from mapping.gpkg_writer import (
+    has_attribute_index,
+    has_spatial_index,
+    write_geopackage,
+)
+
+
+class GeoPackageWriterTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / 'gis_data_import.gpkg'
+        self.tracts = geopandas.GeoDataFrame(
+            {
+                'geoid': ['24021750100', '24021750200', '24021750300'],
+                'housing-loss-index': [0.01, np.nan, 0.03],
+                'total_filings_hot_spot': ['hot spot', None, 'not significant'],
+            },
+            geometry=[box(i, 0, i + 1, 1) for i in range(3)],
+            crs='EPSG:4326',
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write_with_indexes(self):
+        layers = write_geopackage(self.tracts, self.path, point_layer='tract_points')
+        self.assertEqual(layers, ['gis_data_import', 'tract_points'])
+        for layer in layers:
+            self.assertTrue(has_spatial_index(self.path, layer))
+            self.assertTrue(has_attribute_index(self.path, layer, 'geoid'))
+
+        written = geopandas.read_file(self.path, layer='gis_data_import')
+        self.assertEqual(list(written['geoid']), list(self.tracts['geoid']))
+        self.assertTrue(np.isnan(written['housing-loss-index'][1]))
+        points = geopandas.read_file(self.path, layer='tract_points')
+        self.assertEqual(set(points.geom_type), {'Point'})
+        self.assertTrue(points.within(self.tracts.geometry).all())
+
+    def test_overwrites_existing_file(self):
+        write_geopackage(self.tracts, self.path, point_layer='tract_points')
+        write_geopackage(self.tracts.iloc[:1], self.path)
+        with sqlite3.connect(self.path) as connection:
+            layers = connection.execute(
+                'SELECT table_name FROM gpkg_contents'
+            ).fetchall()
+        self.assertEqual(layers, [('gis_data_import',)])
+        self.assertEqual(len(geopandas.read_file(self.path)), 1)
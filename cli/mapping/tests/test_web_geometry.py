@@ -0,0 +1,162 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+import geopandas
+import numpy as np
+import shapely
+from shapely.geometry import Point, Polygon, box
+
+from mapping.web_geometry import (
+    ArcEncoder,
+    create_web_geometry,
+    topology_geometries,
+    web_geometry_levels,
+)
+
+
+def jagged_tracts(size: int = 4, points: int = 60, seed: int = 0):
+    """A grid of tracts whose shared boundaries are noisy lines."""
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 1, points)
+    cell = 0.05
+
+    def edge(start, end, jitter):
+        line = np.array(start) + t[:, None] * (np.array(end) - np.array(start))
+        offset = jitter * rng.normal(0, 0.001, points) * np.sin(np.pi * t)
+        normal = np.array([end[1] - start[1], start[0] - end[0]]) / cell
+        return line + offset[:, None] * normal
+
+    horizontal = {
+        (i, j): edge((i * cell, j * cell), ((i + 1) * cell, j * cell), 0 < j < size)
+        for i in range(size)
+        for j in range(size + 1)
+    }
+    vertical = {
+        (i, j): edge((i * cell, j * cell), (i * cell, (j + 1) * cell), 0 < i < size)
+        for i in range(size + 1)
+        for j in range(size)
+    }
+    geoids, polygons = [], []
+    for i in range(size):
+        for j in range(size):
+            ring = np.vstack(
+                [
+                    horizontal[i, j],
+                    vertical[i + 1, j][1:],
+                    horizontal[i, j + 1][::-1][1:],
+                    vertical[i, j][::-1][1:],
+                ]
+            )
+            geoids.append(f'24021{i:03d}{j:03d}')
+            polygons.append(Polygon(ring))
+    return geopandas.GeoDataFrame({'geoid': geoids}, geometry=polygons, crs='EPSG:4326')
+
+
+class WebGeometryTests(TestCase):
+    tolerances = {'high': 0.0002, 'low': 0.002}
+
+    def setUp(self):
+        self.tracts = jagged_tracts()
+        self.topologies, self.index = web_geometry_levels(self.tracts, self.tolerances)
+
+    def decoded(self, level):
+        geometries = topology_geometries(self.topologies[level])
+        return np.array([geometries[g] for g in self.tracts['geoid']], dtype=object)
+
+    def test_levels_keep_the_coverage_without_gaps_or_overlaps(self):
+        site_area = shapely.area(shapely.union_all(self.tracts.geometry.values))
+        for level in self.tolerances:
+            geometries = self.decoded(level)
+            self.assertTrue(shapely.is_valid(geometries).all())
+            union_area = shapely.area(shapely.union_all(geometries))
+            self.assertAlmostEqual(shapely.area(geometries).sum(), union_area, 10)
+            self.assertAlmostEqual(union_area, site_area, 6)
+            # Every simplified tract stays where its full-resolution tract is
+            self.assertTrue(
+                shapely.contains(
+                    self.tracts.geometry.values, shapely.point_on_surface(geometries)
+                ).all()
+            )
+
+    def test_coarser_levels_are_smaller(self):
+        sizes = {
+            level: len(json.dumps(topology, separators=(',', ':')))
+            for level, topology in self.topologies.items()
+        }
+        self.assertLess(sizes['low'], sizes['high'])
+        self.assertLess(sizes['high'], len(self.tracts.to_json()) / 2)
+
+    def test_shared_boundaries_are_stored_once(self):
+        # 4 x 4 tracts have 24 inner edges and 16 outer ones; the two outer edges at
+        # each corner of the site belong to one tract only and form a single arc
+        topology = self.topologies['high']
+        self.assertEqual(len(topology['arcs']), 24 + 12)
+        references = [
+            r if r >= 0 else ~r
+            for obj in topology['objects']['tracts']['geometries']
+            for ring in obj['arcs']
+            for r in ring
+        ]
+        self.assertEqual(len(references), 2 * 24 + 12)
+        for arc in topology['arcs']:
+            self.assertTrue(all(isinstance(v, int) for point in arc for v in point))
+
+    def test_index_lists_levels_and_tract_bounds(self):
+        self.assertEqual(
+            [level['level'] for level in self.index['levels']], ['high', 'low']
+        )
+        bounds = {row[0]: row[1:] for row in self.index['tracts']}
+        np.testing.assert_allclose(
+            bounds['24021000000'], self.tracts.geometry[0].bounds, atol=1e-6
+        )
+
+    def test_hole_and_island(self):
+        outer = box(0, 0, 1, 1).difference(Point(0.5, 0.5).buffer(0.2))
+        island = Point(0.5, 0.5).buffer(0.2)
+        tracts = geopandas.GeoDataFrame(
+            {'geoid': ['24021000100', '24021000200']}, geometry=[outer, island]
+        )
+        topologies, _ = web_geometry_levels(tracts, {'high': 0.001})
+        topology = topologies['high']
+        geometries = topology_geometries(topology)
+        # The hole and the island share one arc
+        self.assertEqual(len(topology['arcs']), 2)
+        self.assertAlmostEqual(
+            geometries['24021000100'].area + geometries['24021000200'].area, 1, 6
+        )
+        self.assertEqual(len(geometries['24021000100'].geoms[0].interiors), 1)
+
+    def test_arc_encoder_splits_rings_at_junctions(self):
+        left = [(0, 0), (1, 0), (1, 1), (0, 1)]
+        right = [(1, 0), (2, 0), (2, 1), (1, 1)]
+        encoder = ArcEncoder([left, right])
+        self.assertEqual(encoder.junctions, {(1, 0), (1, 1)})
+        left_arcs = encoder.ring_arcs(left)
+        right_arcs = encoder.ring_arcs(right)
+        # The shared edge is used in opposite directions
+        shared = set(left_arcs) & {~r for r in right_arcs}
+        self.assertEqual(len(shared), 1)
+        self.assertEqual(len(encoder.arcs), 3)
+
+    def test_create_web_geometry_is_cached_by_county_set(self):
+        features = json.loads(self.tracts.to_json())['features']
+        with tempfile.TemporaryDirectory() as tmp_dir, patch(
+            'mapping.web_geometry.get_county_geometry',
+            return_value={'type': 'FeatureCollection', 'features': features},
+        ) as get_county_geometry, patch(
+            'mapping.web_geometry.WEB_GEOMETRY_TOLERANCES', self.tolerances
+        ):
+            cache_dir = Path(tmp_dir) / 'cache'
+            write_path = Path(tmp_dir) / 'mapping_data'
+            create_web_geometry('24', ['021'], write_path, cache_dir)
+            create_web_geometry('24', ['021'], write_path, cache_dir)
+            self.assertEqual(get_county_geometry.call_count, 1)
+            with open(write_path / 'census_tract_boundaries_index.json') as infile:
+                index = json.load(infile)
+            self.assertEqual(index['counties'], ['021'])
+            for level in index['levels']:
+                path = write_path / level['filename']
+                self.assertEqual(path.stat().st_size, level['bytes'])
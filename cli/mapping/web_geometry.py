@@ -0,0 +1,327 @@
+"""
+Simplified, quantized tract geometry for the web map
+
+The full-resolution TIGERweb polygons are simplified at several tolerances without
+opening gaps or overlaps between neighbouring tracts: the tract boundaries are split
+into arcs between the points where three or more tracts meet, each arc is simplified
+once and snapped to a coordinate grid, and the tracts are rebuilt from the simplified
+arcs. Every level is written as TopoJSON, which stores each shared arc once as
+delta-encoded integer coordinates, next to an index of the levels and of the
+bounding box of every tract.
+"""
+
+import json
+import typing as T
+from pathlib import Path
+
+import geopandas
+import numpy as np
+import shapely
+from shapely.geometry import MultiPolygon, Polygon
+
+from collection.disk_cache import load_or_fetch
+from collection.tigerweb_api import get_county_geometry
+from const import (
+    TIGERWEB_VINTAGE,
+    WEB_GEOMETRY_FILENAME,
+    WEB_GEOMETRY_INDEX_FILENAME,
+    WEB_GEOMETRY_QUANTIZATION,
+    WEB_GEOMETRY_TOLERANCES,
+)
+
+
+def quantization_grid(
+    bounds: T.Sequence[float], quantization: int = WEB_GEOMETRY_QUANTIZATION
+) -> T.Tuple[np.ndarray, float]:
+    """Origin and cell size of a grid with `quantization` cells across the bounds.
+
+    The origin is a multiple of the cell size, so snapping to multiples of the cell
+    size (as shapely.set_precision does) keeps the coordinates on the grid.
+    """
+    minx, miny, maxx, maxy = bounds
+    extent = max(maxx - minx, maxy - miny)
+    scale = extent / (quantization - 1) if extent > 0 else 1.0
+    origin = np.floor(np.array([minx, miny]) / scale) * scale
+    return origin, scale
+
+
+def boundary_arcs(geometries: np.ndarray) -> np.ndarray:
+    """Boundary lines of the polygons, split where three or more polygons meet.
+
+    Boundaries shared by two tracts become a single arc.
+    """
+    noded = shapely.union_all(shapely.boundary(geometries))
+    return shapely.get_parts(shapely.line_merge(noded))
+
+
+def simplify_coverage(
+    geometries: np.ndarray, arcs: np.ndarray, tolerance: float, grid_size: float
+) -> np.ndarray:
+    """Simplify polygons that share boundaries, keeping them gap and overlap free.
+
+    Takes the boundary arcs of the polygons; coordinates are snapped to multiples of
+    grid_size. Polygons that vanish at this tolerance are simplified on their own.
+    """
+    arcs = shapely.simplify(arcs, tolerance, preserve_topology=True)
+    arcs = shapely.set_precision(arcs, grid_size)
+    arcs = arcs[~shapely.is_empty(arcs)]
+    # Simplified arcs may cross each other, so node them again before polygonizing
+    faces = shapely.get_parts(
+        shapely.polygonize(shapely.get_parts(shapely.union_all(arcs)))
+    )
+
+    # Each face belongs to the tract that contains a point inside it; faces outside
+    # every tract (e.g. enclosed water that is not part of a tract) are dropped
+    face_index, tract_index = shapely.STRtree(geometries).query(
+        shapely.point_on_surface(faces), predicate='within'
+    )
+    owners = np.full(len(faces), -1)
+    owners[face_index] = tract_index
+    order = np.argsort(owners, kind='stable')
+    starts = np.searchsorted(owners[order], np.arange(len(geometries) + 1))
+
+    simplified = np.empty(len(geometries), dtype=object)
+    for tract in range(len(geometries)):
+        tract_faces = faces[order[starts[tract] : starts[tract + 1]]]
+        if len(tract_faces) == 1:
+            simplified[tract] = tract_faces[0]
+        elif len(tract_faces):
+            simplified[tract] = shapely.union_all(tract_faces)
+        else:
+            simplified[tract] = shapely.set_precision(
+                shapely.simplify(geometries[tract], tolerance), grid_size
+            )
+    return simplified
+
+
+def quantized_rings(
+    geometry: T.Any, origin: np.ndarray, scale: float
+) -> T.List[T.List[T.List[T.Tuple[int, int]]]]:
+    """Integer grid rings of each polygon of a geometry, exterior ring first.
+
+    Exterior rings are counter-clockwise. Rings are open (the first point is not
+    repeated) and rings with fewer than three points are dropped.
+    """
+    polygons = []
+    for polygon in shapely.get_parts(geometry):
+        if not isinstance(polygon, Polygon) or polygon.is_empty:
+            continue
+        rings = []
+        for i, ring in enumerate([polygon.exterior, *polygon.interiors]):
+            points = shapely.get_coordinates(ring)[:-1]
+            if shapely.is_ccw(ring) != (i == 0):
+                points = points[::-1]
+            points = np.rint((points - origin) / scale).astype(np.int64)
+            # Snapping can repeat consecutive points
+            keep = np.any(points != np.roll(points, 1, axis=0), axis=1)
+            points = [tuple(p) for p in points[keep].tolist()]
+            if len(points) >= 3:
+                rings.append(points)
+        if rings and len(rings[0]) >= 3:
+            polygons.append(rings)
+    return polygons
+
+
+class ArcEncoder:
+    """Split rings into arcs at their junctions and store each arc only once.
+
+    A junction is a point where the rings that pass through it do not all have the
+    same two neighbouring points, i.e. where boundaries meet or part.
+    """
+
+    def __init__(self, rings: T.Iterable[T.List[T.Tuple[int, int]]]) -> None:
+        neighbours = {}
+        self.junctions = set()
+        for ring in rings:
+            for i, point in enumerate(ring):
+                pair = frozenset((ring[i - 1], ring[(i + 1) % len(ring)]))
+                seen = neighbours.setdefault(point, pair)
+                if seen != pair:
+                    self.junctions.add(point)
+        self.arcs = []
+        self.arc_index = {}
+
+    def arc_reference(self, arc: T.Tuple[T.Tuple[int, int], ...]) -> int:
+        """Index of an arc, or its ones' complement if the arc is stored reversed."""
+        reverse = arc[::-1]
+        key = min(arc, reverse)
+        if key not in self.arc_index:
+            self.arc_index[key] = len(self.arcs)
+            self.arcs.append(key)
+        index = self.arc_index[key]
+        return index if arc == key else ~index
+
+    def ring_arcs(self, ring: T.List[T.Tuple[int, int]]) -> T.List[int]:
+        """Arc references that make up a ring."""
+        cuts = [i for i, point in enumerate(ring) if point in self.junctions]
+        if not cuts:
+            # Rings without junctions are stored from their smallest point
+            start = ring.index(min(ring))
+            rotated = ring[start:] + ring[:start]
+            return [self.arc_reference(tuple(rotated + rotated[:1]))]
+        rotated = ring[cuts[0] :] + ring[: cuts[0]]
+        cuts = [i - cuts[0] for i in cuts] + [len(ring)]
+        rotated = rotated + rotated[:1]
+        return [
+            self.arc_reference(tuple(rotated[start : end + 1]))
+            for start, end in zip(cuts[:-1], cuts[1:])
+        ]
+
+    def encoded_arcs(self) -> T.List[T.List[T.List[int]]]:
+        """Arcs as delta-encoded positions, as in quantized TopoJSON."""
+        encoded = []
+        for arc in self.arcs:
+            points = np.array(arc, dtype=np.int64)
+            points[1:] = np.diff(points, axis=0)
+            encoded.append(points.tolist())
+        return encoded
+
+
+def to_topology(
+    geoids: T.Sequence[str],
+    geometries: T.Sequence[T.Any],
+    origin: np.ndarray,
+    scale: float,
+    object_name: str = 'tracts',
+) -> dict:
+    """Quantized TopoJSON topology of the tract geometries, identified by GEOID."""
+    polygons = [quantized_rings(geometry, origin, scale) for geometry in geometries]
+    encoder = ArcEncoder(
+        ring
+        for tract_polygons in polygons
+        for rings in tract_polygons
+        for ring in rings
+    )
+    objects = []
+    for geoid, tract_polygons in zip(geoids, polygons):
+        arcs = [[encoder.ring_arcs(ring) for ring in rings] for rings in tract_polygons]
+        if len(arcs) == 1:
+            objects.append({'type': 'Polygon', 'id': geoid, 'arcs': arcs[0]})
+        elif arcs:
+            objects.append({'type': 'MultiPolygon', 'id': geoid, 'arcs': arcs})
+    bounds = shapely.total_bounds(np.asarray(geometries, dtype=object))
+    return {
+        'type': 'Topology',
+        'bbox': [round(float(b), 6) for b in bounds],
+        'transform': {
+            'scale': [scale, scale],
+            'translate': [float(origin[0]), float(origin[1])],
+        },
+        'objects': {object_name: {'type': 'GeometryCollection', 'geometries': objects}},
+        'arcs': encoder.encoded_arcs(),
+    }
+
+
+def topology_geometries(
+    topology: dict, object_name: str = 'tracts'
+) -> T.Dict[str, T.Any]:
+    """Decode the shapely geometries of a quantized topology, by id."""
+    scale = np.array(topology['transform']['scale'])
+    translate = np.array(topology['transform']['translate'])
+    arcs = [
+        np.cumsum(np.array(arc), axis=0) * scale + translate for arc in topology['arcs']
+    ]
+
+    def ring(references: T.List[int]) -> np.ndarray:
+        points = [arcs[r] if r >= 0 else arcs[~r][::-1] for r in references]
+        # Consecutive arcs share their end points
+        return np.vstack([points[0]] + [p[1:] for p in points[1:]])
+
+    geometries = {}
+    for obj in topology['objects'][object_name]['geometries']:
+        polygons = [obj['arcs']] if obj['type'] == 'Polygon' else obj['arcs']
+        geometries[obj['id']] = MultiPolygon(
+            [
+                Polygon(ring(rings[0]), [ring(hole) for hole in rings[1:]])
+                for rings in polygons
+            ]
+        )
+    return geometries
+
+
+def web_geometry_levels(
+    tracts_gdf: geopandas.GeoDataFrame,
+    tolerances: T.Mapping[str, float] = WEB_GEOMETRY_TOLERANCES,
+    quantization: int = WEB_GEOMETRY_QUANTIZATION,
+) -> T.Tuple[T.Dict[str, dict], dict]:
+    """TopoJSON topology of the tracts at each tolerance, and an index of them.
+
+    The index lists the levels and the bounding box of every tract.
+    """
+    tracts_gdf = tracts_gdf[~tracts_gdf.geometry.is_empty & tracts_gdf.geometry.notna()]
+    geoids = list(tracts_gdf['geoid'].astype(str))
+    geometries = shapely.make_valid(np.asarray(tracts_gdf.geometry.values))
+    bounds = shapely.total_bounds(geometries)
+    origin, scale = quantization_grid(bounds, quantization)
+    arcs = boundary_arcs(geometries)
+    topologies = {
+        level: to_topology(
+            geoids, simplify_coverage(geometries, arcs, tolerance, scale), origin, scale
+        )
+        for level, tolerance in tolerances.items()
+    }
+    index = {
+        'vintage': TIGERWEB_VINTAGE,
+        'quantization': quantization,
+        'bbox': [round(float(b), 6) for b in bounds],
+        'levels': [
+            {
+                'level': level,
+                'tolerance': tolerance,
+                'filename': WEB_GEOMETRY_FILENAME.format(level),
+                'arcs': len(topologies[level]['arcs']),
+            }
+            for level, tolerance in tolerances.items()
+        ],
+        # geoid, min x, min y, max x, max y
+        'tracts': [
+            [geoid, *np.round(shapely.bounds(geometry), 6).tolist()]
+            for geoid, geometry in zip(geoids, geometries)
+        ],
+    }
+    return topologies, index
+
+
+def create_web_geometry(
+    state_fips: str,
+    county_fips: T.List,
+    mapping_write_path: Path,
+    cache_dir: T.Union[str, Path, None] = None,
+) -> None:
+    """Write the simplified tract geometry levels and their index for the web map.
+
+    The levels are cached by vintage and county set, so other runs over the same
+    counties reuse them.
+    """
+    mapping_write_path.mkdir(parents=True, exist_ok=True)
+    counties = sorted(map(str, county_fips))
+    settings = '_'.join(
+        [f'q{WEB_GEOMETRY_QUANTIZATION}']
+        + [
+            f'{level}{tolerance}'
+            for level, tolerance in WEB_GEOMETRY_TOLERANCES.items()
+        ]
+    )
+
+    def build_levels() -> T.Tuple[T.Dict[str, dict], dict]:
+        features = []
+        for county in counties:
+            features += get_county_geometry(state_fips, county, cache_dir)['features']
+        tracts_gdf = geopandas.GeoDataFrame.from_features(features, crs='EPSG:4326')
+        return web_geometry_levels(tracts_gdf)
+
+    topologies, index = load_or_fetch(
+        cache_dir,
+        f"web_geometry_{TIGERWEB_VINTAGE}_{state_fips}{'_'.join(counties)}_{settings}",
+        build_levels,
+    )
+    index = dict(index, state=state_fips, counties=counties)
+    for level in index['levels']:
+        path = mapping_write_path / level['filename']
+        with open(path, 'w') as outfile:
+            json.dump(topologies[level['level']], outfile, separators=(',', ':'))
+        level['bytes'] = path.stat().st_size
+        print('*** Created ' + str(path))
+    with open(mapping_write_path / WEB_GEOMETRY_INDEX_FILENAME, 'w') as outfile:
+        json.dump(index, outfile, separators=(',', ':'))
+    print('*** Created ' + str(mapping_write_path / WEB_GEOMETRY_INDEX_FILENAME))
@@ -0,0 +1,212 @@
+"""
+Re-run the analysis of a site from its geocoded records, without geocoding them again
+
+Reads the geocoded datasets that `load_data.py` wrote to output_data/full_datasets and
+rebuilds the ACS data, the housing loss summaries, the correlations and the mapping data
+with the ACS year, year range and correlation targets given on the command line. The
+other outputs (time series, alerts, space-time cube, address error files) are left as
+they are. The checkpoints of the rebuilt stages are cleared, so the next run of
+`load_data.py` rebuilds them with the settings in const.py.
+
+Usage:  python reanalyze.py /path/to/site/ --acs-year 2019 --min-year 2018 \
+            --targets total_filings
+"""
+
+import argparse
+import time
+import typing as T
+from pathlib import Path
+
+import pandas as pd
+
+from collection.checkpoint import CheckpointStore
+from collection.date_parsing import parse_date_column
+from collection.record_schema import apply_record_schema
+from const import (
+    ACS_YEAR,
+    CORRELATION_TARGETS,
+    MAX_YEAR,
+    MIN_YEAR,
+    OUTPUT_PATH_CHECKPOINTS,
+    OUTPUT_PATH_GEOCODED_DATA,
+    OUTPUT_PATH_MAPS,
+    OUTPUT_PATH_SUMMARIES,
+)
+from load_data import (
+    DATA_CATEGORIES,
+    DATE_COLUMNS_BY_CATEGORY,
+    create_level_summaries,
+    create_mapping_data,
+    get_site_acs_data,
+    get_tract_crosswalks,
+    run_correlation_analysis,
+    summarize_all_data,
+)
+
+# Checkpointed stages of load_data.main whose outputs are rebuilt here
+REANALYZED_STAGES = [
+    'acs',
+    'tract_vintage',
+    'summary',
+    'levels',
+    'correlations',
+    'mapping',
+]
+
+# Columns read as text, to keep their leading zeros
+TEXT_COLUMNS = ['geoid', 'zip_code', 'zip_code_clean']
+
+
+def load_geocoded_data(output_path: Path) -> T.Dict[str, T.Union[pd.DataFrame, None]]:
+    """Read the geocoded records of each category written by an earlier run."""
+    geocoded = {}
+    for category, settings in DATA_CATEGORIES.items():
+        path = output_path / OUTPUT_PATH_GEOCODED_DATA / settings['geocoded_filename']
+        if not path.is_file():
+            geocoded[category] = None
+            continue
+        data = pd.read_csv(
+            path, dtype={column: str for column in TEXT_COLUMNS}, low_memory=False
+        )
+        geocoded[category] = apply_record_schema(data)
+        print('\u2713', f'Read {len(data)} geocoded {settings["label"]} records.')
+    return geocoded
+
+
+def filter_years(
+    data: T.Union[pd.DataFrame, None], date_column: str, min_year: int, max_year: int
+) -> T.Union[pd.DataFrame, None]:
+    """Keep the records from min_year to max_year (inclusive), None if there are none.
+
+    A category without records is left out of the analysis like a missing one, since
+    the summaries join the categories on their tracts.
+    """
+    if data is None:
+        return None
+    if 'year' in data.columns:
+        years = pd.to_numeric(data['year'], errors='coerce')
+    else:
+        years = parse_date_column(data[date_column]).dt.year
+    data = data[(years >= min_year) & (years <= max_year)].reset_index(drop=True)
+    return data if len(data) > 0 else None
+
+
+def reanalyze(
+    output_path: T.Union[str, Path],
+    acs_year: int = ACS_YEAR,
+    min_year: int = MIN_YEAR,
+    max_year: int = MAX_YEAR,
+    targets: T.Sequence[str] = tuple(CORRELATION_TARGETS),
+    cache_dir: T.Union[str, Path, None] = None,
+    mapping: bool = True,
+) -> T.Union[pd.DataFrame, None]:
+    """Rebuild the summary, correlations and mapping data from the geocoded records.
+
+    output_path is the folder with the `output_data` folder of the earlier run. Returns
+    the new housing loss summary, or None if there is nothing to analyze.
+    """
+    from analysis.space_time_cube import SpaceTimeCube
+
+    start_time = time.perf_counter()
+    output_path = Path(output_path)
+    geocoded = load_geocoded_data(output_path)
+    if all(data is None for data in geocoded.values()):
+        print(
+            '\u2326',
+            'No geocoded data found in',
+            str(output_path / OUTPUT_PATH_GEOCODED_DATA),
+            '- run load_data.py first.',
+        )
+        return None
+    for category, data in geocoded.items():
+        geocoded[category] = filter_years(
+            data, DATE_COLUMNS_BY_CATEGORY[category], min_year, max_year
+        )
+        if data is not None and geocoded[category] is None:
+            print(
+                '\u2326',
+                f'No {DATA_CATEGORIES[category]["label"]} records from {min_year} to',
+                f'{max_year}, they are left out of the analysis.',
+            )
+    if all(data is None for data in geocoded.values()):
+        print('\u2326', f'No records from {min_year} to {max_year} to analyze.')
+        return None
+    CheckpointStore(output_path / OUTPUT_PATH_CHECKPOINTS).invalidate(REANALYZED_STAGES)
+
+    state_fips, county_fips, acs_df, acs_data_dict = get_site_acs_data(
+        geocoded, cache_dir, acs_year
+    )
+    if acs_df is None:
+        print(
+            '\u2326  Insufficient geography information to retrieve ACS Data!',
+            'Please input valid state and county FIPS codes.',
+        )
+        return None
+    cube = SpaceTimeCube.from_frames(geocoded, DATE_COLUMNS_BY_CATEGORY)
+    crosswalks = get_tract_crosswalks(geocoded, acs_df, cache_dir)
+    df_summ_mrg = summarize_all_data(
+        None,
+        None,
+        geocoded,
+        acs_df,
+        acs_data_dict,
+        output_path / OUTPUT_PATH_SUMMARIES,
+        cube,
+        crosswalks,
+    )
+    create_level_summaries(
+        geocoded,
+        state_fips,
+        county_fips,
+        output_path / OUTPUT_PATH_SUMMARIES,
+        crosswalks,
+        cache_dir,
+        acs_year,
+    )
+    run_correlation_analysis(acs_df, df_summ_mrg, output_path, targets)
+    if mapping:
+        create_mapping_data(
+            state_fips,
+            county_fips,
+            df_summ_mrg,
+            output_path / OUTPUT_PATH_MAPS,
+            cache_dir,
+        )
+    print(
+        '\u2713',
+        f'Re-analysis finished in {time.perf_counter() - start_time:.1f}s',
+        f'(ACS {acs_year}, records from {min_year} to {max_year}).',
+    )
+    return df_summ_mrg
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        'output_path',
+        help='Folder with the output_data folder of an earlier run '
+        '(by default the parent folder of the input data)',
+    )
+    parser.add_argument('--acs-year', type=int, default=ACS_YEAR)
+    parser.add_argument('--min-year', type=int, default=MIN_YEAR)
+    parser.add_argument('--max-year', type=int, default=MAX_YEAR)
+    parser.add_argument(
+        '--targets',
+        nargs='+',
+        default=list(CORRELATION_TARGETS),
+        help='Housing loss summary columns to correlate with the ACS variables',
+    )
+    parser.add_argument('--cache-dir', default=None, help='Shared ACS/geometry cache')
+    parser.add_argument(
+        '--skip-mapping', action='store_true', help='Do not rebuild the mapping data'
+    )
+    args = parser.parse_args()
+    reanalyze(
+        args.output_path,
+        args.acs_year,
+        args.min_year,
+        args.max_year,
+        args.targets,
+        args.cache_dir,
+        mapping=not args.skip_mapping,
+    )
@@ -0,0 +1,297 @@
+"""
+Long-running local HTTP service that runs the housing loss analysis as queued jobs
+
+Jobs point at a partner site's input directory and run `load_data.main` (through
+`batch_load_data.run_site`) on a bounded pool of worker processes. The workers import
+the analysis libraries once when they start and share an on-disk cache of ACS and
+tract geometry data, so only the first job pays for them.
+
+Endpoints (JSON):
+    POST /jobs       {"input_path": ..., "output_path": optional, "restart": false}
+                     (409 while a job for the same output path is not finished)
+    GET  /jobs       all jobs
+    GET  /jobs/<id>  status of a job, with the status and duration of each stage
+    GET  /health     number of workers and of queued and running jobs
+
+Usage:  python service.py --port 8765 --workers 2 --cache-dir service_cache
+"""
+
+import argparse
+import datetime
+import json
+import threading
+import typing as T
+import uuid
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from batch_load_data import run_site
+from collection.checkpoint import CheckpointStore
+from const import (
+    OUTPUT_PATH_CHECKPOINTS,
+    SERVICE_HOST,
+    SERVICE_MAX_QUEUED_JOBS,
+    SERVICE_MAX_WORKERS,
+    SERVICE_PORT,
+)
+
+
+def warm_up() -> None:
+    """Import the modules of all pipeline stages, so that jobs do not pay for it."""
+    import analysis.acs_correlation  # noqa: F401
+    import analysis.acs_data  # noqa: F401
+    import analysis.anomaly_detection  # noqa: F401
+    import analysis.housing_loss_summary  # noqa: F401
+    import analysis.spatial_analysis  # noqa: F401
+    import analysis.timeseries  # noqa: F401
+    import mapping.gpkg_writer  # noqa: F401
+    import mapping.web_geometry  # noqa: F401
+
+
+def now() -> str:
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+
+def stage_timings(output_path: Path, submitted: str) -> T.Dict[str, T.Dict]:
+    """Status and duration of each stage of a job, from its checkpoint manifest.
+
+    Stages last run before the job was submitted are reported as resumed.
+    """
+    manifest = CheckpointStore(output_path / OUTPUT_PATH_CHECKPOINTS).manifest
+    stages = {}
+    for stage, entry in manifest.items():
+        resumed = entry.get('started', '') < submitted
+        stages[stage] = {
+            'status': 'resumed' if resumed else entry.get('status'),
+            'seconds': None if resumed else entry.get('seconds'),
+        }
+    return stages
+
+
+class OutputPathBusyError(Exception):
+    """A job for the same output path is queued or running."""
+
+
+class JobQueue:
+    """Jobs submitted to the service and the pool of workers that runs them."""
+
+    def __init__(
+        self,
+        cache_dir: T.Union[str, Path],
+        max_workers: int = SERVICE_MAX_WORKERS,
+        max_queued_jobs: int = SERVICE_MAX_QUEUED_JOBS,
+        executor: T.Optional[Executor] = None,
+        runner: T.Callable[..., T.Dict] = run_site,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_workers = max_workers
+        self.max_queued_jobs = max_queued_jobs
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers, initializer=warm_up)
+            # Start the workers (and their imports) before the first job comes in
+            for _ in range(max_workers):
+                executor.submit(int)
+        self.executor = executor
+        self.runner = runner
+        self.jobs: T.Dict[str, T.Dict] = {}
+        self.futures: T.Dict[str, Future] = {}
+        self.lock = threading.Lock()
+
+    def counts(self) -> T.Dict[str, int]:
+        with self.lock:
+            statuses = [self._status(job_id) for job_id in self.jobs]
+        return {
+            'workers': self.max_workers,
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running'),
+        }
+
+    def submit(
+        self,
+        input_path: T.Union[str, Path],
+        output_path: T.Union[str, Path, None] = None,
+        restart: bool = False,
+    ) -> T.Dict:
+        """Queue a job for an input directory.
+
+        Raises a ValueError if the input is not a directory, an OutputPathBusyError if
+        a job for the same output path is queued or running (they would write the same
+        checkpoints and files) and an OverflowError if too many jobs are queued already.
+        """
+        input_path = Path(input_path).expanduser().resolve()
+        if not input_path.is_dir():
+            raise ValueError(f'{input_path} is not a directory')
+        # Like load_data.main, write to the parent of the input data by default
+        output_path = (
+            Path(output_path).expanduser().resolve()
+            if output_path
+            else input_path.parent
+        )
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            'id': job_id,
+            'input_path': str(input_path),
+            'output_path': str(output_path),
+            'restart': bool(restart),
+            'submitted': now(),
+        }
+        # Check and insert under one lock, so concurrent requests cannot both pass
+        with self.lock:
+            active = [
+                other_id
+                for other_id in self.jobs
+                if self._status(other_id) in ('queued', 'running')
+            ]
+            busy = [
+                other_id
+                for other_id in active
+                if self.jobs[other_id]['output_path'] == str(output_path)
+            ]
+            if busy:
+                raise OutputPathBusyError(
+                    f'Job {busy[0]} for {output_path} is not finished yet'
+                )
+            queued = [
+                other_id for other_id in active if self._status(other_id) == 'queued'
+            ]
+            if len(queued) >= self.max_queued_jobs:
+                raise OverflowError(f'{self.max_queued_jobs} jobs are already queued')
+            self.jobs[job_id] = job
+            future = self.executor.submit(
+                self.runner, input_path, output_path, self.cache_dir, not restart
+            )
+            self.futures[job_id] = future
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return self.status(job_id)
+
+    def _status(self, job_id: str) -> str:
+        job = self.jobs[job_id]
+        if 'result' in job:
+            return job['result'].get('status', 'failed')
+        future = self.futures[job_id]
+        # A done future is still running until _finish has stored its result
+        return 'running' if future.running() or future.done() else 'queued'
+
+    def _finish(self, job_id: str, future: Future) -> None:
+        try:
+            result = future.result()
+        except Exception as e:
+            # E.g. a worker process that died
+            result = {'status': 'failed', 'error': f'{type(e).__name__}: {e}'}
+        with self.lock:
+            self.jobs[job_id]['result'] = result
+            self.jobs[job_id]['finished'] = now()
+
+    def status(self, job_id: str) -> T.Union[T.Dict, None]:
+        """The job, its status and the timings of its stages (None if unknown)."""
+        with self.lock:
+            if job_id not in self.jobs:
+                return None
+            job = dict(self.jobs[job_id])
+            job['status'] = self._status(job_id)
+        result = job.pop('result', {})
+        job['error'] = result.get('error', '')
+        job['seconds'] = result.get('seconds')
+        job['log_file'] = result.get('log_file')
+        if job['status'] != 'queued':
+            job['stages'] = stage_timings(Path(job['output_path']), job['submitted'])
+        return job
+
+    def all_statuses(self) -> T.List[T.Dict]:
+        with self.lock:
+            job_ids = list(self.jobs)
+        return [self.status(job_id) for job_id in job_ids]
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """JSON API over the job queue of the server."""
+
+    def send_json(self, status: HTTPStatus, body: T.Any) -> None:
+        data = json.dumps(body, indent=2).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        queue = self.server.queue
+        parts = self.path.strip('/').split('/')
+        if parts == ['health']:
+            self.send_json(HTTPStatus.OK, {'status': 'ok', **queue.counts()})
+        elif parts == ['jobs']:
+            self.send_json(HTTPStatus.OK, queue.all_statuses())
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = queue.status(parts[1])
+            if job is None:
+                self.send_json(HTTPStatus.NOT_FOUND, {'error': 'Unknown job'})
+            else:
+                self.send_json(HTTPStatus.OK, job)
+        else:
+            self.send_json(HTTPStatus.NOT_FOUND, {'error': 'Unknown endpoint'})
+
+    def do_POST(self) -> None:
+        if self.path.strip('/') != 'jobs':
+            self.send_json(HTTPStatus.NOT_FOUND, {'error': 'Unknown endpoint'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            job = self.server.queue.submit(
+                request['input_path'],
+                request.get('output_path'),
+                request.get('restart', False),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': str(e)})
+            return
+        except OutputPathBusyError as e:
+            self.send_json(HTTPStatus.CONFLICT, {'error': str(e)})
+            return
+        except OverflowError as e:
+            self.send_json(HTTPStatus.SERVICE_UNAVAILABLE, {'error': str(e)})
+            return
+        self.send_json(HTTPStatus.ACCEPTED, job)
+
+    def log_message(self, format: str, *args: T.Any) -> None:
+        # Keep the console for job events
+        pass
+
+
+def make_server(
+    queue: JobQueue, host: str = SERVICE_HOST, port: int = SERVICE_PORT
+) -> ThreadingHTTPServer:
+    """HTTP server for the job queue; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.queue = queue
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default=SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    parser.add_argument('--workers', type=int, default=SERVICE_MAX_WORKERS)
+    parser.add_argument(
+        '--cache-dir', default='service_cache', help='Shared ACS/geometry cache'
+    )
+    args = parser.parse_args()
+    queue = JobQueue(args.cache_dir, args.workers)
+    server = make_server(queue, args.host, args.port)
+    print(
+        '\u2713',
+        f'Serving on http://{args.host}:{server.server_port} with',
+        f'{args.workers} workers; press Ctrl+C to stop.',
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        queue.shutdown()
@@ -0,0 +1,57 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+import batch_load_data
+from batch_load_data import find_site_directories, run_site, site_output_paths
+from const import GIS_IMPORT_FILENAME, OUTPUT_PATH_MAPS
+
+
+class BatchLoadDataTestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp_dir.name)
+        for name in ['site_a', 'site_b']:
+            (self.root / 'sites' / name).mkdir(parents=True)
+        (self.root / 'sites' / 'notes.txt').write_text('not a site')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_find_site_directories(self):
+        site_dirs = find_site_directories([str(self.root / 'sites' / '*')])
+        self.assertEqual([d.name for d in site_dirs], ['site_a', 'site_b'])
+
+    def test_site_output_paths_are_unique(self):
+        site_dirs = [Path('/data/md/input'), Path('/data/va/input')]
+        output_paths = site_output_paths(site_dirs, Path('/out'))
+        self.assertEqual(output_paths, [Path('/out/input'), Path('/out/va_input')])
+
+    def test_site_failure_is_isolated(self):
+        def failing_main(*args, **kwargs):
+            raise ValueError('bad data')
+
+        output_path = self.root / 'out' / 'site_a'
+        with patch.object(batch_load_data, 'main', failing_main):
+            result = run_site(
+                self.root / 'sites' / 'site_a', output_path, self.root / 'cache'
+            )
+        self.assertEqual(result['status'], 'failed')
+        self.assertIn('bad data', result['error'])
+        self.assertIn('Traceback', (output_path / 'run_log.txt').read_text())
+
+    def test_site_stopped_early_is_not_completed(self):
+        def stopping_main(*args, **kwargs):
+            return ('Insufficient geography information to retrieve ACS Data!',)
+
+        # Mapping data left over from an earlier run does not count
+        output_path = self.root / 'out' / 'site_a'
+        (output_path / OUTPUT_PATH_MAPS).mkdir(parents=True)
+        (output_path / OUTPUT_PATH_MAPS / GIS_IMPORT_FILENAME).write_text('')
+        with patch.object(batch_load_data, 'main', stopping_main):
+            result = run_site(
+                self.root / 'sites' / 'site_a', output_path, self.root / 'cache'
+            )
+        self.assertEqual(result['status'], 'invalid input')
+        self.assertIn('ACS Data', result['error'])
@@ -0,0 +1,50 @@
+import subprocess
+import sys
+from pathlib import Path
+from unittest import TestCase
+
+CLI_DIR = Path(__file__).resolve().parents[1]
+
+# Cumulative import time allowed for the CLI entry points
+IMPORT_TIME_BUDGET_SECONDS = 1.5
+
+# Heavy dependencies that are only imported by the stages that use them
+DEFERRED_MODULES = [
+    'census',
+    'debugpy',
+    'geopandas',
+    'matplotlib',
+    'scipy.stats',
+    'seaborn',
+    'shapely',
+]
+
+
+def import_times(module: str) -> dict:
+    """Cumulative import time in seconds of every module imported with `module`.
+
+    Runs `python -X importtime` in a fresh interpreter.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=CLI_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:') :].split('|')
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+class ImportTimeTestCase(TestCase):
+    def test_load_data_import_time(self):
+        for module in ['load_data', 'batch_load_data']:
+            times = import_times(module)
+            deferred = [m for m in DEFERRED_MODULES if m in times]
+            self.assertEqual(deferred, [], f'{module} imports {deferred}')
+            self.assertLess(times[module], IMPORT_TIME_BUDGET_SECONDS)
@@ -1,11 +1,76 @@
+import shutil
+import tempfile
+from pathlib import Path
 from unittest import TestCase
+from unittest.mock import patch
 
+import pandas as pd
 from pkg_resources import resource_filename
 
+from collection.http_client import configure_session
+from const import (
+    GEOCODED_EVICTIONS_FILENAME,
+    GIS_IMPORT_FILENAME,
+    HOUSING_LOSS_SUMMARY_FILENAME,
+    OUTPUT_PATH_GEOCODED_DATA,
+    OUTPUT_PATH_MAPS,
+    OUTPUT_PATH_SUMMARIES,
+)
+import load_data
 from load_data import main
 
 
 class LoadDataTestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        # Back to the default (live) session for the other tests
+        configure_session()
+        self.tmp_dir.cleanup()
+
+    def run_main(self):
+        """Run the test site offline, replaying the recorded Census responses."""
+        resources = Path(resource_filename('collection.tests', 'resources'))
+        if not (self.root / 'input').exists():
+            for category in [
+                'evictions',
+                'mortgage_foreclosures',
+                'tax_lien_foreclosures',
+            ]:
+                shutil.copytree(resources / category, self.root / 'input' / category)
+        configure_session('replay', resources / 'http_recordings')
+        # The Census API client refuses to run without a key, which is not recorded
+        with patch('analysis.acs_data.CENSUS_API_KEY', 'replay'):
+            return main(str(self.root / 'input') + '/')
+
     def test_main(self):
-        test_path = resource_filename('collection.tests', 'resources/')
-        main(test_path)
+        message = self.run_main()
+
+        self.assertIsNone(message)
+        summary_path = self.root / OUTPUT_PATH_SUMMARIES / HOUSING_LOSS_SUMMARY_FILENAME
+        self.assertTrue(summary_path.is_file())
+        self.assertTrue((self.root / OUTPUT_PATH_MAPS / GIS_IMPORT_FILENAME).is_file())
+        # The optional eviction judgment dates are kept up to the summary
+        evictions = pd.read_csv(
+            self.root / OUTPUT_PATH_GEOCODED_DATA / GEOCODED_EVICTIONS_FILENAME
+        )
+        self.assertTrue(evictions['eviction_judgment_date'].notna().any())
+        self.assertGreater(pd.read_csv(summary_path)['total_judgements'].sum(), 0)
+
+    def test_rerun_on_a_later_day_skips_geocoding(self):
+        """A new run date revalidates the records, but geocodes none of them again."""
+        with patch.object(
+            load_data, 'geocode_all_data', wraps=load_data.geocode_all_data
+        ) as geocode, patch.object(
+            load_data, 'run_correlation_analysis', return_value=None
+        ), patch.object(
+            pd.Timestamp, 'now', return_value=pd.Timestamp('2023-06-01 10:00')
+        ):
+            self.assertIsNone(self.run_main())
+            with patch.object(
+                pd.Timestamp, 'now', return_value=pd.Timestamp('2023-06-02 10:00')
+            ):
+                self.assertIsNone(self.run_main())
+        self.assertEqual(geocode.call_count, 1)
@@ -0,0 +1,145 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
+
+from const import (
+    GEOCODED_EVICTIONS_FILENAME,
+    GEOCODED_FORECLOSURES_FILENAME,
+    HOUSING_LOSS_SUMMARY_FILENAME,
+    OUTPUT_PATH_GEOCODED_DATA,
+    OUTPUT_PATH_SUMMARIES,
+)
+from reanalyze import filter_years, load_geocoded_data, reanalyze
+
+TRACTS = ['750100', '750200', '750300']
+
+
+def fake_acs_data(state_fips, county_fips, year=2019, cache_dir=None):
+    """ACS data of the tracts of the site, as returned by analysis.acs_data."""
+    acs_df = pd.DataFrame(
+        {
+            'state': state_fips,
+            'county': county_fips,
+            'tract': TRACTS,
+            'GEOID': [f'{state_fips}{county_fips}{tract}' for tract in TRACTS],
+            'total-households': [300.0, 400.0, 500.0],
+            'total-renter-occupied-households': [100.0, 200.0, 300.0],
+            'total-owner-occupied-households': [200.0, 200.0, 200.0],
+        }
+    )
+    return acs_df, pd.DataFrame()
+
+
+def fake_acs_households(level, state_fips, county_fips, year=2019, cache_dir=None):
+    """Households of the areas of a level, as returned by analysis.acs_data."""
+    keys = {
+        'block_group': [int(f'24021{tract}1') for tract in TRACTS],
+        'tract': [int(f'24021{tract}') for tract in TRACTS],
+        'county': [24021],
+        'zip': [21701, 21702],
+    }[level]
+    return pd.DataFrame(
+        {
+            'geoid_key': keys,
+            'total-renter-occupied-households': 100.0,
+            'total-owner-occupied-households': 50.0,
+        }
+    )
+
+
+class ReanalyzeTestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_path = Path(self.tmp_dir.name)
+        geocoded_path = self.output_path / OUTPUT_PATH_GEOCODED_DATA
+        geocoded_path.mkdir(parents=True)
+        pd.DataFrame(
+            {
+                'eviction_filing_date': ['2017-05-01', '2020-01-15', '2021-03-02'],
+                'year': [2017, 2020, 2021],
+                'zip_code': ['02134', '02134', '02135'],
+                'geoid': ['01073000100', '01073000100', None],
+            }
+        ).to_csv(geocoded_path / GEOCODED_EVICTIONS_FILENAME, index=False)
+        self.geocoded_path = geocoded_path
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_geocoded_data(self):
+        geocoded = load_geocoded_data(self.output_path)
+        self.assertIsNone(geocoded['mortgage_foreclosures'])
+        evictions = geocoded['evictions']
+        self.assertEqual(evictions['geoid'].iloc[0], '01073000100')
+        self.assertEqual(evictions['zip_code'].iloc[0], '02134')
+
+    def test_filter_years(self):
+        evictions = load_geocoded_data(self.output_path)['evictions']
+        filtered = filter_years(evictions, 'eviction_filing_date', 2018, 2020)
+        self.assertEqual(list(filtered['year']), [2020])
+        filtered = filter_years(
+            evictions.drop(columns='year'), 'eviction_filing_date', 2018, 2999
+        )
+        self.assertEqual(len(filtered), 2)
+        self.assertIsNone(filter_years(None, 'eviction_filing_date', 2018, 2020))
+
+    def write_site_records(self, eviction_dates, foreclosure_dates):
+        """Geocoded evictions and foreclosures of the tracts of the site."""
+        records = {
+            'state_fips': '24',
+            'county_fips': '021',
+            'tract': TRACTS * 2,
+            'block': '1001',
+            'geoid': [f'24021{tract}' for tract in TRACTS * 2],
+            'street_address_1': '1 Main St',
+            'city': 'Frederick',
+            'state': 'MD',
+            'zip_code': '21701',
+        }
+        pd.DataFrame({'eviction_filing_date': eviction_dates, **records}).to_csv(
+            self.geocoded_path / GEOCODED_EVICTIONS_FILENAME, index=False
+        )
+        pd.DataFrame({'foreclosure_sale_date': foreclosure_dates, **records}).to_csv(
+            self.geocoded_path / GEOCODED_FORECLOSURES_FILENAME, index=False
+        )
+
+    @patch('analysis.acs_data.get_acs_households', fake_acs_households)
+    @patch('analysis.acs_data.get_acs_data', fake_acs_data)
+    def test_reanalyze_with_an_empty_category(self):
+        # All foreclosures are before the years of the re-analysis
+        self.write_site_records(
+            ['2020-01-15'] * 3 + ['2021-03-02'] * 3, ['2017-05-01'] * 6
+        )
+
+        summary = reanalyze(
+            self.output_path, min_year=2018, max_year=2021, targets=(), mapping=False
+        )
+        # Without records the foreclosures are summarized like a missing category
+        self.assertEqual(summary['total_filings'].sum(), 6)
+        self.assertEqual(summary['total_housing_loss'].sum(), 6)
+        self.assertNotIn('total_foreclosures', summary.columns)
+        self.assertTrue(
+            (
+                self.output_path / OUTPUT_PATH_SUMMARIES / HOUSING_LOSS_SUMMARY_FILENAME
+            ).is_file()
+        )
+
+    @patch('analysis.acs_data.get_acs_households', fake_acs_households)
+    @patch('analysis.acs_data.get_acs_data', fake_acs_data)
+    def test_reanalyze_without_evictions(self):
+        # The minimum year is after the last eviction
+        self.write_site_records(
+            ['2020-01-15'] * 3 + ['2021-03-02'] * 3, ['2022-05-01'] * 6
+        )
+
+        summary = reanalyze(
+            self.output_path, min_year=2022, max_year=2023, targets=(), mapping=False
+        )
+        self.assertEqual(summary['total_mortgage_foreclosures'].sum(), 6)
+        self.assertEqual(summary['total_foreclosures'].sum(), 6)
+        self.assertEqual(summary['total_housing_loss'].sum(), 6)
+        self.assertNotIn('total_filings', summary.columns)
+        self.assertNotIn('housing-loss-index', summary.columns)
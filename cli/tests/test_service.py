@@ -0,0 +1,117 @@
+import json
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import TestCase
+
+from collection.checkpoint import CheckpointStore
+from const import OUTPUT_PATH_CHECKPOINTS
+from service import JobQueue, make_server
+
+
+class ServiceTestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp_dir.name)
+        for site in ('site', 'other_site', 'third_site'):
+            (self.root / site / 'input').mkdir(parents=True)
+        self.release = threading.Event()
+        self.queue = JobQueue(
+            self.root / 'cache',
+            max_workers=1,
+            max_queued_jobs=1,
+            executor=ThreadPoolExecutor(1),
+            runner=self.fake_run_site,
+        )
+        self.server = make_server(self.queue, port=0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def tearDown(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+        self.queue.executor.shutdown(wait=True)
+        self.tmp_dir.cleanup()
+
+    def fake_run_site(self, site_dir, output_path, cache_dir, resume=True):
+        checkpoints = CheckpointStore(output_path / OUTPUT_PATH_CHECKPOINTS, resume)
+        checkpoints.run('load', [], lambda: 'loaded')
+        self.release.wait(10)
+        return {'status': 'completed', 'error': '', 'seconds': 0.1}
+
+    def request(self, path, body=None):
+        data = None if body is None else json.dumps(body).encode('utf-8')
+        request = urllib.request.Request(self.url + path, data=data)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def wait_for(self, job_id, status):
+        for _ in range(100):
+            job = self.request(f'/jobs/{job_id}')[1]
+            if job['status'] == status:
+                return job
+            threading.Event().wait(0.05)
+        self.fail(f'job {job_id} did not become {status}')
+
+    def test_job_lifecycle(self):
+        status, job = self.request(
+            '/jobs', {'input_path': str(self.root / 'site' / 'input')}
+        )
+        self.assertEqual(status, 202)
+        self.assertEqual(job['output_path'], str((self.root / 'site').resolve()))
+        self.wait_for(job['id'], 'running')
+        self.assertEqual(self.request('/health')[1]['running'], 1)
+
+        self.release.set()
+        job = self.wait_for(job['id'], 'completed')
+        self.assertEqual(job['stages']['load']['status'], 'completed')
+        self.assertIsNotNone(job['stages']['load']['seconds'])
+        self.assertEqual(len(self.request('/jobs')[1]), 1)
+
+    def test_invalid_jobs_are_refused(self):
+        status, body = self.request('/jobs', {'input_path': str(self.root / 'none')})
+        self.assertEqual(status, 400)
+        self.assertIn('not a directory', body['error'])
+        self.assertEqual(self.request('/jobs', {})[0], 400)
+        self.assertEqual(self.request('/jobs/unknown')[0], 404)
+
+    def test_full_queue_is_refused(self):
+        first = self.request('/jobs', {'input_path': str(self.root / 'site' / 'input')})
+        self.wait_for(first[1]['id'], 'running')
+        for site, status in (('other_site', 202), ('third_site', 503)):
+            body = {'input_path': str(self.root / site / 'input')}
+            self.assertEqual(self.request('/jobs', body)[0], status)
+
+    def test_jobs_for_the_same_output_are_refused(self):
+        site = {'input_path': str(self.root / 'site' / 'input')}
+        first = self.request('/jobs', site)[1]
+        status, body = self.request('/jobs', site)
+        self.assertEqual(status, 409)
+        self.assertIn(first['id'], body['error'])
+        # Once the first job is done, the site can be run again
+        self.release.set()
+        self.wait_for(first['id'], 'completed')
+        self.assertEqual(self.request('/jobs', site)[0], 202)
+
+    def test_queue_bound_holds_for_concurrent_requests(self):
+        first = self.request('/jobs', {'input_path': str(self.root / 'site' / 'input')})
+        self.wait_for(first[1]['id'], 'running')
+        for i in range(8):
+            (self.root / f'site_{i}' / 'input').mkdir(parents=True)
+        with ThreadPoolExecutor(8) as executor:
+            statuses = list(
+                executor.map(
+                    lambda i: self.request(
+                        '/jobs', {'input_path': str(self.root / f'site_{i}' / 'input')}
+                    )[0],
+                    range(8),
+                )
+            )
+        self.assertEqual(sorted(statuses), [202] + [503] * 7)